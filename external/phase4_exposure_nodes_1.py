@@ -24,27 +24,51 @@ Semantics (what you want):
     - for every chosen node, upload_time <= t
     - python masks intersect non-zero across ALL chosen nodes
     - every dependency edge is satisfied (parent version allows the chosen child version)
+
+  The search keeps the first solution it finds for each subtree, so it may miss an
+  assignment that exists; it never reports one that does not.
+
+Experimental:
+  --mrv-order tries each node's deps chosen-first, then fewest candidates first. It is
+  usually faster, but because the search is incomplete it can report a different (still
+  sound) exposed set, depth_to_root and fail_reason than the default header order.
 """
+from __future__ import annotations
 
 import argparse
-import csv
+import multiprocessing as mp
 import time
-from collections import OrderedDict, Counter
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple, Iterator, Set, Any
-
-from pymongo import MongoClient
+from array import array
+from collections import Counter, OrderedDict
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+import bson
+import numpy as np
 from packaging.utils import canonicalize_name
-from packaging.version import Version
-
+from pymongo import MongoClient
 from tqdm import tqdm
 
+try:
+    from numba import njit
+    _HAS_NUMBA = True
+except ImportError:  # optional: NumPy fallbacks for the chunk kernels below
+    _HAS_NUMBA = False
+
 
 # ----------------------------
 # Small utilities
 # ----------------------------
 
-def epoch_from_dt_maybe(x) -> Optional[int]:
+# Sentinels for the NumPy node arrays (node_time int64, node_name_id int32)
+NO_TIME = -1
+NO_NAME = -1
+NO_NODE = -1  # unbound slot in the solver's chosen[name_id] buffer
+TIME_MAX = np.iinfo(np.int64).max
+
+
+def epoch_from_dt_maybe(x) -> int | None:
     """Convert BSON datetime to epoch seconds. Return None if missing/unparseable."""
     if x is None:
         return None
@@ -65,12 +89,13 @@ class LRUCache:
         self.od: OrderedDict = OrderedDict()
 
     def get(self, k):
-        if self.cap <= 0:
+        # one hash lookup on a hit; a disabled cache (cap <= 0) is simply always empty
+        try:
+            v = self.od[k]
+        except KeyError:
             return None
-        if k in self.od:
-            self.od.move_to_end(k)
-            return self.od[k]
-        return None
+        self.od.move_to_end(k)
+        return v
 
     def put(self, k, v):
         if self.cap <= 0:
@@ -91,41 +116,252 @@ class LRUCache:
 # Adjacency access via headers/chunks
 # ----------------------------
 
+_EMPTY_IDS = np.empty(0, dtype=np.int64)
+
+
+# Chunk kernels over the time-sorted int64 arrays. With numba they are compiled
+# with explicit signatures (no per-call type inference) and release the GIL.
+if _HAS_NUMBA:
+    @njit("int64(int64[::1], int64)", nogil=True, cache=True)
+    def _bisect_right(times, t):
+        """Number of leading entries of the ascending `times` that are <= t."""
+        lo = 0
+        hi = times.shape[0]
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if times[mid] <= t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    @njit(
+        "int64(int64[::1], int64[::1], int64, int64[::1], int64)",
+        nogil=True,
+        cache=True,
+    )
+    def _collect_candidates(dst_ids, dst_times, t, out, max_cand):
+        """Write dst_ids with time <= t to `out`, newest first (max_cand if > 0)."""
+        cut = _bisect_right(dst_times, t)
+        n = cut
+        if 0 < max_cand < n:
+            n = max_cand
+        for k in range(n):
+            out[k] = dst_ids[cut - 1 - k]
+        return n
+else:
+    def _bisect_right(times, t):
+        """Number of leading entries of the ascending `times` that are <= t."""
+        return int(np.searchsorted(times, t, side="right"))
+
+    def _collect_candidates(dst_ids, dst_times, t, out, max_cand):
+        """Write dst_ids with time <= t to `out`, newest first (max_cand if > 0)."""
+        cut = int(np.searchsorted(dst_times, t, side="right"))
+        n = cut
+        if 0 < max_cand < n:
+            n = max_cand
+        out[:n] = dst_ids[cut - n:cut][::-1]
+        return n
+
+
+# Candidate screen run before the solver's per-candidate Python checks: drops
+# the candidates whose py_mask has no bit in common with the frame's allowed_py,
+# which the solver would skip anyway. Ids past node_py_mask (ALL_MASK) pass.
+if _HAS_NUMBA:
+    @njit("int64(int64[::1], int64, uint64[::1], uint64)", nogil=True, cache=True)
+    def _screen_py_mask(cands, n, node_py_mask, allowed_py):
+        """Keep the py-compatible cands[:n] in place, in order; return the count."""
+        m = node_py_mask.shape[0]
+        k = 0
+        for i in range(n):
+            c = cands[i]
+            if c >= m or node_py_mask[c] & allowed_py:
+                cands[k] = c
+                k += 1
+        return k
+else:
+    def _screen_py_mask(cands, n, node_py_mask, allowed_py):
+        """Keep the py-compatible cands[:n] in place, in order; return the count."""
+        ids = cands[:n]
+        keep = ids >= len(node_py_mask)
+        known = ~keep
+        keep[known] = (node_py_mask[ids[known]] & np.uint64(allowed_py)) != 0
+        k = int(keep.sum())
+        cands[:k] = ids[keep]
+        return k
+
+
 @dataclass
 class ChunkInfo:
     chunk: int
     n: int
-    min_t: Optional[int]
-    max_t: Optional[int]
+    min_t: int | None
+    max_t: int | None
+    # Parallel arrays joined in from global_graph_adj_chunks, sorted by time ascending.
+    # dst_times[i] = node_time[dst_ids[i]], unknown times as TIME_MAX (sorted last).
+    dst_ids: np.ndarray
+    dst_times: np.ndarray
 
 
 @dataclass
 class DepHeader:
     src_id: int
     dep_name_id: int
-    chunks: List[ChunkInfo]
-    min_t: Optional[int]  # overall
-    max_t: Optional[int]  # overall
+    chunks: list[ChunkInfo]
+    min_t: int | None  # overall
+    max_t: int | None  # overall
+    # All chunks merged into one time-sorted pair; built on first use by
+    # AdjStore.flat_arrays.
+    flat_dst_ids: np.ndarray | None = field(default=None, repr=False)
+    flat_dst_times: np.ndarray | None = field(default=None, repr=False)
+
+
+HEADER_PROJECTION = {
+    "src_id": 1,
+    "dep_name_id": 1,
+    "mi": 1,
+    "ma": 1,
+    "n": 1,
+    "total": 1,
+}
+
+
+def header_pipeline(
+    match: dict[str, Any], chunks_coll_name: str
+) -> list[dict[str, Any]]:
+    """
+    Aggregation that reads header docs matching `match` and joins in their
+    chunk docs as `chunk_docs: [{chunk, dst_ids}, ...]`, so one round-trip
+    returns everything needed to enumerate candidates for a (src_id, dep_name_id).
+    """
+    return [
+        {"$match": match},
+        {"$project": HEADER_PROJECTION},
+        {"$lookup": {
+            "from": chunks_coll_name,
+            "let": {"s": "$src_id", "d": "$dep_name_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$eq": ["$src_id", "$$s"]},
+                    {"$eq": ["$dep_name_id", "$$d"]},
+                ]}}},
+                {"$project": {"_id": 0, "chunk": 1, "dst_ids": 1}},
+            ],
+            "as": "chunk_docs",
+        }},
+    ]
+
+
+def dst_ids_array(raw) -> np.ndarray:
+    """
+    A chunk doc's dst_ids as an int64 array. Accepts the usual list of ints, or
+    BSON binary of packed little-endian int64s (decoded as bytes), read without
+    boxing each id.
+    """
+    if not raw:
+        return _EMPTY_IDS
+    if isinstance(raw, (bytes, bytearray, memoryview)):
+        return np.frombuffer(raw, dtype="<i8")
+    return np.asarray(raw, dtype=np.int64)
+
+
+def sort_by_time(
+    dst_ids: np.ndarray, node_time: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return (dst_ids, dst_times) as int64 arrays sorted by upload time ascending.
+    Unknown (or out-of-range) times become TIME_MAX so they sort last and never
+    pass a `<= t` cut.
+    """
+    ids = np.asarray(dst_ids, dtype=np.int64)
+    if not len(ids):
+        return _EMPTY_IDS, _EMPTY_IDS
+    times = np.full(ids.shape, TIME_MAX, dtype=np.int64)
+    in_range = ids < len(node_time)
+    times[in_range] = node_time[ids[in_range]]
+    times[times == NO_TIME] = TIME_MAX
+    order = np.argsort(times, kind="stable")
+    return ids[order], times[order]
+
+
+def parse_header_doc(doc, node_time: np.ndarray) -> DepHeader | None:
+    """
+    Parse a global_graph_adj_headers doc (optionally with joined `chunk_docs`)
+    into a DepHeader, attaching time-sorted dst_ids/dst_times to each chunk.
+    Returns None if the per-chunk arrays are missing or inconsistent.
+    """
+    mi = doc.get("mi") or []
+    ma = doc.get("ma") or []
+    nn = doc.get("n") or []
+
+    # Defensive: require consistent lengths
+    if not (isinstance(mi, list) and isinstance(ma, list) and isinstance(nn, list)):
+        return None
+
+    L = len(nn)
+    if len(mi) != L or len(ma) != L:
+        # If inconsistent, be conservative: treat as missing
+        return None
+
+    dst_by_chunk: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+    for cd in doc.get("chunk_docs") or []:
+        if cd.get("chunk") is not None:
+            dst_by_chunk[int(cd["chunk"])] = sort_by_time(
+                dst_ids_array(cd.get("dst_ids")), node_time
+            )
+
+    chunks: list[ChunkInfo] = []
+    overall_min = None
+    overall_max = None
+
+    for idx in range(L):
+        min_t = mi[idx]
+        max_t = ma[idx]
+        cnt = nn[idx]
+
+        # Convert to ints (or None)
+        min_t_i = int(min_t) if min_t is not None else None
+        max_t_i = int(max_t) if max_t is not None else None
+        cnt_i = int(cnt) if cnt is not None else 0
+
+        dst_ids, dst_times = dst_by_chunk.get(idx, (_EMPTY_IDS, _EMPTY_IDS))
+        chunks.append(ChunkInfo(
+            chunk=idx, n=cnt_i, min_t=min_t_i, max_t=max_t_i,
+            dst_ids=dst_ids, dst_times=dst_times,
+        ))
+
+        if min_t_i is not None:
+            overall_min = min_t_i if overall_min is None else min(overall_min, min_t_i)
+        if max_t_i is not None:
+            overall_max = max_t_i if overall_max is None else max(overall_max, max_t_i)
+
+    return DepHeader(
+        src_id=int(doc["src_id"]),
+        dep_name_id=int(doc["dep_name_id"]),
+        chunks=chunks,
+        min_t=overall_min,
+        max_t=overall_max,
+    )
 
 
 class AdjStore:
     """
     Fetch deps for src via global_graph_adj_headers,
     and candidate dst_ids via global_graph_adj_chunks.
+    Chunk dst_ids are joined into each header when it is read, so a cached
+    header is all that is needed to enumerate candidates.
     Uses LRU caching for:
       - deps list per src_id
-      - header per (src_id, dep_name_id)
-      - chunk docs per (src_id, dep_name_id, chunk)
+      - header (with its chunks) per (src_id, dep_name_id)
     """
     def __init__(
         self,
         headers_coll,
         chunks_coll,
-        node_time: List[Optional[int]],
+        node_time: np.ndarray,
         deps_cache_cap: int = 200_000,
         header_cache_cap: int = 200_000,
-        chunk_cache_cap: int = 200_000,
-        edgecheck_cache_cap: int = 2_000_000,
+        edgecheck_cache_cap: int = 200_000,
     ):
         self.headers = headers_coll
         self.chunks = chunks_coll
@@ -133,13 +369,13 @@ class AdjStore:
 
         self.deps_lru = LRUCache(deps_cache_cap)
         self.header_lru = LRUCache(header_cache_cap)
-        self.chunk_lru = LRUCache(chunk_cache_cap)
 
-        # Optional: cache edge-existence checks keyed by (src_id, dep_name_id, dst_id, t_bucket)
-        # to avoid repeated scans when a dep is already globally chosen.
-        self.edge_lru = LRUCache(edgecheck_cache_cap)
+        # Edge index for checks when a dep is already globally chosen, built lazily per
+        # header: (src_id, dep_name_id) -> {dst_id: upload time} over all its chunks
+        # (known times only).
+        self.edge_index_lru = LRUCache(edgecheck_cache_cap)
 
-    def get_dep_name_ids(self, src_id: int) -> List[int]:
+    def get_dep_name_ids(self, src_id: int) -> list[int]:
         """Returns all dep_name_id that src depends on. Cached by src_id."""
         cached = self.deps_lru.get(src_id)
         if cached is not None:
@@ -150,7 +386,7 @@ class AdjStore:
         self.deps_lru.put(src_id, dep_ids)
         return dep_ids
 
-    def get_header(self, src_id: int, dep_name_id: int) -> Optional[DepHeader]:
+    def get_header(self, src_id: int, dep_name_id: int) -> DepHeader | None:
         """
         Reads one header doc from global_graph_adj_headers:
 
@@ -164,6 +400,7 @@ class AdjStore:
             total: <int>      # sum(n)
         }
 
+        together with its global_graph_adj_chunks docs (see header_pipeline).
         Interprets chunk indices as 0..len(n)-1.
         """
         k = (src_id, dep_name_id)
@@ -171,94 +408,100 @@ class AdjStore:
         if cached is not None:
             return cached
 
-        doc = self.headers.find_one(
-            {"src_id": src_id, "dep_name_id": dep_name_id},
-            {"src_id": 1, "dep_name_id": 1, "mi": 1, "ma": 1, "n": 1, "total": 1},
-        )
-        if not doc:
-            self.header_lru.put(k, None)
-            return None
-
-        mi = doc.get("mi") or []
-        ma = doc.get("ma") or []
-        nn = doc.get("n") or []
-
-        # Defensive: require consistent lengths
-        if not (isinstance(mi, list) and isinstance(ma, list) and isinstance(nn, list)):
-            self.header_lru.put(k, None)
-            return None
-
-        L = len(nn)
-        if len(mi) != L or len(ma) != L:
-            # If inconsistent, be conservative: treat as missing
-            self.header_lru.put(k, None)
-            return None
-
-        chunks: List[ChunkInfo] = []
-        overall_min = None
-        overall_max = None
-
-        for idx in range(L):
-            min_t = mi[idx]
-            max_t = ma[idx]
-            cnt = nn[idx]
-
-            # Convert to ints (or None)
-            min_t_i = int(min_t) if min_t is not None else None
-            max_t_i = int(max_t) if max_t is not None else None
-            cnt_i = int(cnt) if cnt is not None else 0
-
-            chunks.append(ChunkInfo(chunk=idx, n=cnt_i, min_t=min_t_i, max_t=max_t_i))
-
-            if min_t_i is not None:
-                overall_min = min_t_i if overall_min is None else min(overall_min, min_t_i)
-            if max_t_i is not None:
-                overall_max = max_t_i if overall_max is None else max(overall_max, max_t_i)
-
-        h = DepHeader(
-            src_id=int(doc["src_id"]),
-            dep_name_id=int(doc["dep_name_id"]),
-            chunks=chunks,
-            min_t=overall_min,
-            max_t=overall_max,
+        docs = list(
+            self.headers.aggregate(
+                header_pipeline(
+                    {"src_id": src_id, "dep_name_id": dep_name_id}, self.chunks.name
+                )
+            )
         )
+        h = parse_header_doc(docs[0], self.node_time) if docs else None
         self.header_lru.put(k, h)
         return h
 
+    def prefetch_headers(self, src_ids: Iterable[int], batch_size: int = 5_000) -> int:
+        """
+        Bulk-load every header (with its chunks) of the given src_ids with one
+        aggregation per batch. Populates header_lru with parsed DepHeaders and
+        deps_lru with the dep list of each src (an empty list for srcs without
+        headers), so the DFS does not pay one round-trip per (src_id, dep_name_id).
+        Returns the number of headers loaded.
+        """
+        ids = [int(x) for x in src_ids]
+        loaded = 0
+        for b in range(0, len(ids), batch_size):
+            batch = ids[b:b + batch_size]
+            deps_by_src: dict[int, list[int]] = {s: [] for s in batch}
+            cur = self.headers.aggregate(
+                header_pipeline({"src_id": {"$in": batch}}, self.chunks.name),
+                batchSize=10_000,
+            )
+            for doc in cur:
+                src_id = int(doc["src_id"])
+                dep_name_id = int(doc["dep_name_id"])
+                deps_by_src.setdefault(src_id, []).append(dep_name_id)
+                self.header_lru.put(
+                    (src_id, dep_name_id), parse_header_doc(doc, self.node_time)
+                )
+                loaded += 1
+            for src_id, dep_ids in deps_by_src.items():
+                self.deps_lru.put(src_id, dep_ids)
+        return loaded
+
+    def get_chunk_dst_ids(
+        self, src_id: int, dep_name_id: int, chunk: int
+    ) -> np.ndarray:
+        """Time-sorted dst_ids of one chunk, from the (cached) header; no round-trip."""
+        h = self.get_header(src_id, dep_name_id)
+        if h is None or not (0 <= chunk < len(h.chunks)):
+            return _EMPTY_IDS
+        return h.chunks[chunk].dst_ids
 
-    def get_chunk_dst_ids(self, src_id: int, dep_name_id: int, chunk: int) -> List[int]:
-        k = (src_id, dep_name_id, chunk)
-        cached = self.chunk_lru.get(k)
-        if cached is not None:
-            return cached
-
-        doc = self.chunks.find_one(
-            {"src_id": src_id, "dep_name_id": dep_name_id, "chunk": chunk},
-            {"dst_ids": 1},
-        )
-        if not doc:
-            self.chunk_lru.put(k, [])
-            return []
-        dst_ids = [int(x) for x in (doc.get("dst_ids") or [])]
-        self.chunk_lru.put(k, dst_ids)
-        return dst_ids
-
-    def _bisect_right_by_time(self, dst_ids: List[int], t: int) -> int:
+    @staticmethod
+    def flat_arrays(h: DepHeader) -> tuple[np.ndarray, np.ndarray]:
         """
-        dst_ids sorted by time ascending.
-        Return i such that dst_ids[:i] have time <= t.
-        Missing time treated as invalid (excluded).
+        (dst_ids, dst_times) over all of h's chunks, time-ascending, so a query is
+        one bisect instead of one per chunk. The stable sort keeps chunk order
+        among equal times. Cached on the header, so it lives as long as the
+        header does in header_lru.
         """
-        lo, hi = 0, len(dst_ids)
-        while lo < hi:
-            mid = (lo + hi) // 2
-            nid = dst_ids[mid]
-            tm = self.node_time[nid] if nid < len(self.node_time) else None
-            if tm is None or tm > t:
-                hi = mid
+        if h.flat_dst_ids is None:
+            if len(h.chunks) == 1:
+                h.flat_dst_ids = h.chunks[0].dst_ids
+                h.flat_dst_times = h.chunks[0].dst_times
+            elif not h.chunks:
+                h.flat_dst_ids = h.flat_dst_times = _EMPTY_IDS
             else:
-                lo = mid + 1
-        return lo
+                ids = np.concatenate([ci.dst_ids for ci in h.chunks])
+                times = np.concatenate([ci.dst_times for ci in h.chunks])
+                order = np.argsort(times, kind="stable")
+                h.flat_dst_ids = ids[order]
+                h.flat_dst_times = times[order]
+        return h.flat_dst_ids, h.flat_dst_times
+
+    @staticmethod
+    def _bisect_right_by_time(ci: ChunkInfo, t: int) -> int:
+        """Return i such that ci.dst_ids[:i] are exactly the dst_ids with time <= t."""
+        return _bisect_right(ci.dst_times, t)
+
+    def _candidates(
+        self, src_id: int, dep_name_id: int, t: int, max_candidates: int
+    ) -> tuple[np.ndarray, int]:
+        """(buffer, k): buffer[:k] are the candidates with time <= t, newest first."""
+        h = self.get_header(src_id, dep_name_id)
+        if h is None or not h.chunks:
+            return _EMPTY_IDS, 0
+
+        if h.min_t is not None and h.min_t > t:
+            return _EMPTY_IDS, 0
+
+        dst_ids, dst_times = self.flat_arrays(h)
+        if not len(dst_ids):
+            return _EMPTY_IDS, 0
+
+        # own buffer per call: several candidate lists are live at once in the solver
+        out = np.empty(len(dst_ids), dtype=np.int64)
+        return out, _collect_candidates(dst_ids, dst_times, t, out, max_candidates)
 
     def iter_candidates_newest_first(
         self,
@@ -269,85 +512,75 @@ class AdjStore:
     ) -> Iterator[int]:
         """
         Yield dst node_ids for (src_id, dep_name_id) with node_time <= t,
-        newest-first. Uses chunk min/max time ranges + bisect in last chunk.
+        newest-first. One bisect over the header's flat time-sorted arrays.
         """
-        h = self.get_header(src_id, dep_name_id)
-        if h is None or not h.chunks:
-            return iter(())
-
-        if h.min_t is not None and h.min_t > t:
-            return iter(())
-
-        yielded = 0
-
-        for ci in reversed(h.chunks):
-            if ci.min_t is not None and ci.min_t > t:
-                continue
-
-            dst_ids = self.get_chunk_dst_ids(src_id, dep_name_id, ci.chunk)
-            if not dst_ids:
-                continue
-
-            if ci.max_t is not None and ci.max_t <= t:
-                cut = len(dst_ids)
-            else:
-                cut = self._bisect_right_by_time(dst_ids, t)
-
-            for i in range(cut - 1, -1, -1):
-                nid = dst_ids[i]
-                tm = self.node_time[nid] if nid < len(self.node_time) else None
-                if tm is None or tm > t:
-                    continue
-                yield nid
-                yielded += 1
-                if max_candidates and yielded >= max_candidates:
-                    return
-
-        return
+        out, k = self._candidates(src_id, dep_name_id, t, max_candidates)
+        yield from out[:k].tolist()
 
-    def edge_exists_upto_t(self, src_id: int, dep_name_id: int, dst_id: int, t: int) -> bool:
+    def screened_candidates(
+        self,
+        src_id: int,
+        dep_name_id: int,
+        t: int,
+        max_candidates: int,
+        node_py_mask: np.ndarray,
+        allowed_py: int,
+    ) -> tuple[list[int], int]:
         """
-        True iff dst_id is among candidates for (src_id, dep_name_id) with time <= t.
-        Uses header/chunks, scans eligible prefixes.
-        Cached with a coarse time bucket to avoid worst repeated rescans.
+        As iter_candidates_newest_first, with candidates sharing no Python bit with
+        allowed_py dropped by the compiled screen. Returns (candidates, count
+        before the screen) so the caller can still tell "none" from "all failed".
         """
-        # coarse bucket to increase cache hits; tune if needed
-        t_bucket = t // (24 * 3600)  # day bucket
-        key = (src_id, dep_name_id, dst_id, t_bucket)
-        hit = self.edge_lru.get(key)
-        if hit is not None:
-            return bool(hit)
+        out, k = self._candidates(src_id, dep_name_id, t, max_candidates)
+        if not k:
+            return [], 0
+        return out[:_screen_py_mask(out, k, node_py_mask, allowed_py)].tolist(), k
 
+    def estimate_candidates(self, src_id: int, dep_name_id: int, t: int) -> int:
+        """
+        Upper bound on the candidates for (src_id, dep_name_id) with time <= t:
+        sizes of the chunks whose min_t <= t (the last one may be partly newer).
+        """
         h = self.get_header(src_id, dep_name_id)
-        if h is None or not h.chunks:
-            self.edge_lru.put(key, False)
-            return False
-        if h.min_t is not None and h.min_t > t:
-            self.edge_lru.put(key, False)
-            return False
-
+        if h is None or (h.min_t is not None and h.min_t > t):
+            return 0
+        n = 0
         for ci in h.chunks:
             if ci.min_t is not None and ci.min_t > t:
                 break
+            n += ci.n
+        return n
 
-            dst_ids = self.get_chunk_dst_ids(src_id, dep_name_id, ci.chunk)
-            if not dst_ids:
-                continue
-
-            if ci.max_t is not None and ci.max_t <= t:
-                cut = len(dst_ids)
-            else:
-                cut = self._bisect_right_by_time(dst_ids, t)
-
-            # scan eligible prefix
-            for i in range(cut):
-                if dst_ids[i] == dst_id:
-                    self.edge_lru.put(key, True)
-                    return True
-
-        self.edge_lru.put(key, False)
-        return False
+    def edge_index(self, src_id: int, dep_name_id: int) -> dict[int, int]:
+        """
+        {dst_id: upload time} for every candidate of (src_id, dep_name_id) with a
+        known time, concatenated from the header's time-sorted chunk arrays.
+        Built on first use from the header's flat arrays and kept in edge_index_lru.
+        """
+        key = (src_id, dep_name_id)
+        idx = self.edge_index_lru.get(key)
+        if idx is not None:
+            return idx
 
+        h = self.get_header(src_id, dep_name_id)
+        if h is None or not h.chunks:
+            idx = {}
+        else:
+            ids, times = self.flat_arrays(h)
+            known = _bisect_right(times, TIME_MAX - 1)  # unknown times sort last
+            idx = dict(zip(ids[:known].tolist(), times[:known].tolist()))
+        self.edge_index_lru.put(key, idx)
+        return idx
+
+    def edge_exists_upto_t(
+        self, src_id: int, dep_name_id: int, dst_id: int, t: int
+    ) -> bool:
+        """
+        True iff dst_id is among candidates for (src_id, dep_name_id) with time <= t:
+        one dict probe in the (src_id, dep_name_id) edge index and a compare.
+        """
+        tm = self.edge_index(src_id, dep_name_id).get(dst_id)
+        return tm is not None and tm <= t
 
 # ----------------------------
 # Exposure solver (CSP-correct backtracking)
@@ -356,28 +589,113 @@ class AdjStore:
 @dataclass
 class SolveResult:
     ok: bool
-    depth_to_root: Optional[int]
+    depth_to_root: int | None
     fail_reason: str = ""
 
 
+# _BtFrame states
+_BT_ENTER = 0         # look at dep i
+_BT_CHOSEN_CHILD = 1  # back from solving the node of an already-chosen dep
+_BT_NEXT_CAND = 2     # try the next candidate for dep i
+_BT_CAND_CHILD = 3    # back from solving a candidate's node
+_BT_REST = 4          # back from deps i+1.. after accepting a candidate
+
+# Nogood learning: a failed frame whose subtree read more outside state than this
+# is not stored
+_NOGOOD_MAX_READS = 64
+_NOGOODS_PER_KEY = 8
+
+
+class _BtFrame:
+    """
+    One backtracking level: deps[i:] of node_id still to satisfy under allowed_py.
+
+    `reads` holds the state outside this frame's subtree that the subtree looked
+    at: name_id -> (chosen value, trail pos) and ~node_id -> (in_stack value,
+    level of the frame that pushed it). Only the first read of a key counts: a
+    later one may see a value the subtree itself bound. None when nogood
+    learning is off or the subtree read too much to be worth storing. While it is
+    set, `fails` counts the subtree's failures by reason, in order of first
+    occurrence.
+    """
+    __slots__ = (
+        "node_id", "deps", "i", "allowed_py", "depth",
+        "state", "cand_iter", "dst_id", "new_allowed", "any_tried",
+        "i0", "allowed0", "order", "level", "trail_start", "reads", "fails",
+        "mark", "saved_root_required", "saved_best_depth",
+    )
+
+    def __init__(
+        self,
+        node_id: int,
+        deps: list[int],
+        i: int,
+        allowed_py: int,
+        depth: int,
+        order: int,
+        level: int,
+        trail_start: int,
+        reads: dict[int, tuple[int, int]] | None,
+    ):
+        self.node_id = node_id
+        self.deps = deps
+        self.i = i
+        self.allowed_py = allowed_py
+        self.depth = depth  # depth_from_start of node_id
+        self.state = _BT_ENTER
+        self.cand_iter: Iterator[int] | None = None
+        self.dst_id = -1
+        self.new_allowed = 0
+        self.any_tried = False
+
+        # nogood key (i/allowed_py advance past already-chosen deps)
+        self.i0 = i
+        self.allowed0 = allowed_py
+        self.order = order              # which deps _order_deps floated to the front
+        self.level = level              # index in the frame stack
+        self.trail_start = trail_start  # len(trail) when the frame was pushed
+        self.reads = reads
+        self.fails: dict[str, int] = {}
+
+        # undo point of the candidate currently committed for deps[i]
+        self.mark = trail_start
+        self.saved_root_required = False
+        self.saved_best_depth: int | None = None
+
+
 class ExposureSolverCSP:
     """
     Global-consistency solver:
       chosen[name_id] = node_id, one version per package name globally.
+
+    `chosen` (indexed by name_id, NO_NODE when unbound) and `in_stack`
+    (indexed by node_id) are flat buffers allocated once per solver and
+    reset after every exposure() call, so one solver can be reused across
+    start nodes.
+
+    Bindings go on a trail and a rejected candidate undoes everything its
+    subtree bound. A failed frame is remembered as a nogood: its key
+    (node_id, i, allowed_py, t, dep order) plus the outside chosen/in_stack values its
+    subtree read. A later frame with the same key under the same values would
+    fail the same way, so it is not searched. Nogoods survive across exposure()
+    calls.
     """
     def __init__(
         self,
         adj: AdjStore,
-        node_py_mask: List[int],
-        node_time: List[Optional[int]],
-        node_name_id: List[Optional[int]],
+        node_py_mask: np.ndarray,
+        node_time: np.ndarray,
+        node_name_id: np.ndarray,
         all_mask: int,
         root_id: int,
         root_name_id: int,
-        start_name_id: Optional[int],
+        start_name_id: int = NO_NAME,
+        num_name_ids: int = 0,
         max_candidates_per_dep: int = 0,
+        nogood_cache_cap: int = 200_000,
+        mrv_order: bool = False,
         debug: bool = False,
-        trace_node: Optional[int] = None,
+        trace_node: int | None = None,
         trace_limit: int = 2000,
     ):
         self.adj = adj
@@ -388,6 +706,7 @@ class ExposureSolverCSP:
         self.root_id = int(root_id)
         self.root_name_id = int(root_name_id)
         self.max_candidates_per_dep = int(max_candidates_per_dep)
+        self.mrv_order = bool(mrv_order)
 
         self.debug = bool(debug)
         self.trace_node = trace_node
@@ -397,20 +716,43 @@ class ExposureSolverCSP:
         # these are set per exposure() call
         self._fail_ctr: Counter = Counter()
 
+        # pooled CSP state; plain list/bytearray indexing beats numpy scalar access here
+        if num_name_ids <= 0:
+            num_name_ids = (
+                max(int(node_name_id.max(initial=NO_NAME)), self.root_name_id) + 1
+            )
+        self._chosen: list[int] = [NO_NODE] * num_name_ids
+        self._in_stack = bytearray(len(node_time))
+        self._chosen_pos: list[int] = [0] * num_name_ids  # trail index of each binding
+        self._trail: list[int] = []  # bound name_ids in binding order
+        self._stack_at: dict[
+            int, int
+        ] = {}  # in-stack node -> level of the frame that pushed it
+
+        # (node_id, i, allowed_py, t, order)
+        #     -> [(((read_key, value), ...), ((reason, count), ...)), ...], newest first
+        self.nogoods = LRUCache(nogood_cache_cap)
+
+        # node_id -> deps sorted by estimated candidates <= t; valid for one
+        # exposure() call
+        self._order_cache: dict[int, list[int]] = {}
+
     def _pmask(self, nid: int) -> int:
         if nid < len(self.node_py_mask):
             return int(self.node_py_mask[nid])
         return int(self.all_mask)
 
-    def _ntime(self, nid: int) -> Optional[int]:
+    def _ntime(self, nid: int) -> int:
+        """Upload time of nid, or NO_TIME if unknown."""
         if nid < len(self.node_time):
             return self.node_time[nid]
-        return None
+        return NO_TIME
 
-    def _nname(self, nid: int) -> Optional[int]:
+    def _nname(self, nid: int) -> int:
+        """name_id of nid, or NO_NAME if unknown."""
         if nid < len(self.node_name_id):
-            return self.node_name_id[nid]
-        return None
+            return int(self.node_name_id[nid])
+        return NO_NAME
 
     def _trace(self, msg: str):
         if not self.debug:
@@ -433,7 +775,7 @@ class ExposureSolverCSP:
             return SolveResult(True, 0, "")
 
         tm0 = self._ntime(start_id)
-        if tm0 is None:
+        if tm0 == NO_TIME:
             self._fail_ctr["start_time_missing"] += 1
             return SolveResult(False, None, "start_time_missing")
         if tm0 > t:
@@ -446,45 +788,61 @@ class ExposureSolverCSP:
             return SolveResult(False, None, "start_pymask_zero")
 
         start_name_id = self._nname(start_id)
-        if start_name_id is None:
+        if start_name_id == NO_NAME:
             # conservative: if we can't identify name, cannot enforce global consistency
             self._fail_ctr["start_name_missing"] += 1
             return SolveResult(False, None, "start_name_missing")
 
+        # Global python intersection across chosen vars
+        allowed_py = m0 & self._pmask(self.root_id)
+        if allowed_py == 0:
+            self._fail_ctr["root_pymask_conflict_at_start"] += 1
+            return SolveResult(False, None, "root_pymask_conflict_at_start")
+
         # Global state for CSP
-        chosen: Dict[int, int] = {}
-        in_stack: Set[int] = set()
+        chosen = self._chosen
+        in_stack = self._in_stack
+        trail = self._trail
+        chosen_pos = self._chosen_pos
 
         # Pin start package name to this exact version node_id
         chosen[start_name_id] = start_id
+        chosen_pos[start_name_id] = len(trail)
+        trail.append(start_name_id)
 
         # Pin root package name to root_id (but "root_required" must become True for success)
         chosen[self.root_name_id] = self.root_id
+        chosen_pos[self.root_name_id] = len(trail)
+        trail.append(self.root_name_id)
 
-        # Global python intersection across chosen vars
-        allowed_py = m0 & self._pmask(self.root_id)
-        if allowed_py == 0:
-            self._fail_ctr["root_pymask_conflict_at_start"] += 1
-            return SolveResult(False, None, "root_pymask_conflict_at_start")
-
-        in_stack.add(start_id)
+        in_stack[start_id] = 1
+        self._stack_at[start_id] = -1
 
-        root_required = False
-        best_depth: Optional[int] = None
+        root_required_ref = [False]                   # boxed bool
+        best_depth_ref: list[int | None] = [None]  # boxed Optional[int]
 
-        ok = self._solve_node(
-            node_id=start_id,
-            t=t,
-            chosen=chosen,
-            allowed_py=allowed_py,
-            in_stack=in_stack,
-            depth_from_start=0,
-            root_required_ref=[root_required],  # boxed bool
-            best_depth_ref=[best_depth],        # boxed Optional[int]
-        )
-
-        root_required = bool(ok and self._last_root_required)
-        best_depth = self._last_best_depth
+        try:
+            ok = self._solve_node(
+                node_id=start_id,
+                t=t,
+                chosen=chosen,
+                allowed_py=allowed_py,
+                in_stack=in_stack,
+                depth_from_start=0,
+                root_required_ref=root_required_ref,
+                best_depth_ref=best_depth_ref,
+            )
+        finally:
+            # reset only what this call touched
+            for name_id in trail:
+                chosen[name_id] = NO_NODE
+            trail.clear()
+            in_stack[start_id] = 0
+            self._stack_at.clear()
+            self._order_cache.clear()
+
+        root_required = bool(ok and root_required_ref[0])
+        best_depth = best_depth_ref[0]
 
         if ok and root_required and best_depth is not None:
             return SolveResult(True, best_depth, "")
@@ -499,168 +857,473 @@ class ExposureSolverCSP:
         self,
         node_id: int,
         t: int,
-        chosen: Dict[int, int],
+        chosen: list[int],
         allowed_py: int,
-        in_stack: Set[int],
+        in_stack: bytearray,
         depth_from_start: int,
-        root_required_ref: List[bool],
-        best_depth_ref: List[Optional[int]],
+        root_required_ref: list[bool],
+        best_depth_ref: list[int | None],
     ) -> bool:
         """
         Ensure node_id's dependencies are satisfiable under global `chosen`.
         Returns True if satisfiable and root_required becomes True somewhere in closure.
         Updates best_depth_ref with minimal depth-to-root discovered.
-        """
-        # store back out for exposure()
-        self._last_root_required = root_required_ref[0]
-        self._last_best_depth = best_depth_ref[0]
 
-        dep_name_ids = self.adj.get_dep_name_ids(node_id)
+        The backtracking over each node's deps runs on an explicit stack of
+        _BtFrame (one per dep level being tried) rather than recursion; `ret`
+        carries a finished frame's result back to the frame below it. Each
+        node's deps are tried in header order, or in MRV order with mrv_order
+        (see _order_deps).
+        """
+        adj = self.adj
+        count_fail = self._count_fail
+        root_id = self.root_id
+        root_name_id = self.root_name_id
+        trail = self._trail
+        chosen_pos = self._chosen_pos
+        stack_at = self._stack_at
+        learn = self.nogoods.cap > 0
+        ntime = self._ntime
+        pmask = self._pmask
+        edge_exists = adj.edge_exists_upto_t
+        get_deps = adj.get_dep_name_ids
+        push_frame = self._push_frame
+        pop_frame = self._pop_frame
+        max_candidates = self.max_candidates_per_dep
+        node_py_mask = self.node_py_mask
+
+        dep_name_ids = get_deps(node_id)
 
         # If this node has no outgoing deps, it is satisfiable, but may not force root
         if not dep_name_ids:
             return True
 
-        # We'll backtrack over dep_name_ids in order
-        dep_ids = dep_name_ids
+        deps, order = self._order_deps(node_id, dep_name_ids, t)
+        stack: list[_BtFrame] = [
+            _BtFrame(
+                node_id,
+                deps,
+                0,
+                allowed_py,
+                depth_from_start,
+                order,
+                0,
+                len(trail),
+                {} if learn else None,
+            )
+        ]
+        ret = False
 
-        def bt(i: int, allowed_py_local: int) -> bool:
-            # persist for exposure()
-            self._last_root_required = root_required_ref[0]
-            self._last_best_depth = best_depth_ref[0]
+        while stack:
+            f = stack[-1]
+            state = f.state
 
-            if i == len(dep_ids):
-                return True
+            if state == _BT_ENTER:
+                if f.i == len(f.deps):
+                    ret = True
+                    pop_frame(stack, f, t, "")
+                    continue
 
-            dep_name_id = dep_ids[i]
+                dep_name_id = f.deps[f.i]
+                reads = f.reads
 
-            # Mark that this assignment requires root if we see root package as a dependency
-            if dep_name_id == self.root_name_id:
-                root_required_ref[0] = True
-                self._last_root_required = True
+                # Mark that this assignment requires root if we see root package as a
+                # dependency
+                if dep_name_id == root_name_id:
+                    root_required_ref[0] = True
 
-            # If dep already globally chosen, validate edge and recurse into that chosen node
-            if dep_name_id in chosen:
                 dst_id = chosen[dep_name_id]
+                if reads is not None and dep_name_id not in reads:
+                    reads[dep_name_id] = (
+                        dst_id,
+                        chosen_pos[dep_name_id] if dst_id != NO_NODE else -1,
+                    )
+
+                # If dep already globally chosen, validate edge and recurse into that
+                # chosen node
+                if dst_id != NO_NODE:
+
+                    # must exist by time t
+                    tm = ntime(dst_id)
+                    if tm == NO_TIME or tm > t:
+                        count_fail(f, "chosen_dst_time_invalid")
+                        ret = False
+                        pop_frame(stack, f, t, "chosen_dst_time_invalid")
+                        continue
+
+                    # must be reachable via an edge from this node version to that
+                    # chosen version
+                    if not edge_exists(f.node_id, dep_name_id, dst_id, t):
+                        count_fail(f, "edge_missing_for_chosen")
+                        ret = False
+                        pop_frame(stack, f, t, "edge_missing_for_chosen")
+                        continue
+
+                    # python compatibility
+                    new_allowed = f.allowed_py & pmask(dst_id)
+                    if new_allowed == 0:
+                        count_fail(f, "python_conflict_with_chosen")
+                        ret = False
+                        pop_frame(stack, f, t, "python_conflict_with_chosen")
+                        continue
+
+                    on_stack = in_stack[dst_id]
+                    if reads is not None and ~dst_id not in reads:
+                        reads[~dst_id] = (
+                            on_stack,
+                            stack_at[dst_id] if on_stack else -1,
+                        )
+
+                    if on_stack:
+                        # cycle is okay (already assigned), treat as satisfied: advance
+                        # to next dep
+                        f.i += 1
+                        f.allowed_py = new_allowed
+                        continue
+
+                    in_stack[dst_id] = 1
+                    stack_at[dst_id] = f.level
+                    f.dst_id = dst_id
+                    f.new_allowed = new_allowed
+                    f.state = _BT_CHOSEN_CHILD
+                    child_deps = get_deps(dst_id)
+                    if child_deps:
+                        ret = push_frame(
+                            stack, f, dst_id, child_deps, 0, new_allowed, f.depth + 1, t
+                        )
+                    else:
+                        ret = True
+                    continue
 
-                # must exist by time t
-                tm = self._ntime(dst_id)
-                if tm is None or tm > t:
-                    self._fail_ctr["chosen_dst_time_invalid"] += 1
-                    return False
-
-                # must be reachable via an edge from this node version to that chosen version
-                if not self.adj.edge_exists_upto_t(node_id, dep_name_id, dst_id, t):
-                    self._fail_ctr["edge_missing_for_chosen"] += 1
-                    return False
-
-                # python compatibility
-                new_allowed = allowed_py_local & self._pmask(dst_id)
-                if new_allowed == 0:
-                    self._fail_ctr["python_conflict_with_chosen"] += 1
-                    return False
+                # Otherwise, choose a candidate version for this dependency package
+                # Root forcing: if dep is root package, ONLY candidate is root_id
+                if dep_name_id == root_name_id:
+                    f.cand_iter = iter([root_id])
+                else:
+                    cands, n_raw = adj.screened_candidates(
+                        f.node_id,
+                        dep_name_id,
+                        t,
+                        max_candidates,
+                        node_py_mask,
+                        f.allowed_py,
+                    )
+                    # screened-out candidates count as tried, as when the loop
+                    # skipped them
+                    f.any_tried = n_raw > 0
+                    f.cand_iter = iter(cands)
+                f.state = _BT_NEXT_CAND
+                continue
 
-                if dst_id in in_stack:
-                    # cycle is okay (already assigned), treat as satisfied
-                    return bt(i + 1, new_allowed)
-
-                in_stack.add(dst_id)
-                ok_child = self._solve_node(
-                    node_id=dst_id,
-                    t=t,
-                    chosen=chosen,
-                    allowed_py=new_allowed,
-                    in_stack=in_stack,
-                    depth_from_start=depth_from_start + 1,
-                    root_required_ref=root_required_ref,
-                    best_depth_ref=best_depth_ref,
-                )
-                in_stack.remove(dst_id)
+            if state == _BT_CHOSEN_CHILD:
+                in_stack[f.dst_id] = 0
 
-                if not ok_child:
-                    self._fail_ctr["child_unsat_with_chosen"] += 1
-                    return False
+                if not ret:
+                    count_fail(f, "child_unsat_with_chosen")
+                    pop_frame(stack, f, t, "child_unsat_with_chosen")
+                    continue
 
                 # depth accounting if this chosen is root_id
-                if dst_id == self.root_id:
-                    d = depth_from_start + 1
+                if f.dst_id == root_id:
+                    d = f.depth + 1
                     bd = best_depth_ref[0]
                     if bd is None or d < bd:
                         best_depth_ref[0] = d
-                        self._last_best_depth = d
 
-                return bt(i + 1, new_allowed)
+                f.i += 1
+                f.allowed_py = f.new_allowed
+                f.state = _BT_ENTER
+                continue
 
-            # Otherwise, choose a candidate version for this dependency package
-            # Root forcing: if dep is root package, ONLY candidate is root_id
-            if dep_name_id == self.root_name_id:
-                cand_iter = iter([self.root_id])
-            else:
-                cand_iter = self.adj.iter_candidates_newest_first(
-                    node_id, dep_name_id, t, max_candidates=self.max_candidates_per_dep
-                )
+            if state == _BT_NEXT_CAND:
+                dep_name_id = f.deps[f.i]
+                reads = f.reads
+                for dst_id in f.cand_iter:
+                    f.any_tried = True
+                    dst_id = int(dst_id)
+
+                    # existence <= t (defensive; iterator should ensure)
+                    tm = ntime(dst_id)
+                    if tm == NO_TIME or tm > t:
+                        continue
+
+                    # python
+                    new_allowed = f.allowed_py & pmask(dst_id)
+                    if new_allowed == 0:
+                        continue
+
+                    # cycle check
+                    if reads is not None and ~dst_id not in reads:
+                        reads[~dst_id] = (
+                            (1, stack_at[dst_id]) if in_stack[dst_id] else (0, -1)
+                        )
+                    if in_stack[dst_id]:
+                        continue
+
+                    # forward check: dst's already-chosen deps must be usable from dst,
+                    # else dst's frame would fail on reaching them. Every dep looked at
+                    # is a read: whether the check passes depends on all of them.
+                    child_deps = get_deps(dst_id)
+                    fc_fail = ""
+                    for d in child_deps:
+                        c = chosen[d]
+                        if reads is not None and d not in reads:
+                            reads[d] = (c, chosen_pos[d] if c != NO_NODE else -1)
+                        if c == NO_NODE:
+                            continue
+                        tm = ntime(c)
+                        if tm == NO_TIME or tm > t:
+                            fc_fail = "chosen_dst_time_invalid"
+                        elif not edge_exists(dst_id, d, c, t):
+                            fc_fail = "edge_missing_for_chosen"
+                        elif new_allowed & pmask(c) == 0:
+                            fc_fail = "python_conflict_with_chosen"
+                        else:
+                            continue
+                        break
+                    if fc_fail:
+                        count_fail(f, fc_fail)
+                        continue
+
+                    # Commit global choice for this package name, then solve dst
+                    f.mark = len(trail)
+                    f.saved_root_required = root_required_ref[0]
+                    f.saved_best_depth = best_depth_ref[0]
+                    chosen[dep_name_id] = dst_id
+                    chosen_pos[dep_name_id] = len(trail)
+                    trail.append(dep_name_id)
+
+                    in_stack[dst_id] = 1
+                    stack_at[dst_id] = f.level
+                    f.dst_id = dst_id
+                    f.new_allowed = new_allowed
+                    f.state = _BT_CAND_CHILD
+                    if child_deps:
+                        ret = push_frame(
+                            stack, f, dst_id, child_deps, 0, new_allowed, f.depth + 1, t
+                        )
+                    else:
+                        ret = True
+                    break
+                else:
+                    reason = (
+                        "all_candidates_failed_for_dep"
+                        if f.any_tried
+                        else "no_candidates_for_dep"
+                    )
+                    count_fail(f, reason)
+                    ret = False
+                    pop_frame(stack, f, t, reason)
+                continue
 
-            any_tried = False
+            if state == _BT_CAND_CHILD:
+                in_stack[f.dst_id] = 0
 
-            for dst_id in cand_iter:
-                any_tried = True
-                dst_id = int(dst_id)
+                if ret:
+                    # depth if root
+                    if f.dst_id == root_id:
+                        d = f.depth + 1
+                        bd = best_depth_ref[0]
+                        if bd is None or d < bd:
+                            best_depth_ref[0] = d
 
-                # existence <= t (defensive; iterator should ensure)
-                tm = self._ntime(dst_id)
-                if tm is None or tm > t:
+                    # Now satisfy remaining deps at this node
+                    f.state = _BT_REST
+                    if f.i + 1 < len(f.deps):
+                        ret = push_frame(
+                            stack,
+                            f,
+                            f.node_id,
+                            f.deps,
+                            f.i + 1,
+                            f.new_allowed,
+                            f.depth,
+                            t,
+                        )
                     continue
 
-                # python
-                new_allowed = allowed_py_local & self._pmask(dst_id)
-                if new_allowed == 0:
-                    continue
+                # Backtrack global choice (and everything the candidate's subtree bound)
+                self._undo_candidate(f, root_required_ref, best_depth_ref)
+                f.state = _BT_NEXT_CAND
+                continue
 
-                # cycle check
-                if dst_id in in_stack:
-                    continue
+            # _BT_REST: remaining deps after an accepted candidate
+            if ret:
+                pop_frame(stack, f, t, "")
+                continue
 
-                # Commit global choice for this package name
-                chosen[dep_name_id] = dst_id
-                in_stack.add(dst_id)
-
-                # Recurse into dst
-                ok_child = self._solve_node(
-                    node_id=dst_id,
-                    t=t,
-                    chosen=chosen,
-                    allowed_py=new_allowed,
-                    in_stack=in_stack,
-                    depth_from_start=depth_from_start + 1,
-                    root_required_ref=root_required_ref,
-                    best_depth_ref=best_depth_ref,
-                )
+            # Backtrack global choice (and everything the candidate's subtree bound)
+            self._undo_candidate(f, root_required_ref, best_depth_ref)
+            f.state = _BT_NEXT_CAND
 
-                in_stack.remove(dst_id)
+        return ret
 
-                if ok_child:
-                    # depth if root
-                    if dst_id == self.root_id:
-                        d = depth_from_start + 1
-                        bd = best_depth_ref[0]
-                        if bd is None or d < bd:
-                            best_depth_ref[0] = d
-                            self._last_best_depth = d
+    def _count_fail(self, f: _BtFrame, reason: str, n: int = 1):
+        """
+        Count a failure in f's subtree, in the call's counter and (while f can become
+        a nogood) in f.fails.
+        """
+        self._fail_ctr[reason] += n
+        if f.reads is not None:
+            fails = f.fails
+            fails[reason] = fails.get(reason, 0) + n
 
-                    # Now satisfy remaining deps at this node
-                    if bt(i + 1, new_allowed):
-                        return True
+    def _undo_candidate(
+        self,
+        f: _BtFrame,
+        root_required_ref: list[bool],
+        best_depth_ref: list[int | None],
+    ):
+        """Unbind everything bound since f committed its current candidate."""
+        chosen = self._chosen
+        trail = self._trail
+        for name_id in trail[f.mark:]:
+            chosen[name_id] = NO_NODE
+        del trail[f.mark:]
+        root_required_ref[0] = f.saved_root_required
+        best_depth_ref[0] = f.saved_best_depth
+
+    def _order_deps(
+        self, node_id: int, deps: list[int], t: int
+    ) -> tuple[list[int], int]:
+        """
+        MRV order for node_id's deps: already-chosen deps first (nothing to branch
+        on), then the rest by fewest estimated candidates <= t. Also returns the
+        bitmask, over the estimate order, of the deps floated to the front; it is
+        part of the nogood key because it decides what deps[i:] means.
+
+        Without mrv_order, deps are returned as listed in the header (mask 0).
+        MRV is experimental and opt-in because the search is incomplete: a
+        different dep order can change exposed, depth_to_root and fail_reason.
+        """
+        if not self.mrv_order:
+            return deps, 0
+        base = self._order_cache.get(node_id)
+        if base is None:
+            adj = self.adj
+            base = sorted(deps, key=lambda d: adj.estimate_candidates(node_id, d, t))
+            self._order_cache[node_id] = base
+
+        chosen = self._chosen
+        front: list[int] = []
+        rest: list[int] = []
+        floated = 0
+        for j, d in enumerate(base):
+            if chosen[d] != NO_NODE:
+                front.append(d)
+                floated |= 1 << j
+            else:
+                rest.append(d)
+        if not floated:
+            return base, 0
+        front.extend(rest)
+        return front, floated
+
+    def _push_frame(
+        self,
+        stack: list[_BtFrame],
+        parent: _BtFrame,
+        node_id: int,
+        deps: list[int],
+        i: int,
+        allowed_py: int,
+        depth: int,
+        t: int,
+    ) -> bool:
+        """
+        Push a frame for deps[i:] of node_id, unless a stored nogood says it fails
+        under the current state. Returns False on a nogood hit: the nogood's reads
+        and failure counts are added to parent's as if the frame had been searched
+        and failed, so fail_reason comes out as without the nogood.
+
+        At i == 0 `deps` is node_id's raw dep list and gets ordered here; at
+        i > 0 it is parent's (same node) already-ordered list. An MRV order
+        depends on which of the deps are chosen, so those are reads of parent.
+        """
+        if i == 0:
+            if self.mrv_order and parent.reads is not None:
+                preads = parent.reads
+                chosen = self._chosen
+                chosen_pos = self._chosen_pos
+                for d in deps:
+                    if d not in preads:
+                        c = chosen[d]
+                        preads[d] = (c, chosen_pos[d] if c != NO_NODE else -1)
+            deps, order = self._order_deps(node_id, deps, t)
+        else:
+            order = parent.order
+        lst = self.nogoods.get((node_id, i, allowed_py, t, order))
+        if lst:
+            chosen = self._chosen
+            in_stack = self._in_stack
+            for ng_reads, ng_fails in lst:
+                for k, v in ng_reads:
+                    if k >= 0:
+                        if chosen[k] != v:
+                            break
+                    elif in_stack[~k] != v:
+                        break
+                else:
+                    for reason, n in ng_fails:
+                        self._count_fail(parent, reason, n)
+                    preads = parent.reads
+                    if preads is not None:
+                        chosen_pos = self._chosen_pos
+                        stack_at = self._stack_at
+                        for k, v in ng_reads:
+                            if k >= 0:
+                                pos = chosen_pos[k] if v != NO_NODE else -1
+                                if pos < parent.trail_start and k not in preads:
+                                    preads[k] = (v, pos)
+                            else:
+                                lvl = stack_at[~k] if v else -1
+                                if lvl < parent.level and k not in preads:
+                                    preads[k] = (v, lvl)
+                    return False
 
-                # Backtrack global choice
-                chosen.pop(dep_name_id, None)
+        stack.append(_BtFrame(
+            node_id, deps, i, allowed_py, depth, order, len(stack), len(self._trail),
+            {} if self.nogoods.cap > 0 else None,
+        ))
+        return True
 
-            if not any_tried:
-                self._fail_ctr["no_candidates_for_dep"] += 1
+    def _pop_frame(self, stack: list[_BtFrame], f: _BtFrame, t: int, fail_reason: str):
+        """
+        Pop finished frame f. On failure record its nogood; either way hand the
+        reads that are outside the parent's subtree down to the parent.
+        """
+        stack.pop()
+        reads = f.reads
+        if reads is not None and len(reads) > _NOGOOD_MAX_READS:
+            reads = None
+
+        if fail_reason and reads is not None:
+            key = (f.node_id, f.i0, f.allowed0, t, f.order)
+            ng = (tuple((k, v[0]) for k, v in reads.items()), tuple(f.fails.items()))
+            lst = self.nogoods.get(key)
+            if lst is None:
+                self.nogoods.put(key, [ng])
             else:
-                self._fail_ctr["all_candidates_failed_for_dep"] += 1
-            return False
+                lst.insert(0, ng)
+                del lst[_NOGOODS_PER_KEY:]
 
-        return bt(0, allowed_py)
+        if not stack:
+            return
+        parent = stack[-1]
+        preads = parent.reads
+        if preads is None:
+            return
+        if reads is None:
+            parent.reads = None
+            return
+        trail_start = parent.trail_start
+        level = parent.level
+        for k, v in reads.items():
+            if v[1] < (trail_start if k >= 0 else level) and k not in preads:
+                preads[k] = v
+        pfails = parent.fails
+        for reason, n in f.fails.items():
+            pfails[reason] = pfails.get(reason, 0) + n
 
 
 # ----------------------------
@@ -670,6 +1333,14 @@ class ExposureSolverCSP:
 def parse_args():
     ap = argparse.ArgumentParser()
     ap.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    ap.add_argument(
+        "--compressors",
+        default="zstd,zlib",
+        help=(
+            "Wire compression offered to the server, in preference order; "
+            "empty = none."
+        ),
+    )
     ap.add_argument("--pypi-db", default="pypi_dump")
     ap.add_argument("--subgraphs-db", default="subgraphs")
 
@@ -697,14 +1368,58 @@ def parse_args():
     # caches
     ap.add_argument("--deps-cache-cap", type=int, default=200_000)
     ap.add_argument("--header-cache-cap", type=int, default=200_000)
-    ap.add_argument("--chunk-cache-cap", type=int, default=200_000)
-    ap.add_argument("--edgecheck-cache-cap", type=int, default=2_000_000)
+    ap.add_argument("--edgecheck-cache-cap", type=int, default=200_000,
+                    help="(src, dep) edge indexes kept for already-chosen edge checks.")
+    ap.add_argument(
+        "--nogood-cache-cap",
+        type=int,
+        default=200_000,
+        help=(
+            "Failed (node, dep index, python mask, t) subproblems remembered; "
+            "0 = no nogood learning."
+        ),
+    )
 
     # solver knobs
     ap.add_argument("--max-candidates-per-dep", type=int, default=0,
                     help="0 = no limit; else try only newest K candidates per dependency.")
+    ap.add_argument(
+        "--mrv-order",
+        action="store_true",
+        help="Experimental: try each node's deps chosen-first, then fewest candidates "
+        "first, instead of header order. Usually faster, but can change "
+        "exposed/depth/fail_reason.",
+    )
     ap.add_argument("--subgraph-batch-size", type=int, default=100_000)
+    ap.add_argument(
+        "--prefetch-batch-size",
+        type=int,
+        default=5_000,
+        help=(
+            "src_ids per bulk header prefetch query; 0 = no prefetch "
+            "(load on demand)."
+        ),
+    )
     ap.add_argument("--progress-every", type=int, default=50_000)
+    ap.add_argument(
+        "--no-reach-precheck",
+        action="store_true",
+        help=(
+            "Run the solver on every node, even those with no time-respecting "
+            "path to root."
+        ),
+    )
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=(
+            "Processes solving nodes in parallel (fork; each opens its own "
+            "MongoClient). 1 = in-process."
+        ),
+    )
+    ap.add_argument("--worker-chunksize", type=int, default=500,
+                    help="Nodes handed to a worker per task when --workers > 1.")
 
     # debug
     ap.add_argument("--debug", action="store_true", help="Enable debug reason counters + optional tracing.")
@@ -715,7 +1430,9 @@ def parse_args():
     return ap.parse_args()
 
 
-def load_root_from_meta(meta_coll, subgraph_name: str, root_bit_index: Optional[int]) -> Tuple[str, str, int, int, int]:
+def load_root_from_meta(
+    meta_coll, subgraph_name: str, root_bit_index: int | None
+) -> tuple[str, str, int, int, int]:
     """
     Returns: (root_pkg, root_ver, bit_index, root_id, nbits)
     """
@@ -745,11 +1462,45 @@ def load_root_from_meta(meta_coll, subgraph_name: str, root_bit_index: Optional[
     return str(root_pkg), root_ver, bit_index, root_id, nbits
 
 
-def load_name_to_id(nameids_coll) -> Dict[str, int]:
+def open_client(mongo_uri: str, compressors: str) -> MongoClient:
+    """
+    MongoClient with wire compression for the bulk loads. pymongo drops (with a
+    warning) compressors whose module is missing, e.g. zstd without `zstandard`.
+    """
+    if compressors:
+        return MongoClient(mongo_uri, compressors=compressors)
+    return MongoClient(mongo_uri)
+
+
+def iter_raw_batches(cursor) -> Iterator[dict[str, Any]]:
+    """
+    Docs from a find_raw_batches/aggregate_raw_batches cursor. Each batch arrives
+    as one BSON buffer and is decoded in a single bson.decode_all call, skipping
+    the regular cursor's per-document machinery.
+    """
+    try:
+        for batch in cursor:
+            yield from bson.decode_all(batch)
+    finally:
+        try:
+            cursor.close()
+        except Exception:
+            pass
+
+
+# Bulk loaders report progress once per block of docs, not per doc
+LOAD_PROGRESS_EVERY = 200_000
+
+
+def _report_load(what: str, n: int, t0: float):
+    print(f"[load] {what}: {n:,} docs ({n / max(time.time() - t0, 1e-9):,.0f} docs/s)")
+
+
+def load_name_to_id(nameids_coll) -> dict[str, int]:
     """global_graph_name_ids docs: { name: <canonical>, id: <int> }"""
-    m: Dict[str, int] = {}
-    cur = nameids_coll.find({}, {"name": 1, "id": 1}).batch_size(50_000)
-    for d in cur:
+    m: dict[str, int] = {}
+    cur = nameids_coll.find_raw_batches({}, {"name": 1, "id": 1}).batch_size(50_000)
+    for d in iter_raw_batches(cur):
         nm = d.get("name")
         i = d.get("id")
         if nm is None or i is None:
@@ -758,53 +1509,79 @@ def load_name_to_id(nameids_coll) -> Dict[str, int]:
     return m
 
 
-def load_node_masks_and_times(rp_coll) -> Tuple[List[int], List[Optional[int]], int]:
+def load_node_masks_and_times(rp_coll) -> tuple[np.ndarray, np.ndarray, int]:
     """
     rp docs:
       { _id: <node_id>, py_mask: <int>, first_upload_time: <datetime or None> }
     Returns:
-      node_py_mask: list indexed by node_id (missing => ALL_MASK)
-      node_time: list indexed by node_id (missing => None)
+      node_py_mask: uint64 array indexed by node_id (missing => ALL_MASK)
+      node_time: int64 array indexed by node_id (missing => NO_TIME)
       all_mask: int computed as bitwise OR over observed masks (fallback if empty)
+
+    One pass over rp_coll: ids/values are packed into typed arrays while
+    max_id and all_mask are computed inline, then scattered with np.put.
     """
     max_id = 0
     all_mask = 0
 
-    cur = rp_coll.find({}, {"_id": 1, "py_mask": 1}).batch_size(100_000)
-    for d in cur:
+    mask_ids = array("q")
+    masks = array("Q")
+    time_ids = array("q")
+    times = array("q")
+    cur = rp_coll.find_raw_batches(
+        {}, {"_id": 1, "py_mask": 1, "first_upload_time": 1}
+    ).batch_size(200_000)
+    for d in iter_raw_batches(cur):
         nid = int(d["_id"])
         if nid > max_id:
             max_id = nid
         pm = d.get("py_mask")
         if pm is not None:
-            all_mask |= int(pm)
+            pm = int(pm)
+            all_mask |= pm
+            mask_ids.append(nid)
+            masks.append(pm)
+        tm = epoch_from_dt_maybe(d.get("first_upload_time"))
+        if tm is not None:
+            time_ids.append(nid)
+            times.append(tm)
 
     if all_mask == 0:
         all_mask = (1 << 26) - 1
 
-    node_py_mask = [all_mask] * (max_id + 1)
-    node_time: List[Optional[int]] = [None] * (max_id + 1)
-
-    cur2 = rp_coll.find({}, {"_id": 1, "py_mask": 1, "first_upload_time": 1}).batch_size(100_000)
-    for d in cur2:
-        nid = int(d["_id"])
-        pm = d.get("py_mask")
-        if pm is not None:
-            node_py_mask[nid] = int(pm)
-        node_time[nid] = epoch_from_dt_maybe(d.get("first_upload_time"))
-
+    node_py_mask = np.full(max_id + 1, all_mask, dtype=np.uint64)
+    node_time = np.full(max_id + 1, NO_TIME, dtype=np.int64)
+    np.put(
+        node_py_mask,
+        np.frombuffer(mask_ids, dtype=np.int64),
+        np.frombuffer(masks, dtype=np.uint64),
+    )
+    np.put(
+        node_time,
+        np.frombuffer(time_ids, dtype=np.int64),
+        np.frombuffer(times, dtype=np.int64),
+    )
     return node_py_mask, node_time, all_mask
 
 
-def load_nodeid_to_nameid(nodeids_coll, name_to_id: Dict[str, int], max_node_id: int) -> List[Optional[int]]:
+def load_nodeid_to_nameid(
+    nodeids_coll, name_to_id: dict[str, int], max_node_id: int
+) -> np.ndarray:
     """
-    Build node_id -> name_id array using global_graph_node_ids:
+    Build node_id -> name_id array (int32, missing => NO_NAME) using
+    global_graph_node_ids:
       { name: <canonical>, version: <str>, id: <int node_id> }
     We only need name_id, so we map name via name_to_id.
     """
-    arr: List[Optional[int]] = [None] * (max_node_id + 1)
-    cur = nodeids_coll.find({}, {"id": 1, "name": 1}).batch_size(200_000)
-    for d in tqdm(cur, desc="Load node_id -> name_id"):
+    arr = np.full(max_node_id + 1, NO_NAME, dtype=np.int32)
+    ids: list[int] = []
+    name_ids: list[int] = []
+    cur = nodeids_coll.find_raw_batches({}, {"id": 1, "name": 1}).batch_size(200_000)
+    t0 = time.time()
+    n = 0
+    for n, d in enumerate(iter_raw_batches(cur), 1):
+        if n % LOAD_PROGRESS_EVERY == 0:
+            _report_load("node_id -> name_id", n, t0)
         nid = d.get("id")
         nm = d.get("name")
         if nid is None or nm is None:
@@ -813,41 +1590,189 @@ def load_nodeid_to_nameid(nodeids_coll, name_to_id: Dict[str, int], max_node_id:
         if 0 <= nid <= max_node_id:
             name_id = name_to_id.get(str(nm))
             if name_id is not None:
-                arr[nid] = int(name_id)
+                ids.append(nid)
+                name_ids.append(int(name_id))
+    _report_load("node_id -> name_id", n, t0)
+    arr[np.asarray(ids, dtype=np.int64)] = np.asarray(name_ids, dtype=np.int32)
     return arr
 
 
-def collect_subgraph_nodes_for_bit(subgraph_coll, bit_index: int, mask_field: str, batch_size: int) -> Set[int]:
+def collect_subgraph_nodes_for_bit(
+    subgraph_coll, bit_index: int, mask_field: str, batch_size: int
+) -> np.ndarray:
     """
-    Collect unique node_ids in a root-version subgraph by streaming edges.
+    Collect unique node_ids in a root-version subgraph, deduplicated server-side.
     Edge docs: { src_id, dst_id, roots_bits }
-    """
-    q = {mask_field: {"$bitsAllSet": [bit_index]}}
-    proj = {"src_id": 1, "dst_id": 1}
-    nodes: Set[int] = set()
+    Returns a sorted int64 array.
 
-    cur = subgraph_coll.find(q, proj, no_cursor_timeout=True).batch_size(batch_size)
-    try:
-        for e in tqdm(cur, desc=f"Stream subgraph edges (bit={bit_index}) collect nodes"):
-            s = e.get("src_id")
-            d = e.get("dst_id")
-            if s is not None:
-                nodes.add(int(s))
-            if d is not None:
-                nodes.add(int(d))
-    finally:
-        try:
-            cur.close()
-        except Exception:
-            pass
+    One group doc per node comes back instead of every edge. Groups are keyed by
+    id rather than $addToSet into a single doc, which would hit the 16MB limit.
+    """
+    pipeline = [
+        {"$match": {mask_field: {"$bitsAllSet": [bit_index]}}},
+        {"$project": {"_id": 0, "ids": ["$src_id", "$dst_id"]}},
+        {"$unwind": "$ids"},
+        {"$match": {"ids": {"$ne": None}}},
+        {"$group": {"_id": "$ids"}},
+    ]
+    ids: list[int] = []
+    cur = subgraph_coll.aggregate_raw_batches(
+        pipeline, allowDiskUse=True, batchSize=batch_size
+    )
+    t0 = time.time()
+    for n, d in enumerate(iter_raw_batches(cur), 1):
+        if n % LOAD_PROGRESS_EVERY == 0:
+            _report_load(f"subgraph nodes (bit={bit_index})", n, t0)
+        ids.append(int(d["_id"]))
 
+    nodes = np.asarray(ids, dtype=np.int64)
+    nodes.sort()
     return nodes
 
 
+def nodes_reaching_root(
+    adj: AdjStore, nodes: np.ndarray, root_id: int, t_max: int
+) -> set[int]:
+    """
+    Nodes with a dependency path to root_id over candidate edges with
+    time <= t_max, found by one reverse BFS from root_id. Exposure needs such a
+    path at its own cutoff t <= t_max, so a start node outside this set is
+    unsat without running the solver.
+
+    Paths may leave the subgraph: the edges are collected over the forward
+    closure of `nodes`, and the headers of nodes outside it are prefetched
+    one BFS level at a time.
+    """
+    srcs: list[np.ndarray] = []
+    dsts: list[np.ndarray] = []
+    seen = set(nodes.tolist())
+    level = list(seen)
+    while level:
+        nxt_level: list[int] = []
+        for src_id in level:
+            for dep_name_id in adj.get_dep_name_ids(src_id):
+                h = adj.get_header(src_id, dep_name_id)
+                if h is None:
+                    continue
+                ids, times = adj.flat_arrays(h)
+                cut = _bisect_right(times, t_max)
+                if not cut:
+                    continue
+                dsts.append(ids[:cut])
+                srcs.append(np.full(cut, src_id, dtype=np.int64))
+                for d in ids[:cut].tolist():
+                    if d not in seen:
+                        seen.add(d)
+                        nxt_level.append(d)
+        if nxt_level:
+            adj.prefetch_headers(nxt_level)
+        level = nxt_level
+
+    reached = {root_id}
+    if not dsts:
+        return reached
+
+    # reverse edges grouped by dst
+    dst = np.concatenate(dsts)
+    order = np.argsort(dst, kind="stable")
+    dst = dst[order]
+    src = np.concatenate(srcs)[order]
+
+    frontier = [root_id]
+    while frontier:
+        lo = np.searchsorted(dst, frontier, side="left")
+        hi = np.searchsorted(dst, frontier, side="right")
+        nxt: list[int] = []
+        for a, b in zip(lo.tolist(), hi.tolist()):
+            for s_id in src[a:b].tolist():
+                if s_id not in reached:
+                    reached.add(s_id)
+                    nxt.append(s_id)
+        frontier = nxt
+    return reached
+
+
+def exposure_row(
+    solver: ExposureSolverCSP,
+    node_time: np.ndarray,
+    root_t: int,
+    nid: int,
+    trace_node: int | None = None,
+    reachable: set[int] | None = None,
+) -> list:
+    """
+    Solve start node nid and return its output CSV row (columns as written by main()).
+    With `reachable` (see nodes_reaching_root), nodes outside it skip the solver.
+    """
+    nt = node_time[nid] if nid < len(node_time) else NO_TIME
+    if nt == NO_TIME:
+        return [nid, None, None, 0, "", "node_time_missing"]
+
+    t_cutoff = max(int(nt), root_t)
+    if reachable is not None and nid not in reachable:
+        return [nid, int(nt), t_cutoff, 0, "", "no_path_to_root"]
+    solver.debug = trace_node is not None and nid == trace_node
+
+    res = solver.exposure(nid, t_cutoff)
+    if res.ok:
+        return [
+            nid,
+            int(nt),
+            t_cutoff,
+            1,
+            res.depth_to_root if res.depth_to_root is not None else "",
+            "",
+        ]
+    return [nid, int(nt), t_cutoff, 0, "", res.fail_reason]
+
+
+# Per-process state for --workers > 1, set up by _worker_init in each forked worker.
+_WORKER: dict[str, Any] = {}
+
+
+def _worker_init(
+    adj: AdjStore,
+    solver_kwargs: dict[str, Any],
+    mongo_uri: str,
+    compressors: str,
+    pypi_db: str,
+    headers_coll: str,
+    chunks_coll: str,
+    root_t: int,
+    trace_node: int | None,
+    reachable: set[int] | None,
+):
+    """
+    Runs once per forked worker. The node arrays and adj's prefetched caches are
+    inherited copy-on-write; only the Mongo connection must be the worker's own.
+    """
+    db = open_client(mongo_uri, compressors)[pypi_db]
+    adj.headers = db[headers_coll]
+    adj.chunks = db[chunks_coll]
+    _WORKER["solver"] = ExposureSolverCSP(adj=adj, **solver_kwargs)
+    _WORKER["node_time"] = solver_kwargs["node_time"]
+    _WORKER["root_t"] = root_t
+    _WORKER["trace_node"] = trace_node
+    _WORKER["reachable"] = reachable
+
+
+def _worker_row(nid: int) -> list:
+    w = _WORKER
+    return exposure_row(
+        w["solver"], w["node_time"], w["root_t"], nid, w["trace_node"], w["reachable"]
+    )
+
+
+# Output rows are formatted by hand and written this many at a time. Fields are
+# ints and fixed snake_case fail reasons, so nothing needs CSV quoting; "\r\n"
+# matches csv.writer's default.
+CSV_FLUSH_ROWS = 10_000
+
+
 def main():
     args = parse_args()
 
-    client = MongoClient(args.mongo_uri)
+    client = open_client(args.mongo_uri, args.compressors)
 
     pypi_db = client[args.pypi_db]
     sub_db = client[args.subgraphs_db]
@@ -887,7 +1812,7 @@ def main():
     print(f"[load] node arrays size={len(node_py_mask):,} time={t3-t2:.1f}s all_mask={all_mask}")
 
     # Root time must exist
-    if root_id >= len(node_time) or node_time[root_id] is None:
+    if root_id >= len(node_time) or node_time[root_id] == NO_TIME:
         raise RuntimeError("Root node has no timestamp in requires_python_with_timestamps; cannot proceed.")
     root_t = int(node_time[root_id])
     print(f"[root] root_upload_time_epoch={root_t}")
@@ -910,12 +1835,32 @@ def main():
         node_time=node_time,
         deps_cache_cap=args.deps_cache_cap,
         header_cache_cap=args.header_cache_cap,
-        chunk_cache_cap=args.chunk_cache_cap,
         edgecheck_cache_cap=args.edgecheck_cache_cap,
     )
 
-    node_list = list(nodes)
-    node_list.sort()
+    node_list = nodes.tolist()  # already sorted
+
+    if args.prefetch_batch_size > 0:
+        print("[prefetch] bulk-loading headers (with chunks) for subgraph nodes ...")
+        t4 = time.time()
+        n_headers = adj.prefetch_headers(node_list, batch_size=args.prefetch_batch_size)
+        t5 = time.time()
+        print(f"[prefetch] headers={n_headers:,} time={t5-t4:.1f}s")
+
+    reachable: set[int] | None = None
+    if not args.no_reach_precheck:
+        # every cutoff is max(node_time, root_t), so edges valid at the largest one
+        # cover them all
+        known = node_time[nodes[nodes < len(node_time)]]
+        t_max = max(int(known.max(initial=NO_TIME)), root_t)
+        t6 = time.time()
+        reachable = nodes_reaching_root(adj, nodes, root_id, t_max)
+        n_reach = len(reachable.intersection(node_list))
+        print(
+            f"[reach] nodes with a path to root at t<={t_max}: "
+            f"{n_reach:,} / {len(nodes):,} "
+            f"time={time.time() - t6:.1f}s"
+        )
 
     # Debug aggregation
     reason_ctr = Counter()
@@ -923,58 +1868,99 @@ def main():
     tested = 0
     t_start = time.time()
 
-    with open(out_csv, "w", newline="") as f:
-        w = csv.writer(f)
-        w.writerow(["node_id", "node_time_epoch", "t_cutoff_epoch", "exposed", "depth_to_root", "fail_reason"])
-
-        for nid in tqdm(node_list, desc=f"Exposure per node (bit={bit_index})"):
-            tested += 1
-
-            nt = node_time[nid] if nid < len(node_time) else None
-            if nt is None:
-                w.writerow([nid, None, None, 0, "", "node_time_missing"])
-                reason_ctr["node_time_missing"] += 1
-                continue
-
-            t_cutoff = max(int(nt), root_t)
-
-            do_trace = args.debug and (args.debug_trace_node is not None) and (nid == args.debug_trace_node)
-            solver = ExposureSolverCSP(
-                adj=adj,
-                node_py_mask=node_py_mask,
-                node_time=node_time,
-                node_name_id=node_name_id,
-                all_mask=all_mask,
-                root_id=root_id,
-                root_name_id=root_name_id,
-                start_name_id=node_name_id[nid] if nid < len(node_name_id) else None,
-                max_candidates_per_dep=args.max_candidates_per_dep,
-                debug=do_trace,
-                trace_node=args.debug_trace_node,
-                trace_limit=args.debug_trace_limit,
-            )
-
-            res = solver.exposure(nid, t_cutoff)
+    solver_kwargs = {
+        "node_py_mask": node_py_mask,
+        "node_time": node_time,
+        "node_name_id": node_name_id,
+        "all_mask": all_mask,
+        "root_id": root_id,
+        "root_name_id": root_name_id,
+        "num_name_ids": max(name_to_id.values(), default=NO_NAME) + 1,
+        "max_candidates_per_dep": args.max_candidates_per_dep,
+        "nogood_cache_cap": args.nogood_cache_cap,
+        "mrv_order": args.mrv_order,
+        "debug": False,
+        "trace_node": args.debug_trace_node,
+        "trace_limit": args.debug_trace_limit,
+    }
+    trace_node = args.debug_trace_node if args.debug else None
+
+    pool = None
+    if args.workers > 1:
+        # fork: workers share the loaded arrays and adj caches copy-on-write
+        pool = mp.get_context("fork").Pool(
+            args.workers,
+            initializer=_worker_init,
+            initargs=(
+                adj,
+                solver_kwargs,
+                args.mongo_uri,
+                args.compressors,
+                args.pypi_db,
+                args.adj_headers_coll,
+                args.adj_chunks_coll,
+                root_t,
+                trace_node,
+                reachable,
+            ),
+        )
+        rows = pool.imap(_worker_row, node_list, chunksize=args.worker_chunksize)
+        print(f"[pool] workers={args.workers} chunksize={args.worker_chunksize}")
+    else:
+        # one solver for the whole scan so its chosen/in_stack buffers are reused
+        solver = ExposureSolverCSP(adj=adj, **solver_kwargs)
+        rows = (
+            exposure_row(solver, node_time, root_t, nid, trace_node, reachable)
+            for nid in node_list
+        )
 
-            if res.ok:
-                exposed_ct += 1
-                w.writerow([nid, int(nt), t_cutoff, 1, res.depth_to_root if res.depth_to_root is not None else "", ""])
-            else:
-                w.writerow([nid, int(nt), t_cutoff, 0, "", res.fail_reason])
-                reason_ctr[res.fail_reason or "unsat"] += 1
-
-            if args.progress_every and tested % args.progress_every == 0:
-                elapsed = time.time() - t_start
-                rate = tested / max(elapsed, 1e-9)
-                print(
-                    f"[prog] tested={tested:,} exposed={exposed_ct:,} "
-                    f"rate={rate:,.2f} nodes/s "
-                    f"deps_cache={len(adj.deps_lru):,} header_cache={len(adj.header_lru):,} "
-                    f"chunk_cache={len(adj.chunk_lru):,} edge_cache={len(adj.edge_lru):,}"
+    try:
+        with open(out_csv, "w", newline="", buffering=1 << 20) as f:
+            f.write("node_id,node_time_epoch,t_cutoff_epoch,exposed,depth_to_root,fail_reason\r\n")
+            buf: list[str] = []
+
+            for row in tqdm(
+                rows, total=len(node_list), desc=f"Exposure per node (bit={bit_index})"
+            ):
+                tested += 1
+                nid, nt, t_cutoff, exposed, depth, reason = row
+                buf.append(
+                    f"{nid},{'' if nt is None else nt},"
+                    f"{'' if t_cutoff is None else t_cutoff},"
+                    f"{exposed},{depth},{reason}\r\n"
                 )
-                if args.debug and reason_ctr:
-                    top = reason_ctr.most_common(10)
-                    print("[debug] top fail reasons:", top)
+                if len(buf) >= CSV_FLUSH_ROWS:
+                    f.write("".join(buf))
+                    buf.clear()
+                if exposed:
+                    exposed_ct += 1
+                else:
+                    reason_ctr[reason or "unsat"] += 1
+
+                if args.progress_every and tested % args.progress_every == 0:
+                    elapsed = time.time() - t_start
+                    rate = tested / max(elapsed, 1e-9)
+                    caches = ""
+                    if pool is None:
+                        caches = (
+                            f" deps_cache={len(adj.deps_lru):,}"
+                            f" header_cache={len(adj.header_lru):,}"
+                            f" edge_cache={len(adj.edge_index_lru):,}"
+                            f" nogoods={len(solver.nogoods):,}"
+                        )
+                    print(
+                        f"[prog] tested={tested:,} exposed={exposed_ct:,} "
+                        f"rate={rate:,.2f} nodes/s{caches}"
+                    )
+                    if args.debug and reason_ctr:
+                        top = reason_ctr.most_common(10)
+                        print("[debug] top fail reasons:", top)
+
+            f.write("".join(buf))
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
 
     print("Done.")
     if args.debug and reason_ctr:
@@ -1011,8 +1997,10 @@ python3 phase4_exposure_nodes_1.py \
   --out-csv urllib3_latest_nodes_exposure.csv \
   --deps-cache-cap 200000 \
   --header-cache-cap 200000 \
-  --chunk-cache-cap 200000 \
   --max-candidates-per-dep 0 \
   --progress-every 5000
 
+# Same scan on 8 processes
+python3 phase4_exposure_nodes_1.py --subgraph urllib3_subgraph --workers 8
+
 """
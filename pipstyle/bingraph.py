@@ -0,0 +1,334 @@
+"""
+Memory-mapped binary graph: the adjacency headers and chunks plus the node
+arrays, dumped once from MongoDB so resolution can run without pymongo.
+
+A graph is a directory of raw little-endian arrays and a meta.json with the
+format tag, version and array lengths:
+
+- node_time.i64, node_py_mask.u32, node_name_id.i32: indexed by node_id
+- name_blob.bin, name_offsets.i64: ResolutionContext.name_*
+- deps_start.i64, deps.i32: ResolutionContext.deps_*, CSR by src_id
+- hdr_key.i64, hdr_chunk_start.i64: headers sorted by packed (src_id, dep_name_id)
+- chunk_n.i32, chunk_min_t.i64, chunk_max_t.i64, chunk_dst_start.i64
+- chunk_py_or.u32: DepHeader.chunk_py_or, precomputed
+- hdr_bloom_start.i64, bloom.u64: per-header DepHeader.bloom, back to back
+- dst_ids.i64, dst_times.i64: every chunk's dst_ids and search times, back to back
+
+Header h owns chunks hdr_chunk_start[h]:hdr_chunk_start[h+1] and Bloom words
+bloom[hdr_bloom_start[h]:hdr_bloom_start[h+1]]; chunk c owns
+dst_ids[chunk_dst_start[c]:chunk_dst_start[c+1]]. A header's dst_ids are
+therefore one contiguous slice, so get_chunk and get_header_arrays are views.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from array import array
+from typing import Any
+
+import numpy as np
+
+from pipstyle.loader import (
+    _DEP_BITS,
+    _EMPTY_IDS,
+    CACHE_POLICIES,
+    CHUNK_INDEX_KEYS,
+    CHUNK_INDEX_NAME,
+    HEADER_PROJECTION,
+    TIME_MAX,
+    DepHeader,
+    ResolutionContext,
+    _pack2,
+    bloom_build,
+    header_from_doc,
+    make_header,
+)
+
+FORMAT = "pipstyle-graph"
+VERSION = 4
+
+# file name -> dtype, for every array in a graph directory
+ARRAYS: dict[str, str] = {
+    "node_time.i64": "<i8",
+    "node_py_mask.u32": "<u4",
+    "node_name_id.i32": "<i4",
+    "name_offsets.i64": "<i8",
+    "deps_start.i64": "<i8",
+    "deps.i32": "<i4",
+    "hdr_key.i64": "<i8",
+    "hdr_chunk_start.i64": "<i8",
+    "chunk_n.i32": "<i4",
+    "chunk_min_t.i64": "<i8",
+    "chunk_max_t.i64": "<i8",
+    "chunk_dst_start.i64": "<i8",
+    "chunk_py_or.u32": "<u4",
+    "hdr_bloom_start.i64": "<i8",
+    "bloom.u64": "<u8",
+    "dst_ids.i64": "<i8",
+    "dst_times.i64": "<i8",
+}
+
+
+def _write_array(out_dir: str, name: str, arr: Any) -> int:
+    a = np.ascontiguousarray(arr, dtype=ARRAYS[name])
+    a.tofile(os.path.join(out_dir, name))
+    return len(a)
+
+
+def write_binary_graph(
+    ctx: ResolutionContext, out_dir: str, batch_size: int = 10_000
+) -> dict[str, int]:
+    """
+    Dump ctx (as returned by load_context) and its header/chunk collections into
+    out_dir. Headers and chunks are streamed in (src_id, dep_name_id[, chunk])
+    order and the dst slab is written as it goes. Returns the array lengths.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    lengths: dict[str, int] = {}
+    node_time = ctx.node_time
+
+    lengths["node_time.i64"] = _write_array(out_dir, "node_time.i64", node_time)
+    lengths["node_py_mask.u32"] = _write_array(
+        out_dir, "node_py_mask.u32", ctx.node_py_mask
+    )
+    lengths["node_name_id.i32"] = _write_array(
+        out_dir, "node_name_id.i32", ctx.node_name_id
+    )
+    lengths["name_offsets.i64"] = _write_array(
+        out_dir, "name_offsets.i64", ctx.name_offsets
+    )
+    with open(os.path.join(out_dir, "name_blob.bin"), "wb") as f:
+        f.write(ctx.name_blob)
+    lengths["name_blob.bin"] = len(ctx.name_blob)
+
+    lengths["deps_start.i64"] = _write_array(out_dir, "deps_start.i64", ctx.deps_start)
+    lengths["deps.i32"] = _write_array(out_dir, "deps.i32", ctx.deps)
+    print(f"[bin] node arrays and {len(ctx.deps):,} deps written")
+
+    # 1) headers, in key order; the per-chunk tables follow the same order
+    hdr_key = array("q")
+    hdr_chunk_start = array("q", [0])
+    chunk_n: list[np.ndarray] = []
+    chunk_min_t: list[np.ndarray] = []
+    chunk_max_t: list[np.ndarray] = []
+    cur = ctx.adj_headers_coll.find({}, HEADER_PROJECTION, allow_disk_use=True)
+    cur = cur.sort([("src_id", 1), ("dep_name_id", 1)]).batch_size(batch_size)
+    for doc in cur:
+        h = header_from_doc(doc)
+        if h is None:
+            continue
+        if h.src_id >> (63 - _DEP_BITS):
+            raise ValueError(f"src_id {h.src_id:,} does not fit the int64 header key")
+        hdr_key.append(_pack2(h.src_id, h.dep_name_id))
+        hdr_chunk_start.append(hdr_chunk_start[-1] + h.num_chunks)
+        chunk_n.append(h.chunk_n)
+        chunk_min_t.append(h.chunk_min_t)
+        chunk_max_t.append(h.chunk_max_t)
+    n_chunks = hdr_chunk_start[-1]
+    keys = np.frombuffer(hdr_key, dtype=np.int64)
+    lengths["hdr_key.i64"] = _write_array(out_dir, "hdr_key.i64", keys)
+    starts = np.frombuffer(hdr_chunk_start, dtype=np.int64)
+    lengths["hdr_chunk_start.i64"] = _write_array(
+        out_dir, "hdr_chunk_start.i64", starts
+    )
+    for name, parts, dtype in (
+        ("chunk_n.i32", chunk_n, np.int32),
+        ("chunk_min_t.i64", chunk_min_t, np.int64),
+        ("chunk_max_t.i64", chunk_max_t, np.int64),
+    ):
+        lengths[name] = _write_array(
+            out_dir, name, np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+        )
+    del chunk_n, chunk_min_t, chunk_max_t
+    print(f"[bin] {len(keys):,} headers, {n_chunks:,} chunks")
+
+    # 2) chunks, in index order, appended to the dst slab; a chunk with no doc stays
+    # empty
+    chunk_dst_start = np.zeros(n_chunks + 1, dtype=np.int64)
+    chunk_py_or = np.zeros(n_chunks, dtype=np.uint32)
+    pos = 0
+    next_g = 0
+    h = 0
+    with open(os.path.join(out_dir, "dst_ids.i64"), "wb") as f_ids, \
+            open(os.path.join(out_dir, "dst_times.i64"), "wb") as f_times:
+        cur = ctx.chunks_coll.find(
+            {}, {"src_id": 1, "dep_name_id": 1, "chunk": 1, "dst_ids": 1}
+        )
+        cur = cur.sort(CHUNK_INDEX_KEYS).hint(CHUNK_INDEX_NAME).batch_size(batch_size)
+        for doc in cur:
+            key = _pack2(int(doc["src_id"]), int(doc["dep_name_id"]))
+            while h < len(keys) and keys[h] < key:
+                h += 1
+            if h == len(keys) or keys[h] != key:
+                continue  # chunk of a header that was skipped or is missing
+            c = int(doc["chunk"])
+            g = hdr_chunk_start[h] + c
+            if not 0 <= c < hdr_chunk_start[h + 1] - hdr_chunk_start[h] or g < next_g:
+                continue
+            chunk_dst_start[next_g:g + 1] = pos
+            dst_ids, times = ctx._chunk_arrays(
+                np.asarray(doc.get("dst_ids") or [], dtype=np.int64)
+            )
+            dst_ids.astype("<i8").tofile(f_ids)
+            times.astype("<i8").tofile(f_times)
+            if len(dst_ids):
+                chunk_py_or[g] = np.bitwise_or.reduce(ctx.node_py_mask[dst_ids])
+            pos += len(dst_ids)
+            next_g = g + 1
+    chunk_dst_start[next_g:] = pos
+    lengths["chunk_dst_start.i64"] = _write_array(
+        out_dir, "chunk_dst_start.i64", chunk_dst_start
+    )
+    lengths["chunk_py_or.u32"] = _write_array(out_dir, "chunk_py_or.u32", chunk_py_or)
+    lengths["dst_ids.i64"] = lengths["dst_times.i64"] = pos
+    print(f"[bin] {pos:,} dst_ids")
+
+    # 3) per-header Bloom filters, read back from the written slab
+    dst_ids = _map_array(out_dir, "dst_ids.i64", pos)
+    dst_times = _map_array(out_dir, "dst_times.i64", pos)
+    hdr_dst_start = chunk_dst_start[starts]
+    hdr_bloom_start = array("q", [0])
+    with open(os.path.join(out_dir, "bloom.u64"), "wb") as f:
+        for i in range(len(keys)):
+            lo = int(hdr_dst_start[i])
+            hi = int(hdr_dst_start[i + 1])
+            bloom = bloom_build(dst_ids[lo:hi][dst_times[lo:hi] != TIME_MAX])
+            bloom.astype("<u8").tofile(f)
+            hdr_bloom_start.append(hdr_bloom_start[-1] + len(bloom))
+    del dst_ids, dst_times
+    bloom_start = np.frombuffer(hdr_bloom_start, dtype=np.int64)
+    lengths["hdr_bloom_start.i64"] = _write_array(
+        out_dir, "hdr_bloom_start.i64", bloom_start
+    )
+    lengths["bloom.u64"] = hdr_bloom_start[-1]
+    print(f"[bin] {hdr_bloom_start[-1] * 8:,} bytes of header Bloom filters")
+
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(
+            {"format": FORMAT, "version": VERSION, "lengths": lengths}, f, indent=1
+        )
+    return lengths
+
+
+def _map_array(path: str, name: str, n: int) -> np.ndarray:
+    if n == 0:
+        return np.empty(0, dtype=ARRAYS[name])
+    # plain ndarray view of the map, so the numba kernels accept it; copy-on-write
+    # rather than read-only because their signatures take writable arrays
+    return np.asarray(
+        np.memmap(os.path.join(path, name), dtype=ARRAYS[name], mode="c", shape=(n,))
+    )
+
+
+class BinaryGraph:
+    """Read-only view of a graph directory written by write_binary_graph."""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format") != FORMAT or meta.get("version") != VERSION:
+            raise ValueError(f"{path!r} is not a {FORMAT} v{VERSION} directory")
+        lengths = meta["lengths"]
+        self.path = path
+        self.arrays = {
+            name: _map_array(path, name, int(lengths[name])) for name in ARRAYS
+        }
+        with open(os.path.join(path, "name_blob.bin"), "rb") as f:
+            self.name_blob = f.read()
+        a = self.arrays
+        self.hdr_key = a["hdr_key.i64"]
+        self.hdr_chunk_start = a["hdr_chunk_start.i64"]
+        self.chunk_n = a["chunk_n.i32"]
+        self.chunk_min_t = a["chunk_min_t.i64"]
+        self.chunk_max_t = a["chunk_max_t.i64"]
+        self.chunk_dst_start = a["chunk_dst_start.i64"]
+        self.chunk_py_or = a["chunk_py_or.u32"]
+        self.hdr_bloom_start = a["hdr_bloom_start.i64"]
+        self.bloom = a["bloom.u64"]
+        self.dst_ids = a["dst_ids.i64"]
+        self.dst_times = a["dst_times.i64"]
+
+    def _header_index(self, src_id: int, dep_name_id: int) -> int:
+        key = _pack2(src_id, dep_name_id)
+        i = int(np.searchsorted(self.hdr_key, key))
+        return i if i < len(self.hdr_key) and self.hdr_key[i] == key else -1
+
+    def header(self, src_id: int, dep_name_id: int) -> DepHeader | None:
+        """
+        DepHeader for (src_id, dep_name_id) over views of the mapped arrays, with
+        flat, chunk_py_or and bloom prefilled.
+        """
+        i = self._header_index(src_id, dep_name_id)
+        if i < 0:
+            return None
+        c0 = int(self.hdr_chunk_start[i])
+        c1 = int(self.hdr_chunk_start[i + 1])
+        h = make_header(
+            src_id,
+            dep_name_id,
+            self.chunk_n[c0:c1],
+            self.chunk_min_t[c0:c1],
+            self.chunk_max_t[c0:c1],
+        )
+        starts = self.chunk_dst_start[c0:c1 + 1]
+        lo = int(starts[0])
+        hi = int(starts[-1])
+        h.flat = (
+            self.dst_ids[lo:hi],
+            self.dst_times[lo:hi],
+            starts - lo,
+            h.chunk_min_t,
+        )
+        h.chunk_py_or = self.chunk_py_or[c0:c1]
+        h.bloom = self.bloom[self.hdr_bloom_start[i]:self.hdr_bloom_start[i + 1]]
+        return h
+
+    def chunk(
+        self, src_id: int, dep_name_id: int, chunk: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """(dst_ids, times) views for one chunk; empty if header or chunk is unknown."""
+        i = self._header_index(src_id, dep_name_id)
+        if i < 0:
+            return _EMPTY_IDS, _EMPTY_IDS
+        g = int(self.hdr_chunk_start[i]) + chunk
+        if chunk < 0 or g >= self.hdr_chunk_start[i + 1]:
+            return _EMPTY_IDS, _EMPTY_IDS
+        lo = int(self.chunk_dst_start[g])
+        hi = int(self.chunk_dst_start[g + 1])
+        return self.dst_ids[lo:hi], self.dst_times[lo:hi]
+
+
+def load_binary_context(
+    path: str,
+    header_cache_cap: int = 500_000,
+    cache_policy: str = "clock",
+) -> ResolutionContext:
+    """
+    Resolution context backed by the graph directory at path; needs no MongoDB.
+    Chunks are views into the mapped dst slab, so only headers are cached.
+    """
+    if cache_policy not in CACHE_POLICIES:
+        raise ValueError(
+            f"unknown cache_policy {cache_policy!r} "
+            f"(expected one of {sorted(CACHE_POLICIES)})"
+        )
+    print(f"[load] Mapping binary graph {path!r} ...")
+    graph = BinaryGraph(path)
+    a = graph.arrays
+    print(
+        f"[load] Mapped {len(a['node_time.i64']):,} nodes, "
+        f"{len(graph.hdr_key):,} headers, "
+        f"{len(graph.dst_ids):,} dst_ids, {len(a['deps.i32']):,} deps"
+    )
+    return ResolutionContext(
+        node_py_mask=a["node_py_mask.u32"],
+        node_time=a["node_time.i64"],
+        node_name_id=a["node_name_id.i32"],
+        name_blob=graph.name_blob,
+        name_offsets=a["name_offsets.i64"],
+        deps_start=a["deps_start.i64"],
+        deps=a["deps.i32"],
+        header_lru=CACHE_POLICIES[cache_policy](header_cache_cap),
+        graph=graph,
+    )
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Dump the graph collections from MongoDB into a memory-mapped binary graph
+directory (see pipstyle.bingraph) for `run.py --binary-graph`.
+
+Usage:
+  python -m pipstyle.build_bin --out graph_bin [--mongo-uri ...] [--pypi-db ...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from pipstyle.bingraph import write_binary_graph
+from pipstyle.loader import load_context
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(
+        description="Write the DB-backed graph to a memory-mapped binary directory."
+    )
+    ap.add_argument(
+        "--mongo-uri",
+        default="mongodb://localhost:27017",
+        help="MongoDB connection URI",
+    )
+    ap.add_argument(
+        "--pypi-db", default="pypi_dump", help="Database name for PyPI collections"
+    )
+    ap.add_argument(
+        "--out",
+        required=True,
+        help="Output directory for the graph arrays and meta.json",
+    )
+    ap.add_argument(
+        "--batch-size",
+        type=int,
+        default=10_000,
+        help="Cursor batch size for headers and chunks",
+    )
+    return ap.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    t0 = time.time()
+    ctx = load_context(
+        mongo_uri=args.mongo_uri,
+        pypi_db=args.pypi_db,
+        chunk_cache_cap=0,
+        header_cache_cap=0,
+    )
+    lengths = write_binary_graph(ctx, args.out, batch_size=args.batch_size)
+    print(
+        f"[bin] Wrote {args.out!r}: {lengths['hdr_key.i64']:,} headers, "
+        f"{lengths['dst_ids.i64']:,} dst_ids "
+        f"in {time.time() - t0:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
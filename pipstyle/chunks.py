@@ -5,31 +5,68 @@ newest-first. Uses binary search on headers and within chunks.
 
 from __future__ import annotations
 
-from typing import Iterator, List, Optional
+from collections.abc import Iterator
 
-from pipstyle.loader import DepHeader, ResolutionContext
+import numpy as np
 
+from pipstyle.loader import NO_TIME, ResolutionContext, bloom_may_contain
 
-def _bisect_right_by_time(
-    ctx: ResolutionContext,
-    dst_ids: List[int],
-    t: int,
-) -> int:
-    """
-    dst_ids sorted by first_upload_time ascending.
-    Return index i such that dst_ids[:i] have time <= t.
-    """
-    node_time = ctx.node_time
-    lo, hi = 0, len(dst_ids)
-    while lo < hi:
-        mid = (lo + hi) // 2
-        nid = dst_ids[mid]
-        tm = node_time[nid] if nid < len(node_time) else None
-        if tm is None or tm > t:
-            hi = mid
-        else:
-            lo = mid + 1
-    return lo
+# py_mask that skips no chunk
+PY_MASK_ANY = 0xFFFFFFFF
+
+# Optional: compiles the candidate filter below
+try:
+    from numba import njit
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+
+
+if _HAS_NUMBA:
+    @njit(
+        "int64(int64[::1], int64[::1], int64[::1], int64[::1], uint32[::1], uint32,"
+        " int64, int64[::1])",
+        nogil=True,
+        cache=True,
+    )
+    def _filter_candidates(dst_ids, times, starts, mins, py_or, py_mask, t, out):
+        """
+        Write the dst_ids with time <= t into `out`, newest first: chunks in
+        reverse, each bisected on its slice of `times`. Chunks whose py_or shares
+        no bit with py_mask are skipped unread. Returns the count.
+        """
+        k = 0
+        for c in range(mins.shape[0] - 1, -1, -1):
+            if mins[c] > t or (py_or[c] & py_mask) == 0:
+                continue
+            lo = starts[c]
+            hi = starts[c + 1]
+            while lo < hi:
+                mid = (lo + hi) >> 1
+                if times[mid] <= t:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            for i in range(lo - 1, starts[c] - 1, -1):
+                out[k] = dst_ids[i]
+                k += 1
+        return k
+else:
+    def _filter_candidates(dst_ids, times, starts, mins, py_or, py_mask, t, out):
+        """
+        Write the dst_ids with time <= t into `out`, newest first: chunks in
+        reverse, each bisected on its slice of `times`. Chunks whose py_or shares
+        no bit with py_mask are skipped unread. Returns the count.
+        """
+        k = 0
+        for c in range(len(mins) - 1, -1, -1):
+            if mins[c] > t or not py_or[c] & py_mask:
+                continue
+            s = int(starts[c])
+            cut = s + int(np.searchsorted(times[s:starts[c + 1]], t, side="right"))
+            out[k:k + cut - s] = dst_ids[s:cut][::-1]
+            k += cut - s
+        return k
 
 
 def iter_candidates_newest_first(
@@ -37,43 +74,42 @@ def iter_candidates_newest_first(
     src_id: int,
     dep_name_id: int,
     t: int,
-    root_name_id: Optional[int] = None,
-    root_node_id: Optional[int] = None,
+    root_name_id: int | None = None,
+    root_node_id: int | None = None,
+    py_mask: int = PY_MASK_ANY,
 ) -> Iterator[int]:
     """
     Yield dst node_ids for (src_id, dep_name_id) with first_upload_time <= t,
     newest-first. If root_name_id and root_node_id are set and dep_name_id == root_name_id,
-    yield only root_node_id (if valid at t).
+    yield only root_node_id (if valid at t). Chunks with no node sharing a bit with
+    py_mask are skipped; candidates in the other chunks are yielded unscreened.
     """
     if root_name_id is not None and root_node_id is not None and dep_name_id == root_name_id:
-        if root_node_id < len(ctx.node_time):
-            tm = ctx.node_time[root_node_id]
-            if tm is not None and tm <= t:
-                yield root_node_id
+        tm = ctx.node_time[root_node_id]
+        if tm != NO_TIME and tm <= t:
+            yield root_node_id
         return
 
     h = ctx.get_header(src_id, dep_name_id)
-    if h is None or not h.chunks:
+    if h is None or not h.num_chunks:
         return
     if h.min_t is not None and h.min_t > t:
         return
 
-    for ci in reversed(h.chunks):
-        if ci.min_t is not None and ci.min_t > t:
-            continue
-        dst_ids = ctx.get_chunk(src_id, dep_name_id, ci.chunk)
-        if not dst_ids:
-            continue
-        if ci.max_t is not None and ci.max_t <= t:
-            cut = len(dst_ids)
-        else:
-            cut = _bisect_right_by_time(ctx, dst_ids, t)
-        for i in range(cut - 1, -1, -1):
-            nid = dst_ids[i]
-            tm = ctx.node_time[nid] if nid < len(ctx.node_time) else None
-            if tm is None or tm > t:
-                continue
-            yield nid
+    if h.merged_dst is not None:
+        cut = int(np.searchsorted(h.merged_times, t, side="right"))
+        yield from h.merged_dst[:cut][::-1].tolist()
+        return
+
+    dst_ids, times, starts, mins = ctx.get_header_arrays(h)
+    if not len(dst_ids):
+        return
+    out = ctx.cand_buffer(len(dst_ids))
+    k = _filter_candidates(
+        dst_ids, times, starts, mins, h.chunk_py_or, np.uint32(py_mask), t, out
+    )
+    # tolist() copies out of the shared buffer before the first yield
+    yield from out[:k].tolist()
 
 
 def edge_exists_upto_t(
@@ -83,21 +119,16 @@ def edge_exists_upto_t(
     dst_id: int,
     t: int,
 ) -> bool:
-    """True iff dst_id is among candidates for (src_id, dep_name_id) with time <= t."""
+    """
+    True iff dst_id is among candidates for (src_id, dep_name_id) with time <= t.
+    The header's Bloom filter answers most absent edges; the rest probe the edge index.
+    """
     h = ctx.get_header(src_id, dep_name_id)
-    if h is None or not h.chunks:
+    if h is None or not h.num_chunks:
         return False
     if h.min_t is not None and h.min_t > t:
         return False
-    for ci in h.chunks:
-        if ci.min_t is not None and ci.min_t > t:
-            break
-        dst_ids = ctx.get_chunk(src_id, dep_name_id, ci.chunk)
-        if ci.max_t is not None and ci.max_t <= t:
-            cut = len(dst_ids)
-        else:
-            cut = _bisect_right_by_time(ctx, dst_ids, t)
-        for i in range(cut):
-            if dst_ids[i] == dst_id:
-                return True
-    return False
+    if not bloom_may_contain(ctx.get_bloom(h), dst_id):
+        return False
+    tm = ctx.get_edge_index(h).get(dst_id)
+    return tm is not None and tm <= t
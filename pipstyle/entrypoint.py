@@ -6,21 +6,21 @@ Uses resolvelib's Resolver and Resolution; computes depth and optional dependenc
 from __future__ import annotations
 
 from collections import deque
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any
 
-from pipstyle.loader import ResolutionContext, load_context
+from pipstyle.loader import NO_NAME, NO_TIME, ResolutionContext
 from pipstyle.provider import DBProvider
-from pipstyle.structures import Candidate, Requirement
 from pipstyle.resolvelib.reporters import BaseReporter
 from pipstyle.resolvelib.resolvers import (
     ResolutionImpossible,
     ResolutionTooDeep,
     Resolver,
 )
+from pipstyle.structures import Candidate, Requirement
 
 
 def _compute_depth(
-    result_mapping: Dict[int, Candidate],
+    result_mapping: dict[int, Candidate],
     result_graph: Any,
     start_node_id: int,
     root_node_id: int,
@@ -54,7 +54,7 @@ def _compute_depth(
     # start we follow outgoing edges (start's dependencies). To reach root we need a path
     # start -> ... -> root. So BFS from start_name_id using _forwards.
     seen = {start_name_id}
-    q: deque[Tuple[int, int]] = deque([(start_name_id, 0)])
+    q: deque[tuple[int, int]] = deque([(start_name_id, 0)])
     forwards = result_graph._forwards
     while q:
         v, d = q.popleft()
@@ -68,14 +68,14 @@ def _compute_depth(
 
 
 def _build_dependency_tree(
-    result_mapping: Dict[int, Candidate],
+    result_mapping: dict[int, Candidate],
     result_graph: Any,
-) -> Dict[str, Any]:
+) -> dict[str, Any]:
     """Build a simple dependency tree structure: nodes and edges by node_id."""
     nodes = {c.node_id for c in result_mapping.values()}
     # Edges: (parent_node_id, child_node_id) for each dependency
     # result_graph has vertices = name_id, edges name_id -> name_id (parent depends on child)
-    edges: List[Tuple[int, int]] = []
+    edges: list[tuple[int, int]] = []
     name_id_to_node = {name_id: c.node_id for name_id, c in result_mapping.items()}
     for parent_name_id, children in result_graph._forwards.items():
         parent_node = name_id_to_node.get(parent_name_id)
@@ -96,16 +96,19 @@ class ResolutionRunner:
 
     def __init__(self, ctx: ResolutionContext):
         self._ctx = ctx
+        # Built on first resolve() and reset per call instead of reallocated
+        self._provider: DBProvider | None = None
+        self._resolver: Resolver | None = None
 
     def resolve(
         self,
         node_id: int,
         root_node_id: int,
         root_name_id: int,
-        time: Optional[int] = None,
+        time: int | None = None,
         debug: bool = False,
         max_rounds: int = 100,
-    ) -> Tuple[bool, int, Optional[Dict[str, Any]]]:
+    ) -> tuple[bool, int, dict[str, Any] | None]:
         """
         Run dependency resolution for node_id with root_node_id pinned.
 
@@ -118,26 +121,34 @@ class ResolutionRunner:
         :return: (resolved, depth, dependency_tree or None).
         """
         ctx = self._ctx
+        # Validate ids once here; everything below indexes the node arrays unchecked
+        n = len(ctx.node_time)
+        if not (0 <= node_id < n and 0 <= root_node_id < n):
+            return False, -1, None
+
         if time is None:
-            tn = ctx.node_time[node_id] if node_id < len(ctx.node_time) else None
-            tr = ctx.node_time[root_node_id] if root_node_id < len(ctx.node_time) else None
-            if tn is None or tr is None:
+            tn = int(ctx.node_time[node_id])
+            tr = int(ctx.node_time[root_node_id])
+            if tn == NO_TIME or tr == NO_TIME:
                 return False, -1, None
             time = max(tn, tr)
 
-        start_name_id = ctx.node_name_id[node_id] if node_id < len(ctx.node_name_id) else None
-        if start_name_id is None:
+        start_name_id = int(ctx.node_name_id[node_id])
+        if start_name_id == NO_NAME:
             return False, -1, None
 
-        provider = DBProvider(
-            ctx=ctx,
-            start_node_id=node_id,
-            root_node_id=root_node_id,
-            root_name_id=root_name_id,
-            t=time,
-        )
-        reporter = BaseReporter()
-        resolver = Resolver(provider, reporter)
+        if self._resolver is None:
+            self._provider = DBProvider(
+                ctx=ctx,
+                start_node_id=node_id,
+                root_node_id=root_node_id,
+                root_name_id=root_name_id,
+                t=time,
+            )
+            self._resolver = Resolver(self._provider, BaseReporter())
+        else:
+            self._provider.reset(node_id, root_node_id, root_name_id, time)
+        resolver = self._resolver
         root_requirement = Requirement(name_id=start_name_id, parent=None)
 
         try:
@@ -157,9 +168,9 @@ def resolve_one(
     node_id: int,
     root_node_id: int,
     root_name_id: int,
-    time: Optional[int] = None,
+    time: int | None = None,
     debug: bool = False,
-) -> Tuple[bool, int, Optional[Dict[str, Any]]]:
+) -> tuple[bool, int, dict[str, Any] | None]:
     """
     One-shot resolve using an existing context.
     """
@@ -14,24 +14,137 @@ Collections queried on-demand with LRU caching:
 
 from __future__ import annotations
 
+import json
+import os
+from array import array
 from collections import OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any
+
+import numpy as np
 
 # Optional: only needed when loading from MongoDB
 try:
-    from pymongo import MongoClient
-    from pymongo.database import Database
+    import bson
+    from pymongo import CursorType, MongoClient
     from pymongo.collection import Collection
+    from pymongo.database import Database
+    from pymongo.errors import OperationFailure
     _HAS_PYMONGO = True
 except ImportError:
     _HAS_PYMONGO = False
+    bson = None  # type: ignore
+    CursorType = None  # type: ignore
     MongoClient = None  # type: ignore
     Database = None  # type: ignore
     Collection = None  # type: ignore
+    OperationFailure = None  # type: ignore
+
+
+# Sentinels for node_id-indexed arrays (no node has a negative time or name_id)
+NO_TIME = -1
+NO_NAME = -1
+
+# Stand-in for NO_TIME in per-chunk search times, so unknown times sort last
+TIME_MAX = np.iinfo(np.int64).max
+
+_EMPTY_IDS = np.empty(0, dtype=np.int64)
+
+# Headers with at most this many dst_ids in total get all their chunks fetched
+# with the header and merged into one time-sorted array (DepHeader.merged_*)
+SMALL_HEADER_THRESHOLD = 64
+
+# First chunk miss for a src_id fetches up to this many of its chunks (all deps) at once
+SRC_PREFETCH_MAX_CHUNKS = 512
+
+# Compound index on global_graph_adj_chunks that covers every chunk lookup and
+# gives the bulk warm-up (prefetch_chunks) one sequential range scan per batch
+CHUNK_INDEX_KEYS = [("src_id", 1), ("dep_name_id", 1), ("chunk", 1)]
+CHUNK_INDEX_NAME = "src_id_1_dep_name_id_1_chunk_1"
+# Same for global_graph_adj_headers. Every on-demand lookup hints these indexes so
+# the planner skips plan selection; both are created by
+# load_context(ensure_indexes=True)
+HEADER_INDEX_KEYS = [("src_id", 1), ("dep_name_id", 1)]
+HEADER_INDEX_NAME = "src_id_1_dep_name_id_1"
+
+# Per-header Bloom filter over dst_ids (DepHeader.bloom): about this many bits per
+# dst_id, rounded up to a power of two and capped at BLOOM_MAX_WORDS uint64 words
+BLOOM_BITS_PER_ID = 8
+BLOOM_MAX_WORDS = 1024
+# Multiplicative hashes; the top bits of dst_id * mul (mod 2**64) pick a bit
+_BLOOM_MULS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F)
+_M64 = (1 << 64) - 1
+
+# load_context(cache_dir=...): arrays saved as <name>.npy, the collections whose
+# fingerprints key the cache, and a tag bumped when the saved layout or key changes
+CONTEXT_CACHE_ARRAYS = (
+    "node_py_mask",
+    "node_time",
+    "node_name_id",
+    "name_offsets",
+    "deps_start",
+    "deps",
+)
+CONTEXT_SOURCE_COLLECTIONS = (
+    "global_graph_name_ids",
+    "global_graph_node_ids",
+    "global_graph_requires_python_with_timestamps",
+    "global_graph_adj_deps",
+)
+CONTEXT_CACHE_FORMAT = "pipstyle-context-2"
+
+# Cache keys are packed into one int: src_id above dep_name_id (32 bits, as wide
+# as the int32 name_ids) above chunk (header_from_doc checks it fits).
+_DEP_BITS = 32
+_CHUNK_BITS = 20
+
+
+def _pack2(src_id: int, dep_name_id: int) -> int:
+    """header_lru key for (src_id, dep_name_id)."""
+    return (src_id << _DEP_BITS) | dep_name_id
 
 
-def _epoch_from_dt(x: Any) -> Optional[int]:
+def _pack3(src_id: int, dep_name_id: int, chunk: int) -> int:
+    """chunk_lru key for (src_id, dep_name_id, chunk)."""
+    return (((src_id << _DEP_BITS) | dep_name_id) << _CHUNK_BITS) | chunk
+
+
+def bloom_build(dst_ids: np.ndarray) -> np.ndarray:
+    """Bloom filter (uint64 words, a power of two of them) over dst_ids."""
+    words = 1
+    while words < BLOOM_MAX_WORDS and words * 64 < len(dst_ids) * BLOOM_BITS_PER_ID:
+        words *= 2
+    shift = np.uint64(65 - (words * 64).bit_length())
+    bloom = np.zeros(words, dtype=np.uint64)
+    x = dst_ids.astype(np.uint64)
+    for mul in _BLOOM_MULS:
+        bit = (x * np.uint64(mul)) >> shift
+        np.bitwise_or.at(
+            bloom, bit >> np.uint64(6), np.uint64(1) << (bit & np.uint64(63))
+        )
+    return bloom
+
+
+def bloom_may_contain(bloom: np.ndarray, dst_id: int) -> bool:
+    """False if dst_id is certainly not in the set bloom_build saw."""
+    shift = 65 - (len(bloom) * 64).bit_length()
+    dst_id = int(dst_id)  # a NumPy scalar would overflow on the 64-bit multiply
+    for mul in _BLOOM_MULS:
+        bit = ((dst_id * mul) & _M64) >> shift
+        if not (int(bloom[bit >> 6]) >> (bit & 63)) & 1:
+            return False
+    return True
+
+
+def _pairs_filter(pairs: list[tuple[int, int]]) -> dict[str, Any]:
+    """Query matching any of the given (src_id, dep_name_id) pairs."""
+    clauses = [{"src_id": s, "dep_name_id": d} for s, d in pairs]
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def _epoch_from_dt(x: Any) -> int | None:
     """Convert BSON datetime to epoch seconds. Return None if missing."""
     if x is None:
         return None
@@ -41,19 +154,191 @@ def _epoch_from_dt(x: Any) -> Optional[int]:
         return None
 
 
+def iter_raw_batches(cursor) -> Iterator[dict[str, Any]]:
+    """
+    Docs from a find_raw_batches cursor: each batch is one BSON buffer decoded
+    with a single bson.decode_all call instead of per-document cursor work.
+    """
+    try:
+        for batch in cursor:
+            yield from bson.decode_all(batch)
+    finally:
+        try:
+            cursor.close()
+        except Exception:
+            pass
+
+
+def _scan_raw(
+    coll, projection: dict[str, int], batch_size: int, exhaust: bool
+) -> Iterator[dict[str, Any]]:
+    """
+    Every doc of coll (projected) via find_raw_batches. batch_size 0 leaves batch
+    sizing to the server (16 MiB per getMore); exhaust streams the batches without
+    a getMore each, which mongos does not support.
+    """
+    kwargs = {"cursor_type": CursorType.EXHAUST} if exhaust else {}
+    cur = coll.find_raw_batches({}, projection, **kwargs)
+    if batch_size > 0:
+        cur = cur.batch_size(batch_size)
+    return iter_raw_batches(cur)
+
+
+# BSON element type bytes read by _chunk_doc
+_BSON_ARRAY = 0x04
+_BSON_NULL = 0x0A
+_BSON_INT32 = 0x10
+_BSON_INT64 = 0x12
+
+# len(str(i)) for i < len: the key widths of BSON array elements (grown on demand)
+_bson_key_lens = np.empty(0, dtype=np.int64)
+
+
+def _key_lens(n: int) -> np.ndarray:
+    """Key widths of the first n elements of a BSON array."""
+    global _bson_key_lens
+    if len(_bson_key_lens) < n:
+        i = np.arange(max(n, 2 * len(_bson_key_lens), 1024), dtype=np.int64)
+        kl = np.ones(len(i), dtype=np.int64)
+        p = 10
+        while p <= i[-1]:
+            kl += i >= p
+            p *= 10
+        _bson_key_lens = kl
+    return _bson_key_lens[:n]
+
+
+def _uniform_array_len(body: int, width: int) -> int:
+    """
+    Element count of a BSON array whose elements are all one type with `width`
+    value bytes and take `body` bytes together; -1 if no count fits.
+    """
+    n = 0
+    digits = 1
+    band = 10  # keys with this many digits: 0-9, 10-99, ...
+    while body > 0:
+        per = 2 + digits + width  # type byte, key, NUL, value
+        if body < band * per:
+            if body % per:
+                return -1
+            return n + body // per
+        body -= band * per
+        n += band
+        digits += 1
+        band *= 10 if digits > 2 else 9
+    return n
+
+
+def _bson_int_array(buf: np.ndarray, lo: int, hi: int) -> np.ndarray | None:
+    """
+    Values of the BSON array in buf[lo:hi] (uint8) as int64, gathered with NumPy
+    when its elements are all int32 or all int64; None for anything else.
+    """
+    body = hi - lo - 5  # int32 length prefix, trailing NUL
+    if body == 0:
+        return _EMPTY_IDS
+    t = buf[lo + 4]
+    width = 4 if t == _BSON_INT32 else 8 if t == _BSON_INT64 else 0
+    n = _uniform_array_len(body, width) if width else -1
+    if n <= 0:
+        return None
+    kl = _key_lens(n)
+    starts = np.empty(n, dtype=np.int64)
+    starts[0] = lo + 4
+    np.cumsum(kl[:-1] + (2 + width), out=starts[1:])
+    starts[1:] += lo + 4
+    vals = starts + kl + 2
+    if (buf[starts] != t).any() or buf[vals - 1].any():
+        return None
+    raw = buf[vals[:, None] + np.arange(width)]
+    return raw.view("<i4" if width == 4 else "<i8").ravel().astype(np.int64)
+
+
+def _chunk_doc_slow(doc_bytes: bytes) -> tuple[dict[str, int], np.ndarray]:
+    """_chunk_doc via bson.decode; a dst_ids that is not an array reads as empty."""
+    d = bson.decode(doc_bytes)
+    dst_ids = d.pop("dst_ids", None)
+    ints = {
+        k: int(v)
+        for k, v in d.items()
+        if isinstance(v, int) and not isinstance(v, bool)
+    }
+    if not isinstance(dst_ids, list) or not dst_ids:
+        return ints, _EMPTY_IDS
+    return ints, np.asarray(dst_ids, dtype=np.int64)
+
+
+def _chunk_doc(
+    batch: bytes, buf: np.ndarray, lo: int, hi: int
+) -> tuple[dict[str, int], np.ndarray]:
+    """
+    ({field: value} for the int fields, dst_ids as int64) of the chunk doc in
+    batch[lo:hi], read straight from the BSON: dst_ids never becomes a list of
+    Python ints. Docs with other field types, or a dst_ids that is not an
+    all-int32 or all-int64 array, go through bson.decode.
+    """
+    ints: dict[str, int] = {}
+    dst_ids = _EMPTY_IDS
+    pos = lo + 4
+    end = hi - 1
+    while pos < end:
+        t = batch[pos]
+        nul = batch.index(0, pos + 1)
+        name = batch[pos + 1:nul].decode()
+        pos = nul + 1
+        if name == "dst_ids" and t not in (_BSON_ARRAY, _BSON_NULL):
+            return _chunk_doc_slow(batch[lo:hi])
+        if t == _BSON_INT32:
+            ints[name] = int.from_bytes(batch[pos:pos + 4], "little", signed=True)
+            pos += 4
+        elif t == _BSON_INT64:
+            ints[name] = int.from_bytes(batch[pos:pos + 8], "little", signed=True)
+            pos += 8
+        elif t == _BSON_NULL:
+            pass
+        elif name == "dst_ids":
+            alen = int.from_bytes(batch[pos:pos + 4], "little")
+            arr = _bson_int_array(buf, pos, pos + alen)
+            if arr is None:
+                return _chunk_doc_slow(batch[lo:hi])
+            dst_ids = arr
+            pos += alen
+        else:
+            return _chunk_doc_slow(batch[lo:hi])
+    return ints, dst_ids
+
+
+def _iter_chunk_docs(cursor) -> Iterator[tuple[dict[str, int], np.ndarray]]:
+    """
+    _chunk_doc of every doc from a find_raw_batches cursor over
+    global_graph_adj_chunks.
+    """
+    for batch in cursor:
+        buf = np.frombuffer(batch, dtype=np.uint8)
+        off = 0
+        while off < len(batch):
+            n = int.from_bytes(batch[off:off + 4], "little")
+            yield _chunk_doc(batch, buf, off, off + n)
+            off += n
+
+
 class LRUCache:
     """Generic LRU cache supporting different key types."""
 
     def __init__(self, cap: int):
         self.cap = max(0, int(cap))
         self._od: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
 
     def get(self, k: Any) -> Any:
         if self.cap <= 0:
             return None
         if k in self._od:
+            self.hits += 1
             self._od.move_to_end(k)
             return self._od[k]
+        self.misses += 1
         return None
 
     def has_key(self, k: Any) -> bool:
@@ -76,22 +361,126 @@ class LRUCache:
     def __len__(self) -> int:
         return len(self._od)
 
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self),
+            "cap": self.cap,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
 
-@dataclass
-class ChunkInfo:
-    chunk: int
-    n: int
-    min_t: Optional[int]
-    max_t: Optional[int]
+
+class ClockCache:
+    """
+    CLOCK (second-chance) cache with the LRUCache interface. get() only sets the
+    entry's reference bit instead of reordering; on a full put() the hand clears
+    set bits until it finds an unreferenced slot to evict. New entries start
+    unreferenced, so keys touched once are evicted before ones hit again.
+    """
+
+    def __init__(self, cap: int):
+        self.cap = max(0, int(cap))
+        self._map: dict[Any, int] = {}  # key -> slot
+        self._keys: list[Any] = []
+        self._vals: list[Any] = []
+        self._ref = bytearray(self.cap)
+        self._hand = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, k: Any) -> Any:
+        idx = self._map.get(k)
+        if idx is None:
+            if self.cap > 0:
+                self.misses += 1
+            return None
+        self.hits += 1
+        self._ref[idx] = 1
+        return self._vals[idx]
+
+    def has_key(self, k: Any) -> bool:
+        """Check if key exists in cache (even if value is None)."""
+        return k in self._map
+
+    def put(self, k: Any, v: Any) -> None:
+        if self.cap <= 0:
+            return
+        idx = self._map.get(k)
+        if idx is not None:
+            self._vals[idx] = v
+            self._ref[idx] = 1
+            return
+        if len(self._keys) < self.cap:
+            idx = len(self._keys)
+            self._keys.append(k)
+            self._vals.append(v)
+        else:
+            ref = self._ref
+            hand = self._hand
+            while ref[hand]:
+                ref[hand] = 0
+                hand += 1
+                if hand == self.cap:
+                    hand = 0
+            idx = hand
+            del self._map[self._keys[idx]]
+            self._keys[idx] = k
+            self._vals[idx] = v
+            self._hand = hand + 1 if hand + 1 < self.cap else 0
+        self._map[k] = idx
+
+    def __len__(self) -> int:
+        return len(self._map)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self),
+            "cap": self.cap,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Cache classes selectable through load_context(cache_policy=...)
+CACHE_POLICIES = {"lru": LRUCache, "clock": ClockCache}
 
 
 @dataclass
 class DepHeader:
+    """
+    Chunk bounds for (src_id, dep_name_id) as parallel arrays indexed by chunk
+    number: chunk_n (int32) counts, chunk_min_t / chunk_max_t (int64) time bounds,
+    TIME_MAX where unknown.
+    """
+
     src_id: int
     dep_name_id: int
-    chunks: List[ChunkInfo]
-    min_t: Optional[int]
-    max_t: Optional[int]
+    chunk_n: np.ndarray
+    chunk_min_t: np.ndarray
+    chunk_max_t: np.ndarray
+    min_t: int | None
+    max_t: int | None
+    # Flattened chunk data, filled on first use by ResolutionContext.get_header_arrays
+    flat: tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray] | None = field(
+        default=None, repr=False
+    )
+    # Small headers only: every dst_id with its time, ascending by time, filled by
+    # get_header
+    merged_dst: np.ndarray | None = field(default=None, repr=False)
+    merged_times: np.ndarray | None = field(default=None, repr=False)
+    # {dst_id: time} over all chunks (known times only), filled on first use by
+    # get_edge_index
+    edge_index: dict[int, int] | None = field(default=None, repr=False)
+    # OR of node_py_mask over each chunk's dst_ids (uint32), filled with flat; a chunk
+    # whose bits miss the required Python mask has no candidate worth reading
+    chunk_py_or: np.ndarray | None = field(default=None, repr=False)
+    # Bloom filter over the dst_ids in edge_index, filled on first use by get_bloom;
+    # rejects most absent edges before edge_index is built or probed
+    bloom: np.ndarray | None = field(default=None, repr=False)
+
+    @property
+    def num_chunks(self) -> int:
+        return len(self.chunk_n)
 
 
 @dataclass
@@ -101,220 +490,907 @@ class ResolutionContext:
     Chunks and headers are fetched on-demand and cached with LRU.
     """
 
-    # Arrays indexed by node_id (length = max_node_id + 1)
-    node_py_mask: List[int]
-    node_time: List[Optional[int]]
-    node_name_id: List[Optional[int]]
+    # NumPy arrays indexed by node_id, all of length max_node_id + 1 (checked in
+    # __post_init__). Missing values are NO_TIME / NO_NAME; callers validate
+    # node_id < len() once at entry and index unchecked from there, and chunk
+    # dst_ids outside them are dropped on load (_chunk_arrays).
+    node_py_mask: np.ndarray  # uint32
+    node_time: np.ndarray  # int64, NO_TIME if unknown
+    node_name_id: np.ndarray  # int32, NO_NAME if unknown
 
-    # name_id -> name (and optionally name -> name_id)
-    name_id_to_name: Dict[int, str] = field(default_factory=dict)
+    # Package names packed by name_id: name_id's UTF-8 name is
+    # name_blob[name_offsets[name_id]:name_offsets[name_id + 1]] (empty if unknown)
+    name_blob: bytes = b""
+    name_offsets: np.ndarray = field(
+        default_factory=lambda: np.zeros(1, dtype=np.int64)
+    )
 
-    # src_id -> list of dep_name_id (direct dependencies) - loaded in memory
-    adj_deps: Dict[int, List[int]] = field(default_factory=dict)
+    # Direct dependencies as CSR by src_id: src_id's dep_name_ids are
+    # deps[deps_start[src_id]:deps_start[src_id + 1]] (int32; deps_start int64).
+    # Left at the defaults, every node gets an empty span (see __post_init__).
+    deps_start: np.ndarray = field(default_factory=lambda: np.zeros(1, dtype=np.int64))
+    deps: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
 
-    # LRU caches for on-demand loading
-    chunk_lru: Optional[LRUCache] = None
-    header_lru: Optional[LRUCache] = None
+    # Caches for on-demand loading (LRUCache or ClockCache)
+    chunk_lru: LRUCache | ClockCache | None = None
+    header_lru: LRUCache | ClockCache | None = None
 
     # For on-demand loading (when using MongoDB)
     chunks_coll: Any = None  # pymongo Collection or None if using preloaded data only
     adj_headers_coll: Any = None  # pymongo Collection or None if using preloaded data only
 
-    def get_chunk(self, src_id: int, dep_name_id: int, chunk: int) -> List[int]:
-        """Return dst_ids for the given chunk (from cache or DB)."""
-        key = (src_id, dep_name_id, chunk)
+    # Memory-mapped graph (pipstyle.bingraph.BinaryGraph); when set, headers and
+    # chunks are read from it instead of MongoDB
+    graph: Any = None
+
+    # src_ids whose chunks were already bulk-fetched by get_chunk
+    _srcs_prefetched: set[int] = field(default_factory=set, repr=False)
+
+    # Scratch output for the candidate filter in chunks.py (grown on demand)
+    _cand_out: np.ndarray | None = field(default=None, repr=False)
+
+    # name_ids with a name, sorted by name bytes; built by the first name_id_of
+    _name_order: np.ndarray | None = field(default=None, repr=False)
+
+    def __post_init__(self) -> None:
+        n = len(self.node_time)
+        if len(self.deps_start) == 1 and not len(self.deps):
+            self.deps_start = np.zeros(n + 1, dtype=np.int64)
+        if (
+            len(self.node_py_mask) != n
+            or len(self.node_name_id) != n
+            or len(self.deps_start) != n + 1
+        ):
+            raise ValueError(
+                f"node arrays disagree: node_time {n:,}, "
+                f"node_py_mask {len(self.node_py_mask):,}, "
+                f"node_name_id {len(self.node_name_id):,}, "
+                f"deps_start {len(self.deps_start):,} (want n + 1)"
+            )
+
+    def name_of(self, name_id: int) -> str | None:
+        """Package name for name_id, or None if unknown."""
+        if not 0 <= name_id < len(self.name_offsets) - 1:
+            return None
+        lo = int(self.name_offsets[name_id])
+        hi = int(self.name_offsets[name_id + 1])
+        return self.name_blob[lo:hi].decode() if hi > lo else None
+
+    def name_id_of(self, name: str) -> int | None:
+        """name_id of a package name, or None. Binary search over _name_order."""
+        enc = name.encode()
+        if not enc:
+            return None
+        order = self._name_order
+        if order is None:
+            order = self._name_order = self._sorted_name_ids()
+        blob = self.name_blob
+        offsets = self.name_offsets
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            i = int(order[mid])
+            if blob[offsets[i]:offsets[i + 1]] < enc:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(order):
+            i = int(order[lo])
+            if blob[offsets[i]:offsets[i + 1]] == enc:
+                return i
+        return None
+
+    def _sorted_name_ids(self) -> np.ndarray:
+        """name_ids with a non-empty name, by name bytes (lowest id first on ties)."""
+        blob = self.name_blob
+        bounds = self.name_offsets.tolist()
+        names = [blob[lo:hi] for lo, hi in zip(bounds, bounds[1:])]
+        ids = [i for i, b in enumerate(names) if b]
+        ids.sort(key=names.__getitem__)
+        return np.array(ids, dtype=np.int64)
+
+    def cand_buffer(self, n: int) -> np.ndarray:
+        """Return a reusable int64 buffer of at least n entries."""
+        out = self._cand_out
+        if out is None or len(out) < n:
+            out = self._cand_out = np.empty(
+                max(n, 64 if out is None else 2 * len(out)), dtype=np.int64
+            )
+        return out
+
+    def get_chunk(
+        self, src_id: int, dep_name_id: int, chunk: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return (dst_ids, times) for the given chunk (from cache or DB): int64 arrays,
+        times[i] = node_time[dst_ids[i]] with NO_TIME replaced by TIME_MAX so the
+        array stays ascending for searchsorted.
+        """
+        if self.graph is not None:
+            return self.graph.chunk(src_id, dep_name_id, chunk)
+        key = _pack3(src_id, dep_name_id, chunk)
         if self.chunk_lru is not None:
             cached = self.chunk_lru.get(key)
             if cached is not None:
                 return cached
+            if self.chunk_lru.cap > 0 and src_id not in self._srcs_prefetched:
+                self._prefetch_src_chunks(src_id)
+                cached = self.chunk_lru.get(key)
+                if cached is not None:
+                    return cached
         if self.chunks_coll is not None:
-            doc = self.chunks_coll.find_one(
+            cur = self.chunks_coll.find_raw_batches(
                 {"src_id": src_id, "dep_name_id": dep_name_id, "chunk": chunk},
-                {"dst_ids": 1},
+                {"_id": 0, "dst_ids": 1},
+            ).hint(CHUNK_INDEX_NAME).limit(1)
+            entry = self._chunk_arrays(
+                next((d for _, d in _iter_chunk_docs(cur)), _EMPTY_IDS)
             )
-            dst_ids = [int(x) for x in (doc.get("dst_ids") or [])] if doc else []
             if self.chunk_lru is not None:
-                self.chunk_lru.put(key, dst_ids)
-            return dst_ids
-        return []
-
-    def get_dep_name_ids(self, src_id: int) -> List[int]:
-        """Return list of dep_name_id for src_id (from preloaded dict)."""
-        return self.adj_deps.get(src_id, [])
-
-    def get_header(self, src_id: int, dep_name_id: int) -> Optional[DepHeader]:
-        """Return DepHeader for (src_id, dep_name_id) (from cache or DB)."""
-        key = (src_id, dep_name_id)
-        
+                self.chunk_lru.put(key, entry)
+            return entry
+        return _EMPTY_IDS, _EMPTY_IDS
+
+    def get_chunks_batch(
+        self, src_id: int, dep_name_id: int, chunks: list[int]
+    ) -> dict[int, tuple[np.ndarray, np.ndarray]]:
+        """
+        {chunk: (dst_ids, times)} for the given chunks of (src_id, dep_name_id), as
+        get_chunk would return them, with every chunk_lru miss fetched by one $in query.
+        """
+        if self.graph is not None:
+            return {c: self.graph.chunk(src_id, dep_name_id, c) for c in chunks}
+        lru = self.chunk_lru
+        out: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+        if lru is not None and lru.cap > 0 and src_id not in self._srcs_prefetched:
+            self._prefetch_src_chunks(src_id)
+        misses: list[int] = []
+        for c in chunks:
+            cached = (
+                lru.get(_pack3(src_id, dep_name_id, c)) if lru is not None else None
+            )
+            if cached is not None:
+                out[c] = cached
+            else:
+                misses.append(c)
+        if not misses:
+            return out
+        if self.chunks_coll is not None:
+            cur = (
+                self.chunks_coll.find_raw_batches(
+                    {
+                        "src_id": src_id,
+                        "dep_name_id": dep_name_id,
+                        "chunk": {"$in": misses},
+                    },
+                    {"_id": 0, "chunk": 1, "dst_ids": 1},
+                )
+                .hint(CHUNK_INDEX_NAME)
+                .batch_size(len(misses))
+            )
+            for f, dst_ids in _iter_chunk_docs(cur):
+                out[f["chunk"]] = self._chunk_arrays(dst_ids)
+        for c in misses:
+            entry = out.setdefault(c, (_EMPTY_IDS, _EMPTY_IDS))
+            if lru is not None and self.chunks_coll is not None:
+                lru.put(_pack3(src_id, dep_name_id, c), entry)
+        return out
+
+    def _prefetch_src_chunks(self, src_id: int) -> None:
+        """
+        Put chunks of every dep of src_id into chunk_lru with one query. Capped at
+        SRC_PREFETCH_MAX_CHUNKS so a huge src cannot flush the cache; chunks past
+        the cap are left to per-chunk find_one.
+        """
+        self._srcs_prefetched.add(src_id)
+        if self.chunks_coll is None:
+            return
+        cur = self.chunks_coll.find_raw_batches(
+            {"src_id": src_id},
+            {"_id": 0, "dep_name_id": 1, "chunk": 1, "dst_ids": 1},
+        ).hint(CHUNK_INDEX_NAME).limit(SRC_PREFETCH_MAX_CHUNKS).batch_size(500)
+        for f, dst_ids in _iter_chunk_docs(cur):
+            key = _pack3(src_id, f["dep_name_id"], f["chunk"])
+            self.chunk_lru.put(key, self._chunk_arrays(dst_ids))
+
+    def prefetch_chunks(self, src_ids: list[int], batch_size: int = 5_000) -> int:
+        """
+        Warm chunk_lru with every chunk of the given src_ids: one $in query per
+        batch, read in index order with CHUNK_INDEX_NAME hinted. The srcs are then
+        skipped by get_chunk's per-src fetch. Returns the number of chunks loaded.
+        """
+        if (
+            self.chunks_coll is None
+            or self.chunk_lru is None
+            or self.chunk_lru.cap <= 0
+        ):
+            return 0
+        loaded = 0
+        for b in range(0, len(src_ids), batch_size):
+            batch = [int(x) for x in src_ids[b:b + batch_size]]
+            cur = (
+                self.chunks_coll.find_raw_batches(
+                    {"src_id": {"$in": batch}},
+                    {"_id": 0, "src_id": 1, "dep_name_id": 1, "chunk": 1, "dst_ids": 1},
+                )
+                .sort(CHUNK_INDEX_KEYS)
+                .hint(CHUNK_INDEX_NAME)
+                .batch_size(10_000)
+            )
+            for f, dst_ids in _iter_chunk_docs(cur):
+                key = _pack3(f["src_id"], f["dep_name_id"], f["chunk"])
+                self.chunk_lru.put(key, self._chunk_arrays(dst_ids))
+                loaded += 1
+            self._srcs_prefetched.update(batch)
+        return loaded
+
+    def _chunk_arrays(self, dst_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (dst_ids, times) for dst_ids as loaded from a chunk doc. Ids outside the
+        node arrays are dropped, so everything cached can be indexed unchecked.
+        """
+        n = len(self.node_time)
+        if len(dst_ids) and (dst_ids.min() < 0 or dst_ids.max() >= n):
+            dst_ids = dst_ids[(dst_ids >= 0) & (dst_ids < n)]
+        return dst_ids, self._search_times(dst_ids)
+
+    def _search_times(self, dst_ids: np.ndarray) -> np.ndarray:
+        """node_time[dst_ids], NO_TIME as TIME_MAX; dst_ids must be in range."""
+        times = self.node_time[dst_ids]
+        times[times == NO_TIME] = TIME_MAX
+        return times
+
+    def _merge_small_headers(self, hs: list[DepHeader]) -> None:
+        """
+        Fetch all chunks of the headers in hs with one query and store them on each
+        as merged_dst / merged_times, sorted ascending by time. These bypass chunk_lru.
+        """
+        parts: dict[int, list[np.ndarray]] = {
+            _pack2(h.src_id, h.dep_name_id): [] for h in hs
+        }
+        cur = self.chunks_coll.find_raw_batches(
+            _pairs_filter([(h.src_id, h.dep_name_id) for h in hs]),
+            {"_id": 0, "src_id": 1, "dep_name_id": 1, "chunk": 1, "dst_ids": 1},
+        ).sort(CHUNK_INDEX_KEYS).hint(CHUNK_INDEX_NAME)
+        for f, dst_ids in _iter_chunk_docs(cur):
+            parts[_pack2(f["src_id"], f["dep_name_id"])].append(dst_ids)
+        for h in hs:
+            p = parts[_pack2(h.src_id, h.dep_name_id)]
+            dst_ids, times = self._chunk_arrays(np.concatenate(p) if p else _EMPTY_IDS)
+            order = np.argsort(times, kind="stable")
+            h.merged_dst = dst_ids[order]
+            h.merged_times = times[order]
+
+    def get_header_arrays(
+        self, h: DepHeader
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return (dst_ids, times, starts, mins) for all of h's chunks: dst_ids/times
+        concatenated in chunk order (from get_chunks_batch), chunk c spanning
+        starts[c]:starts[c+1], mins[c] its min_t (TIME_MAX if unknown).
+        Built once and kept on the header, along with h.chunk_py_or.
+        """
+        if h.flat is None:
+            by_chunk = self.get_chunks_batch(
+                h.src_id, h.dep_name_id, list(range(h.num_chunks))
+            )
+            parts = [by_chunk[c] for c in range(h.num_chunks)]
+            starts = np.zeros(len(parts) + 1, dtype=np.int64)
+            starts[1:] = np.cumsum([len(p[0]) for p in parts])
+            mins = h.chunk_min_t
+            if parts:
+                dst_ids = np.concatenate([p[0] for p in parts])
+                times = np.concatenate([p[1] for p in parts])
+            else:
+                dst_ids = times = _EMPTY_IDS
+            h.flat = (dst_ids, times, starts, mins)
+        if h.chunk_py_or is None:
+            h.chunk_py_or = self._chunk_py_or(h.flat[0], h.flat[2])
+        return h.flat
+
+    def _chunk_py_or(self, dst_ids: np.ndarray, starts: np.ndarray) -> np.ndarray:
+        """
+        Per-chunk OR of node_py_mask over dst_ids[starts[c]:starts[c+1]]; 0 for
+        empty chunks.
+        """
+        py_or = np.zeros(len(starts) - 1, dtype=np.uint32)
+        lo = starts[:-1]
+        nonempty = starts[1:] > lo
+        if nonempty.any():
+            # empty chunks have zero width, so the non-empty ones still tile dst_ids
+            py_or[nonempty] = np.bitwise_or.reduceat(
+                self.node_py_mask[dst_ids], lo[nonempty]
+            )
+        return py_or
+
+    def _known_dsts(self, h: DepHeader) -> tuple[np.ndarray, np.ndarray]:
+        """(dst_ids, times) of h's candidates with a known time."""
+        if h.merged_dst is not None:
+            dst_ids, times = h.merged_dst, h.merged_times
+        else:
+            dst_ids, times = self.get_header_arrays(h)[:2]
+        known = times != TIME_MAX
+        return dst_ids[known], times[known]
+
+    def get_edge_index(self, h: DepHeader) -> dict[int, int]:
+        """
+        {dst_id: time} for every candidate of h with a known time, so an edge check
+        is one dict probe. Built once and kept on the header.
+        """
+        if h.edge_index is None:
+            dst_ids, times = self._known_dsts(h)
+            h.edge_index = dict(zip(dst_ids.tolist(), times.tolist()))
+        return h.edge_index
+
+    def get_bloom(self, h: DepHeader) -> np.ndarray:
+        """
+        Bloom filter over the dst_ids of get_edge_index(h). Built once and kept on
+        the header.
+        """
+        if h.bloom is None:
+            h.bloom = bloom_build(self._known_dsts(h)[0])
+        return h.bloom
+
+    def get_dep_name_ids(self, src_id: int) -> np.ndarray:
+        """
+        Return the dep_name_ids of src_id: an int32 view into deps (empty if none).
+        src_id must be a valid node_id; deps_start spans every node (__post_init__).
+        """
+        return self.deps[self.deps_start[src_id]:self.deps_start[src_id + 1]]
+
+    def get_header(self, src_id: int, dep_name_id: int) -> DepHeader | None:
+        """Return DepHeader for (src_id, dep_name_id) from cache, binary graph or DB."""
+        key = _pack2(src_id, dep_name_id)
+
         # Try cache first - check if key exists (even if value is None)
         if self.header_lru is not None and self.header_lru.has_key(key):
             cached = self.header_lru.get(key)
             return cached  # Could be None if we cached that header doesn't exist
-        
+
+        if self.graph is not None:
+            header = self.graph.header(src_id, dep_name_id)
+            if self.header_lru is not None:
+                self.header_lru.put(key, header)
+            return header
+
         # Query from DB if collection is available
         if self.adj_headers_coll is not None:
             doc = self.adj_headers_coll.find_one(
                 {"src_id": src_id, "dep_name_id": dep_name_id},
-                {"src_id": 1, "dep_name_id": 1, "mi": 1, "ma": 1, "n": 1, "total": 1},
+                HEADER_PROJECTION,
+                hint=HEADER_INDEX_NAME,
             )
-            if not doc:
-                if self.header_lru is not None:
-                    self.header_lru.put(key, None)
-                return None
-            
-            mi = doc.get("mi") or []
-            ma = doc.get("ma") or []
-            nn = doc.get("n") or []
-            if not (isinstance(mi, list) and isinstance(ma, list) and isinstance(nn, list)):
-                if self.header_lru is not None:
-                    self.header_lru.put(key, None)
-                return None
-            
-            L = len(nn)
-            if len(mi) != L or len(ma) != L:
-                if self.header_lru is not None:
-                    self.header_lru.put(key, None)
-                return None
-            
-            chunks_list: List[ChunkInfo] = []
-            overall_min = None
-            overall_max = None
-            for idx in range(L):
-                min_t = int(mi[idx]) if mi[idx] is not None else None
-                max_t = int(ma[idx]) if ma[idx] is not None else None
-                cnt = int(nn[idx]) if nn[idx] is not None else 0
-                chunks_list.append(ChunkInfo(chunk=idx, n=cnt, min_t=min_t, max_t=max_t))
-                if min_t is not None:
-                    overall_min = min_t if overall_min is None else min(overall_min, min_t)
-                if max_t is not None:
-                    overall_max = max_t if overall_max is None else max(overall_max, max_t)
-            
-            header = DepHeader(
-                src_id=int(doc["src_id"]),
-                dep_name_id=int(doc["dep_name_id"]),
-                chunks=chunks_list,
-                min_t=overall_min,
-                max_t=overall_max,
+            header = header_from_doc(doc) if doc else None
+            small = (
+                header is not None
+                and int(header.chunk_n.sum()) <= SMALL_HEADER_THRESHOLD
             )
+            if small and self.chunks_coll is not None:
+                self._merge_small_headers([header])
             if self.header_lru is not None:
-                self.header_lru.put(key, header)
+                self.header_lru.put(
+                    key, header
+                )  # None caches that the header doesn't exist
             return header
-        
+
         return None
 
+    def get_headers_batch(self, pairs: list[tuple[int, int]]) -> None:
+        """
+        Put the headers of every (src_id, dep_name_id) in pairs that header_lru does
+        not hold yet into it with one $or query (plus one for small-header merges),
+        instead of one find_one per pair in get_header. Pairs without a header are
+        cached as None, as get_header does.
+        """
+        lru = self.header_lru
+        if (
+            self.graph is not None
+            or self.adj_headers_coll is None
+            or lru is None
+            or lru.cap <= 0
+        ):
+            return
+        misses: dict[int, tuple[int, int]] = {}
+        for src_id, dep_name_id in pairs:
+            key = _pack2(src_id, dep_name_id)
+            if key not in misses and not lru.has_key(key):
+                misses[key] = (src_id, dep_name_id)
+        if not misses:
+            return
+        found: dict[int, DepHeader | None] = {}
+        cur = self.adj_headers_coll.find(
+            _pairs_filter(list(misses.values())),
+            HEADER_PROJECTION,
+            hint=HEADER_INDEX_NAME,
+        )
+        for doc in cur.batch_size(len(misses)):
+            found[_pack2(int(doc["src_id"]), int(doc["dep_name_id"]))] = (
+                header_from_doc(doc)
+            )
+        small = [
+            h for h in found.values()
+            if h is not None and int(h.chunk_n.sum()) <= SMALL_HEADER_THRESHOLD
+        ]
+        if small and self.chunks_coll is not None:
+            self._merge_small_headers(small)
+        for key in misses:
+            lru.put(key, found.get(key))
+
 
-def load_context(
-    mongo_uri: str = "mongodb://localhost:27017",
-    pypi_db: str = "pypi_dump",
-    chunk_cache_cap: int = 200_000,
-    header_cache_cap: int = 500_000,
-) -> ResolutionContext:
+HEADER_PROJECTION = {
+    "_id": 0,
+    "src_id": 1,
+    "dep_name_id": 1,
+    "mi": 1,
+    "ma": 1,
+    "n": 1,
+    "total": 1,
+}
+
+
+def header_from_doc(doc: dict[str, Any]) -> DepHeader | None:
     """
-    Load in-memory collections from MongoDB and create resolution context.
-    Requires pymongo. Chunks and headers are loaded on demand and cached.
+    Parse a global_graph_adj_headers doc into a DepHeader. Returns None if its
+    per-chunk mi/ma/n lists are missing or inconsistent.
     """
-    if not _HAS_PYMONGO:
-        raise RuntimeError("pymongo is required for load_context()")
-    client = MongoClient(mongo_uri)
-    db = client[pypi_db]
+    mi = doc.get("mi") or []
+    ma = doc.get("ma") or []
+    nn = doc.get("n") or []
+    if not (isinstance(mi, list) and isinstance(ma, list) and isinstance(nn, list)):
+        return None
 
-    node_ids_coll = db["global_graph_node_ids"]
-    name_ids_coll = db["global_graph_name_ids"]
-    rp_coll = db["global_graph_requires_python_with_timestamps"]
-    adj_deps_coll = db["global_graph_adj_deps"]
-    adj_headers_coll = db["global_graph_adj_headers"]
-    chunks_coll = db["global_graph_adj_chunks"]
+    L = len(nn)
+    if len(mi) != L or len(ma) != L:
+        return None
+    src_id = int(doc["src_id"])
+    dep_name_id = int(doc["dep_name_id"])
+    if L >> _CHUNK_BITS:
+        raise ValueError(
+            f"header ({src_id}, {dep_name_id}) has {L:,} chunks, "
+            f"over the {_CHUNK_BITS}-bit cache key field"
+        )
+
+    chunk_n = np.array([0 if x is None else x for x in nn], dtype=np.int32)
+    chunk_min_t = np.array([TIME_MAX if x is None else x for x in mi], dtype=np.int64)
+    chunk_max_t = np.array([TIME_MAX if x is None else x for x in ma], dtype=np.int64)
+    return make_header(src_id, dep_name_id, chunk_n, chunk_min_t, chunk_max_t)
+
+
+def make_header(
+    src_id: int,
+    dep_name_id: int,
+    chunk_n: np.ndarray,
+    chunk_min_t: np.ndarray,
+    chunk_max_t: np.ndarray,
+) -> DepHeader:
+    """
+    DepHeader over the given chunk arrays, with the overall min_t/max_t of their
+    known bounds.
+    """
+    known_min = chunk_min_t[chunk_min_t != TIME_MAX]
+    known_max = chunk_max_t[chunk_max_t != TIME_MAX]
+    return DepHeader(
+        src_id=src_id,
+        dep_name_id=dep_name_id,
+        chunk_n=chunk_n,
+        chunk_min_t=chunk_min_t,
+        chunk_max_t=chunk_max_t,
+        min_t=int(known_min.min()) if len(known_min) else None,
+        max_t=int(known_max.max()) if len(known_max) else None,
+    )
+
+
+def _deps_csr(
+    n: int, srcs: np.ndarray, lens: np.ndarray, vals: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    CSR (deps_start, deps) over src_ids 0..n-1 from per-src runs in any order:
+    srcs[i] owns the next lens[i] entries of vals.
+    """
+    counts = np.zeros(n + 1, dtype=np.int64)
+    counts[srcs + 1] = lens
+    deps_start = np.cumsum(counts)
+    # run i moves from vals[run_off[i]:] to deps[deps_start[srcs[i]]:]
+    run = np.repeat(np.arange(len(srcs)), lens)
+    run_off = np.cumsum(lens) - lens
+    deps = np.empty(len(vals), dtype=np.int32)
+    deps[deps_start[srcs][run] + np.arange(len(vals)) - run_off[run]] = vals
+    return deps_start, deps
 
-    # 1) Build name_id <-> name
+
+def _load_names(
+    db, scan_batch_size: int, exhaust: bool
+) -> tuple[bytes, np.ndarray, int, np.ndarray, np.ndarray]:
+    """
+    Loader phases 1-2: global_graph_name_ids packed into (name_blob, name_offsets),
+    then global_graph_node_ids as node_id -> name_id pairs. Returns
+    (name_blob, name_offsets, max node_id seen, pair node_ids, pair name_ids).
+    """
+    # 1) Build name -> name_id, then pack the names by name_id into one buffer
     print("[load] Loading global_graph_name_ids ...")
-    name_id_to_name: Dict[int, str] = {}
-    for d in name_ids_coll.find({}, {"name": 1, "id": 1}):
+    name_to_id: dict[str, int] = {}
+    for d in _scan_raw(
+        db["global_graph_name_ids"],
+        {"_id": 0, "name": 1, "id": 1},
+        scan_batch_size,
+        exhaust,
+    ):
         n = d.get("name")
         i = d.get("id")
         if n is not None and i is not None:
-            name_id_to_name[int(i)] = str(n)
-    print(f"[load] Loaded {len(name_id_to_name):,} name_id mappings")
+            name_to_id[str(n)] = int(i)
+    print(f"[load] Loaded {len(name_to_id):,} name_id mappings")
+    max_name_id = max(name_to_id.values(), default=0)
+    names_by_id = [b""] * (max_name_id + 1)
+    for n, i in name_to_id.items():
+        if i >= 0:
+            names_by_id[i] = n.encode()
+    name_offsets = np.zeros(len(names_by_id) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in names_by_id], out=name_offsets[1:])
+    name_blob = b"".join(names_by_id)
+    del names_by_id
 
-    # 2) Find max node_id and build node_id -> name_id from global_graph_node_ids
+    # 2) node_id -> name_id from global_graph_node_ids, in one pass: pairs are
+    #    packed into typed arrays while max_id is tracked
     print("[load] Loading global_graph_node_ids ...")
     max_id = 0
-    for d in node_ids_coll.find({}, {"id": 1, "name": 1}).batch_size(50000):
-        nid = d.get("id")
-        if nid is not None:
-            nid = int(nid)
-            if nid > max_id:
-                max_id = nid
-
-    name_to_id = {v: k for k, v in name_id_to_name.items()}
-    node_name_id: List[Optional[int]] = [None] * (max_id + 1)
-    count = 0
-    for d in node_ids_coll.find({}, {"id": 1, "name": 1}).batch_size(50000):
+    nn_ids = array("q")
+    nn_vals = array("i")
+    for d in _scan_raw(
+        db["global_graph_node_ids"],
+        {"_id": 0, "id": 1, "name": 1},
+        scan_batch_size,
+        exhaust,
+    ):
         nid = d.get("id")
+        if nid is None:
+            continue
+        nid = int(nid)
+        if nid > max_id:
+            max_id = nid
         name = d.get("name")
-        if nid is not None and name is not None:
-            nid = int(nid)
+        if name is not None:
             name_id = name_to_id.get(str(name))
-            if 0 <= nid <= max_id and name_id is not None:
-                node_name_id[nid] = name_id
-                count += 1
-    print(f"[load] Loaded {count:,} node_id -> name_id mappings (max_id={max_id:,})")
+            if nid >= 0 and name_id is not None:
+                nn_ids.append(nid)
+                nn_vals.append(name_id)
+    print(
+        f"[load] Loaded {len(nn_ids):,} node_id -> name_id mappings (max_id={max_id:,})"
+    )
+    return (
+        name_blob,
+        name_offsets,
+        max_id,
+        np.frombuffer(nn_ids, dtype=np.int64),
+        np.frombuffer(nn_vals, dtype=np.int32),
+    )
 
-    # 3) requires_python_with_timestamps -> node_py_mask, node_time
+
+def _load_py_time(
+    db, scan_batch_size: int, exhaust: bool
+) -> tuple[int, int, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Loader phase 3: global_graph_requires_python_with_timestamps in one pass.
+    Returns (max node_id seen, default py_mask, py_mask node_ids / values,
+    time node_ids / values); the default is the OR of all masks.
+    """
     print("[load] Loading global_graph_requires_python_with_timestamps ...")
+    max_id = 0
     all_mask = 0
-    for d in rp_coll.find({}, {"_id": 1, "py_mask": 1}).batch_size(100000):
+    pm_ids = array("q")
+    pm_vals = array("q")
+    t_ids = array("q")
+    t_vals = array("q")
+    count = 0
+    rp_proj = {"_id": 1, "py_mask": 1, "first_upload_time": 1}
+    for d in _scan_raw(
+        db["global_graph_requires_python_with_timestamps"],
+        rp_proj,
+        scan_batch_size,
+        exhaust,
+    ):
         nid = int(d["_id"])
         if nid > max_id:
             max_id = nid
         pm = d.get("py_mask")
         if pm is not None:
-            all_mask |= int(pm)
+            pm = int(pm)
+            all_mask |= pm
+            pm_ids.append(nid)
+            pm_vals.append(pm)
+        tm = _epoch_from_dt(d.get("first_upload_time"))
+        if tm is not None:
+            t_ids.append(nid)
+            t_vals.append(tm)
+        count += 1
     if all_mask == 0:
         all_mask = (1 << 26) - 1
+    if all_mask >> 32:
+        raise ValueError(
+            f"py_mask bits {all_mask:#x} do not fit the uint32 node_py_mask"
+        )
+    print(f"[load] Loaded {count:,} node py_mask/time entries")
+    return (
+        max_id,
+        all_mask,
+        np.frombuffer(pm_ids, dtype=np.int64),
+        np.frombuffer(pm_vals, dtype=np.int64),
+        np.frombuffer(t_ids, dtype=np.int64),
+        np.frombuffer(t_vals, dtype=np.int64),
+    )
 
-    # Extend arrays if needed
-    while len(node_name_id) <= max_id:
-        node_name_id.append(None)
 
-    node_py_mask = [all_mask] * (max_id + 1)
-    node_time = [None] * (max_id + 1)
-    count = 0
-    for d in rp_coll.find({}, {"_id": 1, "py_mask": 1, "first_upload_time": 1}).batch_size(100000):
-        nid = int(d["_id"])
-        if nid <= max_id:
-            pm = d.get("py_mask")
-            if pm is not None:
-                node_py_mask[nid] = int(pm)
-            node_time[nid] = _epoch_from_dt(d.get("first_upload_time"))
-            count += 1
-    print(f"[load] Loaded {count:,} node py_mask/time entries (array size={len(node_py_mask):,})")
-
-    # 4) adj_deps: src_id -> list of dep_name_id (load into memory)
+def _load_deps(
+    db, scan_batch_size: int, exhaust: bool
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Loader phase 4: global_graph_adj_deps streamed into typed arrays. Returns
+    (src_ids, run lengths, dep_name_ids) in collection order, for _deps_csr.
+    """
     print("[load] Loading global_graph_adj_deps ...")
-    adj_deps: Dict[int, List[int]] = {}
-    count = 0
-    for d in adj_deps_coll.find({}, {"_id": 1, "deps": 1}).batch_size(50000):
+    dep_srcs = array("q")
+    dep_lens = array("q")
+    dep_vals = array("i")
+    for d in _scan_raw(
+        db["global_graph_adj_deps"], {"_id": 1, "deps": 1}, scan_batch_size, exhaust
+    ):
         src_id = d.get("_id")
         deps = d.get("deps") or []
         if src_id is not None:
-            adj_deps[int(src_id)] = [int(x) for x in deps]
-            count += 1
-    print(f"[load] Loaded {count:,} adj_deps entries into memory")
+            dep_srcs.append(int(src_id))
+            dep_lens.append(len(deps))
+            dep_vals.extend(int(x) for x in deps)
+    print(f"[load] Loaded {len(dep_srcs):,} adj_deps entries")
+    return (
+        np.frombuffer(dep_srcs, dtype=np.int64),
+        np.frombuffer(dep_lens, dtype=np.int64),
+        np.frombuffer(dep_vals, dtype=np.int32),
+    )
+
+
+def _load_arrays(
+    mongo_uri: str,
+    pypi_db: str,
+    db,
+    scan_batch_size: int,
+    exhaust: bool,
+    loader_threads: int,
+) -> dict[str, Any]:
+    """
+    Loader phases 1-4 (see load_context): the ResolutionContext arrays, keyed by
+    field name (CONTEXT_CACHE_ARRAYS plus name_blob).
+    """
+    # The collection scans run concurrently, each on its own client: names
+    # then node_ids (which needs the names), requires_python, and adj_deps
+    phases = {"names": _load_names, "py_time": _load_py_time, "deps": _load_deps}
+    if loader_threads > 1:
+        clients = [MongoClient(mongo_uri) for _ in phases]
+        try:
+            with ThreadPoolExecutor(max_workers=min(loader_threads, len(phases))) as ex:
+                futures = {
+                    ex.submit(fn, c[pypi_db], scan_batch_size, exhaust): key
+                    for (key, fn), c in zip(phases.items(), clients)
+                }
+                results = {futures[f]: f.result() for f in as_completed(futures)}
+        finally:
+            for c in clients:
+                c.close()
+    else:
+        results = {key: fn(db, scan_batch_size, exhaust) for key, fn in phases.items()}
+
+    name_blob, name_offsets, names_max_id, nn_ids, nn_vals = results["names"]
+    py_max_id, all_mask, pm_ids, pm_vals, t_ids, t_vals = results["py_time"]
+    dep_srcs, dep_lens, dep_vals = results["deps"]
+    del results
+    max_id = max(names_max_id, py_max_id)
+
+    node_name_id = np.full(max_id + 1, NO_NAME, dtype=np.int32)
+    node_py_mask = np.full(max_id + 1, all_mask, dtype=np.uint32)
+    node_time = np.full(max_id + 1, NO_TIME, dtype=np.int64)
+    np.put(node_name_id, nn_ids, nn_vals)
+    np.put(node_py_mask, pm_ids, pm_vals.astype(np.uint32))
+    np.put(node_time, t_ids, t_vals)
+    print(f"[load] Node arrays built (array size={len(node_py_mask):,})")
+
+    # src_ids past the node arrays cannot be resolved; drop them with their runs
+    keep = (dep_srcs >= 0) & (dep_srcs <= max_id)
+    if not keep.all():
+        dep_vals = dep_vals[np.repeat(keep, dep_lens)]
+        dep_srcs = dep_srcs[keep]
+        dep_lens = dep_lens[keep]
+    deps_start, deps = _deps_csr(max_id + 1, dep_srcs, dep_lens, dep_vals)
+    print(
+        f"[load] Laid out {len(dep_srcs):,} adj_deps entries "
+        f"({len(deps):,} deps) as CSR"
+    )
+    return {
+        "node_py_mask": node_py_mask,
+        "node_time": node_time,
+        "node_name_id": node_name_id,
+        "name_blob": name_blob,
+        "name_offsets": name_offsets,
+        "deps_start": deps_start,
+        "deps": deps,
+    }
+
+
+def _collection_fingerprint(coll) -> dict[str, Any]:
+    """
+    Cheap change check for one source collection: document count, largest _id
+    (one step down the _id index) and the uncompressed data size from $collStats.
+    Edits that leave all three unchanged go unnoticed; bump cache_version for those.
+    """
+    last = next(iter(coll.find({}, {"_id": 1}).sort("_id", -1).limit(1)), None)
+    try:
+        stats = next(coll.aggregate([{"$collStats": {"storageStats": {}}}]), {})
+        size = stats.get("storageStats", {}).get("size")
+    except OperationFailure:
+        size = None  # $collStats not permitted; count and max _id still apply
+    return {
+        "count": coll.estimated_document_count(),
+        "max_id": None if last is None else str(last["_id"]),
+        "size": size,
+    }
+
+
+def _context_cache_key(
+    db, mongo_uri: str, pypi_db: str, cache_version: str
+) -> dict[str, Any]:
+    """
+    What a context cache must match: the server hosts (from mongo_uri, without
+    credentials or options), the db name, cache_version and each source
+    collection's fingerprint.
+    """
+    hosts = mongo_uri.split("://", 1)[-1].split("/", 1)[0].rsplit("@", 1)[-1]
+    return {
+        "format": CONTEXT_CACHE_FORMAT,
+        "hosts": hosts,
+        "pypi_db": pypi_db,
+        "cache_version": cache_version,
+        "collections": {
+            name: _collection_fingerprint(db[name])
+            for name in CONTEXT_SOURCE_COLLECTIONS
+        },
+    }
+
+
+def _read_context_cache(cache_dir: str, key: dict[str, Any]) -> dict[str, Any] | None:
+    """
+    The cached arrays (memory-mapped) if cache_dir holds a complete cache for key,
+    else None. A cache with a missing, truncated or unreadable file, or with
+    array sizes that do not fit together, is reported and treated as absent.
+    """
+    try:
+        with open(os.path.join(cache_dir, "meta.json")) as f:
+            if json.load(f) != key:
+                print(
+                    f"[load] Context cache {cache_dir!r} is stale; "
+                    "reloading from MongoDB"
+                )
+                return None
+    except (OSError, ValueError):
+        return None
+    try:
+        # plain ndarray views, copy-on-write rather than read-only:
+        # the numba kernels take writable arrays
+        arrays: dict[str, Any] = {
+            name: np.asarray(
+                np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode="c")
+            )
+            for name in CONTEXT_CACHE_ARRAYS
+        }
+        with open(os.path.join(cache_dir, "name_blob.bin"), "rb") as f:
+            arrays["name_blob"] = f.read()
+    except (OSError, ValueError) as e:
+        print(f"[load] Context cache {cache_dir!r} is unreadable ({e}); reloading")
+        return None
+    n = len(arrays["node_time"])
+    offsets = arrays["name_offsets"]
+    deps_start = arrays["deps_start"]
+    if (
+        len(arrays["node_py_mask"]) != n
+        or len(arrays["node_name_id"]) != n
+        or len(deps_start) != n + 1
+        or int(deps_start[-1]) != len(arrays["deps"])
+        or not len(offsets)
+        or int(offsets[-1]) != len(arrays["name_blob"])
+    ):
+        print(f"[load] Context cache {cache_dir!r} is inconsistent; reloading")
+        return None
+    print(f"[load] Mapped context arrays from {cache_dir!r} ({n:,} nodes)")
+    return arrays
+
+
+def _write_context_cache(
+    cache_dir: str, key: dict[str, Any], arrays: dict[str, Any]
+) -> None:
+    """Save arrays to cache_dir; meta.json goes last, so a partial cache is not read."""
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_path = os.path.join(cache_dir, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    for name in CONTEXT_CACHE_ARRAYS:
+        np.save(os.path.join(cache_dir, f"{name}.npy"), arrays[name])
+    with open(os.path.join(cache_dir, "name_blob.bin"), "wb") as f:
+        f.write(arrays["name_blob"])
+    with open(meta_path, "w") as f:
+        json.dump(key, f, indent=1)
+    print(f"[load] Saved context arrays to {cache_dir!r}")
+
+
+def load_context(
+    mongo_uri: str = "mongodb://localhost:27017",
+    pypi_db: str = "pypi_dump",
+    chunk_cache_cap: int = 200_000,
+    header_cache_cap: int = 500_000,
+    cache_policy: str = "clock",
+    ensure_indexes: bool = True,
+    scan_batch_size: int = 0,
+    exhaust: bool = False,
+    loader_threads: int = 3,
+    cache_dir: str | None = None,
+    cache_version: str = "",
+) -> ResolutionContext:
+    """
+    Load in-memory collections from MongoDB and create resolution context.
+    Requires pymongo. Chunks and headers are loaded on demand and cached;
+    cache_policy picks the cache class ("clock" or "lru", see CACHE_POLICIES).
+    With ensure_indexes, the chunk and header collections' compound indexes are
+    created if missing; the on-demand lookups hint them, so without it they must exist.
+    scan_batch_size and exhaust tune the full-collection loader scans (see _scan_raw).
+    With loader_threads > 1 the scans run in a thread pool, one MongoClient each.
+    With cache_dir, the loaded arrays are saved there as .npy files and memory-mapped
+    by later calls instead of scanned, as long as the hosts, db, cache_version and
+    the source collections' fingerprints (see _collection_fingerprint) are unchanged.
+    Change cache_version (or delete the directory) to force a reload.
+    """
+    if not _HAS_PYMONGO:
+        raise RuntimeError("pymongo is required for load_context()")
+    if cache_policy not in CACHE_POLICIES:
+        raise ValueError(
+            f"unknown cache_policy {cache_policy!r} "
+            f"(expected one of {sorted(CACHE_POLICIES)})"
+        )
+    client = MongoClient(mongo_uri)
+    db = client[pypi_db]
+
+    adj_headers_coll = db["global_graph_adj_headers"]
+    chunks_coll = db["global_graph_adj_chunks"]
+    if ensure_indexes:
+        # no-ops when the indexes already exist
+        chunks_coll.create_index(CHUNK_INDEX_KEYS, name=CHUNK_INDEX_NAME)
+        adj_headers_coll.create_index(HEADER_INDEX_KEYS, name=HEADER_INDEX_NAME)
+
+    # 1-4) Node arrays, names and CSR deps: from cache_dir when it matches the
+    #      collections, else from the collection scans (saved to cache_dir after)
+    arrays = None
+    if cache_dir:
+        cache_key = _context_cache_key(db, mongo_uri, pypi_db, cache_version)
+        arrays = _read_context_cache(cache_dir, cache_key)
+    if arrays is None:
+        arrays = _load_arrays(
+            mongo_uri, pypi_db, db, scan_batch_size, exhaust, loader_threads
+        )
+        if cache_dir:
+            _write_context_cache(cache_dir, cache_key, arrays)
 
     # 5) adj_headers: NOT loaded into memory, will be queried on-demand with LRU cache
-    print(f"[load] Skipping global_graph_adj_headers (will query on-demand with LRU cache cap={header_cache_cap:,})")
+    print(
+        "[load] Skipping global_graph_adj_headers "
+        f"(will query on-demand with cache cap={header_cache_cap:,})"
+    )
 
-    chunk_lru = LRUCache(chunk_cache_cap)
-    header_lru = LRUCache(header_cache_cap)
-    print(f"[load] Initialized LRU caches: chunk_cap={chunk_cache_cap:,}, header_cap={header_cache_cap:,}")
+    cache_cls = CACHE_POLICIES[cache_policy]
+    chunk_lru = cache_cls(chunk_cache_cap)
+    header_lru = cache_cls(header_cache_cap)
+    print(
+        f"[load] Initialized {cache_policy} caches: chunk_cap={chunk_cache_cap:,}, "
+        f"header_cap={header_cache_cap:,}"
+    )
     print("[load] Context loading complete")
-    
+
     return ResolutionContext(
-        node_py_mask=node_py_mask,
-        node_time=node_time,
-        node_name_id=node_name_id,
-        name_id_to_name=name_id_to_name,
-        adj_deps=adj_deps,
+        **arrays,
         chunk_lru=chunk_lru,
         header_lru=header_lru,
         chunks_coll=chunks_coll,
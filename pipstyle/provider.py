@@ -5,15 +5,51 @@ All candidate discovery, root pinning, time and Python filtering happen here.
 
 from __future__ import annotations
 
-from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Set
+from collections.abc import Iterator, Mapping, Sequence
+from typing import Any
+
+import numpy as np
 
 from pipstyle.chunks import edge_exists_upto_t, iter_candidates_newest_first
-from pipstyle.loader import ResolutionContext
-from pipstyle.structures import Candidate, Requirement
+from pipstyle.loader import NO_NAME, NO_TIME, LRUCache, ResolutionContext
 
 # Import from our copied resolvelib (same package layout)
 from pipstyle.resolvelib.providers import AbstractProvider
 from pipstyle.resolvelib.structs import RequirementInformation
+from pipstyle.structures import Candidate, Requirement
+
+# Optional: compiles the py_mask reduction below
+try:
+    from numba import njit
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+
+ALL_PY_MASK = (1 << 26) - 1
+
+# find_matches filters and sorts candidate sets smaller than this in plain Python,
+# where NumPy's per-call setup would cost more than it saves
+SMALL_MATCH_SET = 8
+
+# Parent candidates whose dependency Requirements are kept for reuse (LRU, per provider)
+REQ_CACHE_SIZE = 1 << 16
+
+
+if _HAS_NUMBA:
+    @njit("uint32(int64[::1], uint32[::1], uint32)", nogil=True, cache=True)
+    def _and_reduce(ids, node_py_mask, mask):
+        """mask ANDed with node_py_mask[ids], stopping early once it reaches 0."""
+        for i in range(ids.shape[0]):
+            mask &= node_py_mask[ids[i]]
+            if mask == 0:
+                break
+        return mask
+else:
+    def _and_reduce(ids, node_py_mask, mask):
+        """mask ANDed with node_py_mask[ids], as one vectorized reduce."""
+        if not len(ids):
+            return mask
+        return mask & np.bitwise_and.reduce(node_py_mask[ids])
 
 
 class DBProvider(AbstractProvider[Requirement, Candidate, int]):
@@ -32,11 +68,27 @@ class DBProvider(AbstractProvider[Requirement, Candidate, int]):
         t: int,
     ):
         self._ctx = ctx
+        # bound once: get_dependencies runs for every candidate the resolver pins
+        self._get_deps = ctx.get_dep_name_ids
+        self._Requirement = Requirement
+        # node_id -> that candidate's Requirements. Depends only on the dep arrays,
+        # so it outlives reset() and is shared by every resolution this provider serves.
+        self._req_cache = LRUCache(REQ_CACHE_SIZE)
+        self.reset(start_node_id, root_node_id, root_name_id, t)
+
+    def reset(
+        self, start_node_id: int, root_node_id: int, root_name_id: int, t: int
+    ) -> None:
+        """Re-target this provider at another resolution so one instance serves many."""
         self._start_node_id = start_node_id
         self._root_node_id = root_node_id
         self._root_name_id = root_name_id
         self._t = t
-        self._state_mapping: Optional[Dict[int, Candidate]] = None  # set via set_state
+        self._state_mapping: dict[int, Candidate] | None = None  # set via set_state
+        # _allowed_py_mask memo: (mapping object, its len, its last pin, mask)
+        self._py_memo: tuple[dict[int, Candidate], int, tuple[int, int], int] | None = (
+            None
+        )
 
     def set_state(self, state: Any) -> None:
         """Optional hook: store current resolution state for Python mask filtering."""
@@ -49,17 +101,45 @@ class DBProvider(AbstractProvider[Requirement, Candidate, int]):
 
     def _allowed_py_mask(self) -> int:
         """Intersection of py_mask over currently pinned candidates. 0 means no constraint."""
-        if not self._state_mapping:
-            return (1 << 26) - 1  # all bits
-        mask = (1 << 26) - 1
-        node_py_mask = self._ctx.node_py_mask
-        for cand in self._state_mapping.values():
-            if cand.node_id < len(node_py_mask):
-                mask &= node_py_mask[cand.node_id]
-            if mask == 0:
-                break
+        mapping = self._state_mapping
+        if not mapping:
+            return ALL_PY_MASK
+        n = len(mapping)
+        name_id, cand = next(reversed(mapping.items()))
+        last = (name_id, cand.node_id)
+        memo = self._py_memo
+        if memo is not None and memo[0] is mapping:
+            # A live mapping only changes by pinning: pop(name) then re-insert at
+            # the end. Same length and last (name, node): unchanged. One longer: a
+            # new name was appended and the earlier pins are as they were.
+            if memo[1] == n and memo[2] == last:
+                return memo[3]
+            if memo[1] + 1 == n:
+                mask = memo[3] & int(self._ctx.node_py_mask[cand.node_id])
+                self._py_memo = (mapping, n, last, mask)
+                return mask
+        ids = np.fromiter(
+            (cand.node_id for cand in mapping.values()), dtype=np.int64, count=n
+        )
+        mask = int(_and_reduce(ids, self._ctx.node_py_mask, np.uint32(ALL_PY_MASK)))
+        self._py_memo = (mapping, n, last, mask)
         return mask
 
+    def _by_candidate_count(
+        self, parent_node_ids: list[int], name_id: int
+    ) -> list[int]:
+        """
+        parent_node_ids ordered by their header's dst_id count for name_id, smallest
+        first; empty if any parent has no header (the intersection is then empty).
+        """
+        sizes: dict[int, int] = {}
+        for pid in parent_node_ids:
+            h = self._ctx.get_header(pid, name_id)
+            if h is None:
+                return []
+            sizes[pid] = int(h.chunk_n.sum())
+        return sorted(sizes, key=sizes.__getitem__)
+
     def find_matches(
         self,
         identifier: int,
@@ -72,73 +152,93 @@ class DBProvider(AbstractProvider[Requirement, Candidate, int]):
             return iter([])
 
         reqs = list(req_iter)
-        incompat_set: Set[int] = set()
+        incompat_set: set[int] = set()
         inc_iter = incompatibilities.get(name_id)
         if inc_iter is not None:
             for c in inc_iter:
                 incompat_set.add(c.node_id)
 
+        # Also passed to candidate enumeration, which skips chunks with no matching
+        # Python bit
+        allowed_py = self._allowed_py_mask()
+
         # Root requirement (parent is None) -> only start_node_id is allowed
         has_root_requirement = any(r.parent is None for r in reqs)
+        allowed: list[int]
         if has_root_requirement:
-            allowed = {self._start_node_id}
+            allowed = [self._start_node_id]
         elif name_id == self._root_name_id:
             # Root pinning: only root_node_id
-            if self._root_node_id < len(self._ctx.node_time):
-                tm = self._ctx.node_time[self._root_node_id]
-                if tm is not None and tm <= self._t:
-                    allowed = {self._root_node_id}
-                else:
-                    allowed = set()
+            tm = self._ctx.node_time[self._root_node_id]
+            if tm != NO_TIME and tm <= self._t:
+                allowed = [self._root_node_id]
             else:
-                allowed = set()
+                allowed = []
         else:
-            # Collect parent node_ids and intersect candidate sets
-            parent_node_ids: List[int] = []
+            # Intersect the parents' candidates: enumerate only the smallest parent's,
+            # newest first, and keep those every other parent has an edge to
+            parent_node_ids: list[int] = []
             for r in reqs:
                 if r.parent is not None:
                     parent_node_ids.append(r.parent.node_id)
-            if not parent_node_ids:
-                allowed = set()
-            else:
-                allowed = None
-                for src_id in parent_node_ids:
-                    cands = set(
+            allowed = []
+            if parent_node_ids:
+                if len(parent_node_ids) > 1:
+                    # one round-trip for every parent's header instead of one each
+                    self._ctx.get_headers_batch(
+                        [(pid, name_id) for pid in parent_node_ids]
+                    )
+                    parent_node_ids = self._by_candidate_count(parent_node_ids, name_id)
+                if parent_node_ids:
+                    # dict.fromkeys: drop repeats, keep order
+                    allowed = list(dict.fromkeys(
                         iter_candidates_newest_first(
                             self._ctx,
-                            src_id,
+                            parent_node_ids[0],
                             name_id,
                             self._t,
                             self._root_name_id,
                             self._root_node_id,
+                            allowed_py,
                         )
-                    )
-                    if allowed is None:
-                        allowed = cands
-                    else:
-                        allowed &= cands
-                if allowed is None:
-                    allowed = set()
-
-        allowed -= incompat_set
-        allowed_py = self._allowed_py_mask()
+                    ))
+                for src_id in parent_node_ids[1:]:
+                    if not allowed:
+                        break
+                    allowed = [
+                        nid for nid in allowed
+                        if edge_exists_upto_t(self._ctx, src_id, name_id, nid, self._t)
+                    ]
+
+        if incompat_set:
+            allowed = [nid for nid in allowed if nid not in incompat_set]
         node_py_mask = self._ctx.node_py_mask
         node_time = self._ctx.node_time
         node_name_id = self._ctx.node_name_id
 
-        # Filter by Python mask and build list; sort by time descending (newest first)
-        valid: List[int] = []
-        for nid in allowed:
-            if nid >= len(node_time) or node_time[nid] is None or node_time[nid] > self._t:
-                continue
-            if nid < len(node_py_mask) and (node_py_mask[nid] & allowed_py) == 0:
-                continue
-            valid.append(nid)
-
-        valid.sort(key=lambda n: node_time[n] if n < len(node_time) and node_time[n] is not None else 0, reverse=True)
+        # Filter by Python mask and time; newest first (stable, so equal times keep
+        # enumeration order)
+        t = self._t
+        if len(allowed) < SMALL_MATCH_SET:
+            valid: list[int] = [
+                nid for nid in allowed
+                if NO_TIME != node_time[nid] <= t and node_py_mask[nid] & allowed_py
+            ]
+            valid.sort(key=lambda n: node_time[n], reverse=True)
+        else:
+            ids = np.fromiter(allowed, dtype=np.int64, count=len(allowed))
+            tms = node_time[ids]
+            ok = (
+                (tms != NO_TIME)
+                & (tms <= t)
+                & ((node_py_mask[ids] & np.uint32(allowed_py)) != 0)
+            )
+            valid = ids[ok][np.argsort(-tms[ok], kind="stable")].tolist()
         for nid in valid:
-            name_id_val = node_name_id[nid] if nid < len(node_name_id) else name_id
-            yield Candidate(node_id=nid, name_id=name_id_val)
+            name_id_val = int(node_name_id[nid])
+            yield Candidate(
+                node_id=nid, name_id=name_id_val if name_id_val != NO_NAME else name_id
+            )
 
     def is_satisfied_by(self, requirement: Requirement, candidate: Candidate) -> bool:
         if candidate.name_id != requirement.name_id:
@@ -150,9 +250,18 @@ class DBProvider(AbstractProvider[Requirement, Candidate, int]):
             return candidate.node_id == self._root_node_id
         return edge_exists_upto_t(self._ctx, src_id, requirement.name_id, candidate.node_id, self._t)
 
-    def get_dependencies(self, candidate: Candidate) -> List[Requirement]:
-        dep_name_ids = self._ctx.get_dep_name_ids(candidate.node_id)
-        return [Requirement(name_id=dep_name_id, parent=candidate) for dep_name_id in dep_name_ids]
+    def get_dependencies(self, candidate: Candidate) -> list[Requirement]:
+        # Requirement equality is (name_id, parent.node_id), so a candidate re-pinned
+        # while backtracking gets back the same objects (callers only iterate the list)
+        reqs = self._req_cache.get(candidate.node_id)
+        if reqs is None:
+            req = self._Requirement
+            reqs = [
+                req(name_id=dep_name_id, parent=candidate)
+                for dep_name_id in self._get_deps(candidate.node_id).tolist()
+            ]
+            self._req_cache.put(candidate.node_id, reqs)
+        return reqs
 
     def get_preference(
         self,
@@ -14,8 +14,12 @@ from __future__ import annotations
 import argparse
 import csv
 import json
+import multiprocessing as mp
 import os
-from typing import Any, Optional, Set, Tuple
+from collections.abc import Iterator
+from typing import Any
+
+import numpy as np
 
 try:
     from pymongo import MongoClient
@@ -23,6 +27,13 @@ try:
 except ImportError:
     _HAS_PYMONGO = False
 
+# Optional: faster tree dumps for --debug
+try:
+    import orjson
+    _HAS_ORJSON = True
+except ImportError:
+    _HAS_ORJSON = False
+
 try:
     from tqdm import tqdm
 except ImportError:
@@ -31,10 +42,14 @@ except ImportError:
 
 from packaging.utils import canonicalize_name
 
-from pipstyle import load_context, ResolutionRunner
-from pipstyle.loader import ResolutionContext
+from pipstyle import ResolutionRunner, load_context
+from pipstyle.bingraph import load_binary_context
+from pipstyle.loader import NO_TIME, ResolutionContext, iter_raw_batches
 from pipstyle.resolvelib.resolvers.exceptions import ResolverException
 
+# Output rows are handed to csv.writer this many at a time
+CSV_FLUSH_ROWS = 10_000
+
 
 def parse_args() -> argparse.Namespace:
     ap = argparse.ArgumentParser(
@@ -53,12 +68,105 @@ def parse_args() -> argparse.Namespace:
     )
     ap.add_argument("--mask-field", default="roots_bits", help="Field used for bit filter on edges")
     ap.add_argument("--meta-coll", default=None, help="Meta collection name (default: <subgraph>__meta)")
-    ap.add_argument("--subgraph-batch-size", type=int, default=100_000, help="Batch size when streaming subgraph edges")
+    ap.add_argument(
+        "--subgraph-batch-size",
+        type=int,
+        default=100_000,
+        help="Batch size when streaming subgraph nodes",
+    )
 
     ap.add_argument("--output-dir", default="output", help="Output directory for CSV and optional tree subdir")
     ap.add_argument("--chunk-cache-cap", type=int, default=200_000, help="LRU cap for chunk cache")
     ap.add_argument("--header-cache-cap", type=int, default=500_000, help="LRU cap for header cache")
+    ap.add_argument(
+        "--cache-policy",
+        choices=("clock", "lru"),
+        default="clock",
+        help="Eviction policy for the chunk/header caches",
+    )
+    ap.add_argument(
+        "--prefetch-batch-size",
+        type=int,
+        default=0,
+        help=(
+            "src_ids per bulk chunk warm-up query before resolving; "
+            "0 = no warm-up (load on demand)"
+        ),
+    )
+    ap.add_argument(
+        "--binary-graph",
+        default=None,
+        help=(
+            "Graph directory written by pipstyle.build_bin; resolve from it "
+            "instead of the pypi_db collections"
+        ),
+    )
+    ap.add_argument(
+        "--no-ensure-indexes",
+        action="store_true",
+        help=(
+            "Do not create the chunk and header collection indexes "
+            "(they must already exist)"
+        ),
+    )
+    ap.add_argument(
+        "--scan-batch-size",
+        type=int,
+        default=0,
+        help=(
+            "Docs per batch for the full-collection loader scans; "
+            "0 = server-sized (16 MiB) batches"
+        ),
+    )
+    ap.add_argument(
+        "--context-cache-dir",
+        default=None,
+        help=(
+            "Save the loaded node/name/deps arrays here and memory-map them on later "
+            "runs (MongoDB loading only)"
+        ),
+    )
+    ap.add_argument(
+        "--context-cache-version",
+        default="",
+        help=(
+            "Tag stored with the context cache; change it to force a reload after "
+            "edits the cache cannot detect"
+        ),
+    )
+    ap.add_argument(
+        "--loader-threads",
+        type=int,
+        default=3,
+        help=(
+            "Threads running the load_context collection scans concurrently; "
+            "1 = one after another"
+        ),
+    )
+    ap.add_argument(
+        "--exhaust-cursors",
+        action="store_true",
+        help=(
+            "Stream the loader scans with exhaust cursors (fewer round-trips; not "
+            "supported through mongos)"
+        ),
+    )
     ap.add_argument("--debug", action="store_true", help="Store resolved dependency trees per node")
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=(
+            "Processes resolving nodes in parallel (fork; each opens its own "
+            "MongoClient). 1 = in-process."
+        ),
+    )
+    ap.add_argument(
+        "--worker-chunksize",
+        type=int,
+        default=200,
+        help="Nodes handed to a worker per task",
+    )
 
     return ap.parse_args()
 
@@ -66,8 +174,8 @@ def parse_args() -> argparse.Namespace:
 def load_root_from_meta(
     meta_coll: Any,
     subgraph_name: str,
-    root_bit_index: Optional[int],
-) -> Tuple[str, str, int, int, int]:
+    root_bit_index: int | None,
+) -> tuple[str, str, int, int, int]:
     """
     Returns: (root_pkg, root_ver, bit_index, root_id, nbits)
     """
@@ -103,26 +211,139 @@ def collect_subgraph_nodes_for_bit(
     bit_index: int,
     mask_field: str,
     batch_size: int,
-) -> Set[int]:
-    """Collect unique node_ids in the subgraph for the given root bit by streaming edges."""
-    q = {mask_field: {"$bitsAllSet": [bit_index]}}
-    proj = {"src_id": 1, "dst_id": 1}
-    nodes: Set[int] = set()
-    cur = subgraph_coll.find(q, proj, no_cursor_timeout=True).batch_size(batch_size)
+) -> np.ndarray:
+    """
+    Sorted unique node_ids (int64) in the subgraph for the given root bit. The
+    edges are matched, unwound to their endpoints and grouped server-side, so
+    each node_id crosses the wire once; batches are decoded whole as raw BSON.
+    """
+    pipeline = [
+        {"$match": {mask_field: {"$bitsAllSet": [bit_index]}}},
+        {"$project": {"_id": 0, "ids": ["$src_id", "$dst_id"]}},
+        {"$unwind": "$ids"},
+        {"$match": {"ids": {"$ne": None}}},
+        {"$group": {"_id": "$ids"}},
+    ]
+    cur = subgraph_coll.aggregate_raw_batches(
+        pipeline, allowDiskUse=True, batchSize=batch_size
+    )
+    docs = tqdm(iter_raw_batches(cur), desc=f"Stream subgraph nodes (bit={bit_index})")
+    nodes = np.fromiter((d["_id"] for d in docs), dtype=np.int64)
+    nodes.sort()
+    return nodes
+
+
+def write_tree(path: str, tree: dict[str, Any]) -> None:
+    """
+    Write a dependency tree as UTF-8 JSON indented by 2, in one bytes write with
+    orjson when available; the json fallback writes the same bytes.
+    """
+    if _HAS_ORJSON:
+        # OPT_NON_STR_KEYS: the mapping is keyed by int name_id; json stringifies
+        # those too
+        opts = orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2
+        data = orjson.dumps(tree, option=opts)
+        with open(path, "wb") as tf:
+            tf.write(data)
+    else:
+        with open(path, "w", encoding="utf-8") as tf:
+            json.dump(tree, tf, indent=2, ensure_ascii=False)
+
+
+def resolve_row(
+    runner: ResolutionRunner,
+    node_time: Any,
+    node_id: int,
+    root_id: int,
+    root_name_id: int,
+    root_time: int,
+    debug: bool,
+) -> tuple[int, bool, int, dict[str, Any] | None]:
+    """
+    Resolve node_id at max(node_time, root_time); returns (node_id, resolved,
+    depth, tree).
+    """
+    nt = node_time[node_id] if node_id < len(node_time) else NO_TIME
+    if nt == NO_TIME:
+        return node_id, False, -1, None
+
+    t_cutoff = max(int(nt), root_time)
     try:
-        for e in tqdm(cur, desc=f"Stream subgraph edges (bit={bit_index})"):
-            s = e.get("src_id")
-            d = e.get("dst_id")
-            if s is not None:
-                nodes.add(int(s))
-            if d is not None:
-                nodes.add(int(d))
+        resolved, depth, tree = runner.resolve(
+            node_id=node_id,
+            root_node_id=root_id,
+            root_name_id=root_name_id,
+            time=t_cutoff,
+            debug=debug,
+        )
+    except ResolverException:
+        # Handle resolver exceptions (InconsistentCandidate, ResolutionImpossible, etc.)
+        # These occur when there are self-dependencies, circular dependencies, or other
+        # inconsistencies
+        # Treat as not resolved
+        return node_id, False, -1, None
+    return node_id, resolved, depth, tree
+
+
+# Per-process state for --workers > 1, set up by _worker_init in each forked worker.
+_WORKER: dict[str, Any] = {}
+
+
+def _worker_init(
+    ctx: ResolutionContext,
+    mongo_uri: str,
+    pypi_db: str,
+    row_args: tuple[int, int, int, bool],
+) -> None:
+    """
+    Runs once per forked worker. The node and dependency arrays are inherited
+    copy-on-write; only the Mongo connection must be the worker's own (a
+    binary graph's maps are simply shared).
+    """
+    if ctx.graph is None:
+        db = MongoClient(mongo_uri)[pypi_db]
+        ctx.chunks_coll = db[ctx.chunks_coll.name]
+        ctx.adj_headers_coll = db[ctx.adj_headers_coll.name]
+    _WORKER["runner"] = ResolutionRunner(ctx)
+    _WORKER["node_time"] = ctx.node_time
+    _WORKER["row_args"] = row_args
+
+
+def _worker_row(node_id: int) -> tuple[int, bool, int, dict[str, Any] | None]:
+    w = _WORKER
+    return resolve_row(w["runner"], w["node_time"], node_id, *w["row_args"])
+
+
+def resolve_rows(
+    ctx: ResolutionContext,
+    node_list: list[int],
+    row_args: tuple[int, int, int, bool],
+    workers: int = 1,
+    chunksize: int = 200,
+    mongo_uri: str = "",
+    pypi_db: str = "",
+) -> Iterator[tuple[int, bool, int, dict[str, Any] | None]]:
+    """
+    resolve_row for every node of node_list, in node_list order. With workers > 1
+    the nodes are resolved on a forked pool (see _worker_init), which is shut down
+    when the generator finishes or is closed.
+    """
+    if workers <= 1:
+        runner = ResolutionRunner(ctx)
+        for node_id in node_list:
+            yield resolve_row(runner, ctx.node_time, node_id, *row_args)
+        return
+    # fork after load_context so workers share the loaded context copy-on-write
+    pool = mp.get_context("fork").Pool(
+        workers,
+        initializer=_worker_init,
+        initargs=(ctx, mongo_uri, pypi_db, row_args),
+    )
+    try:
+        yield from pool.imap(_worker_row, node_list, chunksize=chunksize)
     finally:
-        try:
-            cur.close()
-        except Exception:
-            pass
-    return nodes
+        pool.terminate()
+        pool.join()
 
 
 def run() -> None:
@@ -131,7 +352,7 @@ def run() -> None:
         raise RuntimeError("pymongo is required. Install with: pip install pymongo")
 
     client = MongoClient(args.mongo_uri)
-    pypi_db = client[args.pypi_db]
+    client[args.pypi_db]
     sub_db = client[args.subgraphs_db]
 
     subgraph_name = args.subgraph
@@ -145,20 +366,33 @@ def run() -> None:
     root_pkg_canon = canonicalize_name(root_pkg)
     print(f"[root] pkg={root_pkg} ver={root_ver} bit_index={bit_index} root_id={root_id} nbits={nbits}")
 
-    print("[load] Loading resolution context from MongoDB ...")
-    ctx = load_context(
-        mongo_uri=args.mongo_uri,
-        pypi_db=args.pypi_db,
-        chunk_cache_cap=args.chunk_cache_cap,
-        header_cache_cap=args.header_cache_cap,
-    )
-    name_to_id = {v: k for k, v in ctx.name_id_to_name.items()}
-    root_name_id = name_to_id.get(root_pkg_canon)
+    if args.binary_graph:
+        ctx = load_binary_context(
+            args.binary_graph,
+            header_cache_cap=args.header_cache_cap,
+            cache_policy=args.cache_policy,
+        )
+    else:
+        print("[load] Loading resolution context from MongoDB ...")
+        ctx = load_context(
+            mongo_uri=args.mongo_uri,
+            pypi_db=args.pypi_db,
+            chunk_cache_cap=args.chunk_cache_cap,
+            header_cache_cap=args.header_cache_cap,
+            cache_policy=args.cache_policy,
+            ensure_indexes=not args.no_ensure_indexes,
+            scan_batch_size=args.scan_batch_size,
+            exhaust=args.exhaust_cursors,
+            loader_threads=args.loader_threads,
+            cache_dir=args.context_cache_dir,
+            cache_version=args.context_cache_version,
+        )
+    root_name_id = ctx.name_id_of(root_pkg_canon)
     if root_name_id is None:
         raise RuntimeError(f"Root package {root_pkg_canon!r} not found in name_ids.")
     print(f"[root] root_name_id={root_name_id}")
 
-    if root_id >= len(ctx.node_time) or ctx.node_time[root_id] is None:
+    if root_id >= len(ctx.node_time) or ctx.node_time[root_id] == NO_TIME:
         raise RuntimeError("Root node has no timestamp; cannot proceed.")
     root_time = int(ctx.node_time[root_id])
 
@@ -166,68 +400,70 @@ def run() -> None:
     nodes = collect_subgraph_nodes_for_bit(
         subgraph_coll, bit_index, args.mask_field, args.subgraph_batch_size
     )
-    node_list = sorted(nodes)
+    node_list = nodes.tolist()
     print(f"[subgraph] {len(node_list):,} nodes for bit {bit_index}")
 
+    if args.prefetch_batch_size > 0:
+        print("[prefetch] Warming chunk cache for subgraph nodes ...")
+        n_chunks = ctx.prefetch_chunks(node_list, batch_size=args.prefetch_batch_size)
+        print(f"[prefetch] chunks={n_chunks:,}")
+
     os.makedirs(args.output_dir, exist_ok=True)
     csv_name = f"{subgraph_name}_{bit_index}.csv"
     csv_path = os.path.join(args.output_dir, csv_name)
 
-    trees_dir: Optional[str] = None
+    trees_dir: str | None = None
     if args.debug:
         trees_dir = os.path.join(args.output_dir, f"{subgraph_name}_{bit_index}_resolved_trees")
         os.makedirs(trees_dir, exist_ok=True)
         print(f"[debug] Resolved trees will be written to {trees_dir!r}")
 
-    runner = ResolutionRunner(ctx)
+    row_args = (root_id, root_name_id, root_time, args.debug)
+    rows = resolve_rows(
+        ctx,
+        node_list,
+        row_args,
+        workers=args.workers,
+        chunksize=args.worker_chunksize,
+        mongo_uri=args.mongo_uri,
+        pypi_db=args.pypi_db,
+    )
+    if args.workers > 1:
+        print(f"[pool] workers={args.workers} chunksize={args.worker_chunksize}")
 
     num_resolved = 0
     num_resolved_reached = 0   # resolved and depth >= 0 (root in dep tree)
     num_resolved_not_reached = 0  # resolved and depth == -1
     num_not_resolved = 0
 
-    with open(csv_path, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["node_id", "resolved", "depth"])
-
-        for node_id in tqdm(node_list, desc="Resolve"):
-            nt = ctx.node_time[node_id] if node_id < len(ctx.node_time) else None
-            if nt is None:
-                writer.writerow([node_id, False, ""])
-                num_not_resolved += 1
-                continue
-
-            t_cutoff = max(int(nt), root_time)
-            try:
-                resolved, depth, tree = runner.resolve(
-                    node_id=node_id,
-                    root_node_id=root_id,
-                    root_name_id=root_name_id,
-                    time=t_cutoff,
-                    debug=args.debug,
-                )
-            except ResolverException:
-                # Handle resolver exceptions (InconsistentCandidate, ResolutionImpossible, etc.)
-                # These occur when there are self-dependencies, circular dependencies, or other inconsistencies
-                # Treat as not resolved
-                resolved = False
-                depth = -1
-                tree = None
-
-            writer.writerow([node_id, resolved, depth if depth >= 0 else ""])
-
-            if resolved:
-                num_resolved += 1
-                if depth >= 0:
-                    num_resolved_reached += 1
+    try:
+        with open(csv_path, "w", newline="", buffering=1 << 20) as f:
+            writer = csv.writer(f)
+            writer.writerow(["node_id", "resolved", "depth"])
+            pending: list[tuple[int, bool, Any]] = []
+
+            for node_id, resolved, depth, tree in tqdm(
+                rows, total=len(node_list), desc="Resolve"
+            ):
+                pending.append((node_id, resolved, depth if depth >= 0 else ""))
+                if len(pending) >= CSV_FLUSH_ROWS:
+                    writer.writerows(pending)
+                    pending.clear()
+
+                if resolved:
+                    num_resolved += 1
+                    if depth >= 0:
+                        num_resolved_reached += 1
+                    else:
+                        num_resolved_not_reached += 1
+                    if args.debug and tree is not None:
+                        write_tree(os.path.join(trees_dir, f"{node_id}.json"), tree)
                 else:
-                    num_resolved_not_reached += 1
-                if args.debug and tree is not None:
-                    tree_path = os.path.join(trees_dir, f"{node_id}.json")
-                    with open(tree_path, "w") as tf:
-                        json.dump(tree, tf, indent=0)
-            else:
-                num_not_resolved += 1
+                    num_not_resolved += 1
+
+            writer.writerows(pending)
+    finally:
+        rows.close()
 
     print(f"[output] Wrote {csv_path}")
 
@@ -237,6 +473,16 @@ def run() -> None:
     print(f"  Resolved + reached in dep tree (depth >= 0): {num_resolved_reached:,}")
     print(f"  Resolved + not reached in dep tree (depth -1): {num_resolved_not_reached:,}")
     print(f"  Not resolved:              {num_not_resolved:,}")
+    for label, cache in (("chunk", ctx.chunk_lru), ("header", ctx.header_lru)):
+        # with --workers the caches filled are the workers', not these
+        if cache is not None and args.workers <= 1:
+            st = cache.stats()
+            lookups = st["hits"] + st["misses"]
+            rate = st["hits"] / lookups if lookups else 0.0
+            print(
+                f"  {label} cache ({args.cache_policy}): "
+                f"size={st['size']:,}/{st['cap']:,} hit_rate={rate:.3f}"
+            )
 
 
 if __name__ == "__main__":
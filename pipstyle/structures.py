@@ -6,7 +6,6 @@ Identifier (KT) = name_id (int). Resolvelib supplies State, Criterion, Result.
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Optional
 
 # Requirement: name_id + parent (Candidate or None for root requirement)
 # Candidate: node_id + name_id (and optional py_mask for provider use)
@@ -16,11 +15,19 @@ from typing import Optional
 class Candidate:
     """A specific (package, version) identified by node_id."""
 
+    # declared by hand: dataclass(slots=True) needs Python 3.10.
+    # _hash is not a field: candidates key the resolver's dicts and sets, so it is
+    # computed once
+    __slots__ = ("node_id", "name_id", "_hash")
+
     node_id: int
     name_id: int
 
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "_hash", hash(self.node_id))
+
     def __hash__(self) -> int:
-        return hash(self.node_id)
+        return self._hash
 
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, Candidate):
@@ -32,11 +39,21 @@ class Candidate:
 class Requirement:
     """A dependency on a package name (name_id), requested by parent (Candidate or None)."""
 
+    # _hash is not a field: computed once in __post_init__ since requirements are
+    # hashed repeatedly
+    __slots__ = ("name_id", "parent", "_hash")
+
     name_id: int
-    parent: Optional[Candidate]  # None = root requirement (the package we are resolving for)
+    parent: (
+        Candidate | None
+    )  # None = root requirement (the package we are resolving for)
+
+    def __post_init__(self) -> None:
+        parent_id = self.parent.node_id if self.parent is not None else None
+        object.__setattr__(self, "_hash", hash((self.name_id, parent_id)))
 
     def __hash__(self) -> int:
-        return hash((self.name_id, self.parent.node_id if self.parent is not None else None))
+        return self._hash
 
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, Requirement):
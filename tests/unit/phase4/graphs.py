@@ -0,0 +1,247 @@
+"""Fixture graphs for external/phase4_exposure_nodes_1.py and a brute-force oracle.
+
+A fixture graph is drawn from a seed, so a failing case can be rebuilt by seed.
+Headers are served to the script's real AdjStore through InMemoryHeaders, so
+header parsing, chunk merging and the candidate kernels are all exercised.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import itertools
+import random
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+import numpy as np
+import pytest
+
+PHASE4_PATH = (
+    Path(__file__).resolve().parents[3] / "external" / "phase4_exposure_nodes_1.py"
+)
+ALL_PY = 0b111
+
+
+def load_phase4() -> ModuleType:
+    """Import the phase4 script (skipping the test if its dependencies are missing)."""
+    for dep in ("bson", "pymongo", "packaging", "tqdm"):
+        pytest.importorskip(dep)
+    name = "phase4_exposure_nodes_1"
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, PHASE4_PATH)
+        assert spec is not None
+        assert spec.loader is not None
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[name]
+
+
+@dataclass
+class Graph:
+    node_name: np.ndarray  # int32, name_id per node_id
+    node_time: np.ndarray  # int64, -1 (NO_TIME) if unknown
+    node_py: np.ndarray  # uint64 Python masks
+    deps: dict[int, list[int]]  # src node_id -> dep name_ids
+    edges: dict[tuple[int, int], list[int]]  # (src, dep name_id) -> dst node_ids
+    root_id: int
+    root_name: int
+    seed: int = 0
+    by_name: dict[int, list[int]] = field(default_factory=dict)
+
+    @property
+    def n_names(self) -> int:
+        return len(self.by_name)
+
+    @property
+    def root_time(self) -> int:
+        return int(self.node_time[self.root_id])
+
+    def header_docs(self, chunk_size: int = 2) -> list[dict[str, Any]]:
+        """global_graph_adj_headers docs with their chunk docs joined in."""
+        docs = []
+        for (src, dep), dsts in sorted(self.edges.items()):
+            dsts = sorted(dsts, key=self._sort_time)
+            chunks = [
+                dsts[i : i + chunk_size] for i in range(0, len(dsts), chunk_size)
+            ]
+            known = [
+                [int(self.node_time[d]) for d in c if self.node_time[d] >= 0]
+                for c in chunks
+            ]
+            docs.append(
+                {
+                    "src_id": src,
+                    "dep_name_id": dep,
+                    "mi": [min(k) if k else None for k in known],
+                    "ma": [max(k) if k else None for k in known],
+                    "n": [len(c) for c in chunks],
+                    "total": len(dsts),
+                    "chunk_docs": [
+                        {"chunk": i, "dst_ids": c} for i, c in enumerate(chunks)
+                    ],
+                }
+            )
+        return docs
+
+    def _sort_time(self, node_id: int) -> int:
+        t = int(self.node_time[node_id])
+        return t if t >= 0 else 1 << 62
+
+
+def random_graph(seed: int, neutral_py: bool = False) -> Graph:
+    """
+    6-12 package names with 1-4 versions each and 0-3 deps per version; about
+    5% of versions have no upload time. With neutral_py every version allows
+    every Python, which is what the brute-force oracle assumes.
+    """
+    rng = random.Random(seed)
+    n_names = rng.randint(6, 12)
+    node_name: list[int] = []
+    node_time: list[int] = []
+    node_py: list[int] = []
+    by_name: dict[int, list[int]] = {}
+    for name in range(n_names):
+        for _ in range(rng.randint(1, 4)):
+            by_name.setdefault(name, []).append(len(node_name))
+            node_name.append(name)
+            node_time.append(rng.randint(0, 100) if rng.random() > 0.05 else -1)
+            node_py.append(rng.choice([0b111, 0b011, 0b110, 0b001, 0b111, 0b111]))
+    deps: dict[int, list[int]] = {}
+    edges: dict[tuple[int, int], list[int]] = {}
+    for nid, name in enumerate(node_name):
+        others = [x for x in range(n_names) if x != name]
+        deps[nid] = rng.sample(others, k=min(rng.randint(0, 3), n_names - 1))
+        for d in deps[nid]:
+            vs = by_name[d]
+            edges[(nid, d)] = rng.sample(vs, k=rng.randint(1, len(vs)))
+    root_id = by_name[0][-1]
+    if node_time[root_id] < 0:
+        node_time[root_id] = rng.randint(0, 100)
+    if neutral_py:
+        node_py = [ALL_PY] * len(node_name)
+    return Graph(
+        node_name=np.array(node_name, dtype=np.int32),
+        node_time=np.array(node_time, dtype=np.int64),
+        node_py=np.array(node_py, dtype=np.uint64),
+        deps=deps,
+        edges=edges,
+        root_id=root_id,
+        root_name=0,
+        seed=seed,
+        by_name=by_name,
+    )
+
+
+def small_graphs(count: int, max_names: int = 7) -> list[Graph]:
+    """The first `count` neutral-Python fixture graphs the oracle can enumerate."""
+    out = []
+    seed = 0
+    while len(out) < count:
+        g = random_graph(seed, neutral_py=True)
+        if g.n_names <= max_names:
+            out.append(g)
+        seed += 1
+    return out
+
+
+class InMemoryHeaders:
+    """The find/aggregate calls AdjStore makes on the headers collection, in memory."""
+
+    name = "global_graph_adj_chunks"
+
+    def __init__(self, docs: list[dict[str, Any]]) -> None:
+        self.docs = docs
+
+    def find(
+        self, query: dict[str, Any], projection: Any = None
+    ) -> list[dict[str, Any]]:
+        return [d for d in self.docs if d["src_id"] == query["src_id"]]
+
+    def aggregate(
+        self, pipeline: list[dict[str, Any]], **kwargs: Any
+    ) -> list[dict[str, Any]]:
+        match = pipeline[0]["$match"]
+        src = match["src_id"]
+        srcs = set(src["$in"]) if isinstance(src, dict) else {src}
+        return [
+            d
+            for d in self.docs
+            if d["src_id"] in srcs
+            and match.get("dep_name_id", d["dep_name_id"]) == d["dep_name_id"]
+        ]
+
+
+def make_adj(phase4: ModuleType, g: Graph) -> Any:
+    coll = InMemoryHeaders(g.header_docs())
+    adj = phase4.AdjStore(headers_coll=coll, chunks_coll=coll, node_time=g.node_time)
+    adj.prefetch_headers(range(len(g.node_name)))
+    return adj
+
+
+def make_solver(
+    phase4: ModuleType, g: Graph, adj: Any = None, **kwargs: Any
+) -> Any:
+    return phase4.ExposureSolverCSP(
+        adj=adj if adj is not None else make_adj(phase4, g),
+        node_py_mask=g.node_py,
+        node_time=g.node_time,
+        node_name_id=g.node_name,
+        all_mask=ALL_PY,
+        root_id=g.root_id,
+        root_name_id=g.root_name,
+        num_name_ids=g.n_names,
+        **kwargs,
+    )
+
+
+def exposure_rows(phase4: ModuleType, g: Graph, **kwargs: Any) -> list[list[Any]]:
+    """The CSV rows main() would write for every node of g, from one solver."""
+    solver = make_solver(phase4, g, **kwargs)
+    return [
+        phase4.exposure_row(solver, g.node_time, g.root_time, nid)
+        for nid in range(len(g.node_name))
+    ]
+
+
+def exactly_exposed(g: Graph, start: int, t: int) -> bool:
+    """
+    Brute force over every assignment of one version (or none) per package name:
+    is there one in which start's dependency closure is fully satisfied by edges
+    valid at t and includes the root? Python masks are ignored (neutral graphs).
+    """
+    if start == g.root_id:
+        return True
+    if not 0 <= g.node_time[start] <= t:
+        return False
+    start_name = int(g.node_name[start])
+    free = [x for x in range(g.n_names) if x not in (start_name, g.root_name)]
+    for combo in itertools.product(*[[None, *g.by_name[x]] for x in free]):
+        chosen: dict[int, int | None] = dict(zip(free, combo))
+        chosen[start_name] = start
+        chosen[g.root_name] = g.root_id
+        if _closure_ok(g, chosen, start, t):
+            return True
+    return False
+
+
+def _closure_ok(g: Graph, chosen: dict[int, int | None], start: int, t: int) -> bool:
+    seen = {start}
+    todo = [start]
+    needs_root = False
+    while todo:
+        u = todo.pop()
+        for d in g.deps.get(u, []):
+            needs_root = needs_root or d == g.root_name
+            v = chosen[d]
+            if v is None or v not in g.edges[(u, d)]:
+                return False
+            if not 0 <= g.node_time[v] <= t:
+                return False
+            if v not in seen:
+                seen.add(v)
+                todo.append(v)
+    return needs_root
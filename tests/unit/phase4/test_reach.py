@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from types import ModuleType
+
+import numpy as np
+import pytest
+
+from tests.unit.phase4.graphs import (
+    Graph,
+    exposure_rows,
+    load_phase4,
+    make_adj,
+    random_graph,
+)
+
+
+@pytest.fixture(scope="module")
+def phase4() -> ModuleType:
+    return load_phase4()
+
+
+def _reaching_root(g: Graph, t_max: int) -> set[int]:
+    """Every node with a path to the root over edges to nodes with time <= t_max."""
+    reached = {g.root_id}
+    changed = True
+    while changed:
+        changed = False
+        for (src, _dep), dsts in g.edges.items():
+            if src in reached:
+                continue
+            if any(d in reached and 0 <= g.node_time[d] <= t_max for d in dsts):
+                reached.add(src)
+                changed = True
+    return reached
+
+
+def test_path_through_a_node_outside_the_subgraph(phase4: ModuleType) -> None:
+    # 0 (root) <- 1 <- 2; the subgraph holds only 2 and the root
+    g = Graph(
+        node_name=np.array([0, 1, 2], dtype=np.int32),
+        node_time=np.array([10, 10, 10], dtype=np.int64),
+        node_py=np.array([7, 7, 7], dtype=np.uint64),
+        deps={0: [], 1: [0], 2: [1]},
+        edges={(1, 0): [0], (2, 1): [1]},
+        root_id=0,
+        root_name=0,
+        by_name={0: [0], 1: [1], 2: [2]},
+    )
+    adj = make_adj(phase4, g)
+    nodes = np.array([0, 2], dtype=np.int64)
+    assert 2 in phase4.nodes_reaching_root(adj, nodes, g.root_id, 10)
+    assert 2 not in phase4.nodes_reaching_root(adj, nodes, g.root_id, 9)
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_reach_over_a_partial_subgraph(phase4: ModuleType, seed: int) -> None:
+    g = random_graph(seed)
+    nodes = np.arange(0, len(g.node_name), 2, dtype=np.int64)
+    t_max = int(g.node_time.max())
+    got = phase4.nodes_reaching_root(make_adj(phase4, g), nodes, g.root_id, t_max)
+    expected = _reaching_root(g, t_max)
+    assert set(nodes.tolist()) & got == set(nodes.tolist()) & expected
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_exposed_nodes_reach_the_root(phase4: ModuleType, seed: int) -> None:
+    g = random_graph(seed)
+    nodes = np.arange(len(g.node_name), dtype=np.int64)
+    t_max = int(g.node_time.max())
+    reachable = phase4.nodes_reaching_root(make_adj(phase4, g), nodes, g.root_id, t_max)
+    for nid, _nt, _t, exposed, _depth, _reason in exposure_rows(phase4, g):
+        if exposed:
+            assert nid in reachable
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from types import ModuleType
+
+import pytest
+
+from tests.unit.phase4.graphs import (
+    Graph,
+    exactly_exposed,
+    exposure_rows,
+    load_phase4,
+    random_graph,
+    small_graphs,
+)
+
+
+@pytest.fixture(scope="module")
+def phase4() -> ModuleType:
+    return load_phase4()
+
+
+@pytest.mark.parametrize("g", small_graphs(60), ids=lambda g: f"seed{g.seed}")
+def test_exposed_nodes_are_exposed_by_brute_force(
+    phase4: ModuleType, g: Graph
+) -> None:
+    """The search may miss exposures, but every node it reports must be exposed."""
+    for nid, _nt, t, exposed, _depth, _reason in exposure_rows(phase4, g):
+        if exposed:
+            assert exactly_exposed(g, nid, t), nid
+
+
+@pytest.mark.parametrize("g", small_graphs(60), ids=lambda g: f"seed{g.seed}")
+def test_mrv_order_only_changes_which_exposures_are_found(
+    phase4: ModuleType, g: Graph
+) -> None:
+    """
+    MRV may find a different exposed set than header order (the search is
+    incomplete), but every node either order reports is exposed by brute force.
+    """
+    default = exposure_rows(phase4, g)
+    mrv = exposure_rows(phase4, g, mrv_order=True)
+    for row, mrv_row in zip(default, mrv):
+        assert row[:3] == mrv_row[:3]
+        if row[3] != mrv_row[3]:
+            assert exactly_exposed(g, row[0], row[2]), row[0]
+
+
+def test_brute_force_fixtures_have_exposures(phase4: ModuleType) -> None:
+    rows = [r for g in small_graphs(60) for r in exposure_rows(phase4, g)]
+    assert sum(r[3] for r in rows) > len(small_graphs(60))
+
+
+@pytest.mark.parametrize("mrv_order", [False, True])
+@pytest.mark.parametrize("seed", range(40))
+def test_nogoods_do_not_change_rows(
+    phase4: ModuleType, seed: int, mrv_order: bool
+) -> None:
+    """Recorded nogoods only prune: rows match a solver that records none."""
+    g = random_graph(seed)
+    with_nogoods = exposure_rows(phase4, g, mrv_order=mrv_order)
+    without = exposure_rows(phase4, g, mrv_order=mrv_order, nogood_cache_cap=0)
+    assert with_nogoods == without
+
+
+def test_root_is_exposed_at_depth_zero(phase4: ModuleType) -> None:
+    g = random_graph(0)
+    row = exposure_rows(phase4, g)[g.root_id]
+    assert row[3:5] == [1, 0]
@@ -0,0 +1,132 @@
+"""In-memory stand-ins for the MongoDB collections a ResolutionContext reads."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from typing import Any
+
+import numpy as np
+import pytest
+from pipstyle.loader import NO_TIME, ClockCache, ResolutionContext
+
+bson = pytest.importorskip("bson")
+
+
+def _matches(doc: dict[str, Any], query: dict[str, Any]) -> bool:
+    for k, v in query.items():
+        if k == "$or":
+            if not any(_matches(doc, q) for q in v):
+                return False
+        elif isinstance(v, dict) and "$in" in v:
+            if doc.get(k) not in v["$in"]:
+                return False
+        elif doc.get(k) != v:
+            return False
+    return True
+
+
+def _project(doc: dict[str, Any], projection: dict[str, Any] | None) -> dict[str, Any]:
+    if not projection:
+        return doc
+    return {k: doc[k] for k, v in projection.items() if v and k in doc}
+
+
+class FakeCursor:
+    def __init__(self, docs: list[dict[str, Any]], raw: bool = False) -> None:
+        self.docs = docs
+        self.raw = raw
+
+    def sort(self, key: Any, direction: int = 1) -> FakeCursor:
+        keys = key if isinstance(key, list) else [(key, direction)]
+        docs = self.docs
+        for k, d in reversed(keys):
+            docs = sorted(docs, key=lambda doc: doc[k], reverse=d < 0)
+        return FakeCursor(docs, self.raw)
+
+    def limit(self, n: int) -> FakeCursor:
+        return FakeCursor(self.docs[:n], self.raw)
+
+    def batch_size(self, n: int) -> FakeCursor:
+        return self
+
+    def hint(self, index: Any) -> FakeCursor:
+        return self
+
+    def close(self) -> None:
+        pass
+
+    def __iter__(self) -> Iterator[Any]:
+        if not self.raw:
+            return iter(self.docs)
+        # two docs per raw batch, so batch boundaries are exercised too
+        encoded = [bson.encode(d) for d in self.docs]
+        return iter(b"".join(encoded[i : i + 2]) for i in range(0, len(encoded), 2))
+
+
+class FakeCollection:
+    """find / find_one / find_raw_batches over a list of docs, counting queries."""
+
+    def __init__(self, docs: list[dict[str, Any]], name: str = "coll") -> None:
+        self.docs = docs
+        self.name = name
+        self.queries = 0
+
+    def _find(self, query: dict[str, Any], projection: Any) -> list[dict[str, Any]]:
+        self.queries += 1
+        return [_project(d, projection) for d in self.docs if _matches(d, query)]
+
+    def find(
+        self, query: dict[str, Any], projection: Any = None, **kwargs: Any
+    ) -> FakeCursor:
+        return FakeCursor(self._find(query, projection))
+
+    def find_one(
+        self, query: dict[str, Any], projection: Any = None, **kwargs: Any
+    ) -> dict[str, Any] | None:
+        found = self._find(query, projection)
+        return found[0] if found else None
+
+    def find_raw_batches(
+        self, query: dict[str, Any], projection: Any = None, **kwargs: Any
+    ) -> FakeCursor:
+        return FakeCursor(self._find(query, projection), raw=True)
+
+
+# 20 nodes: 0-9 are versions of name 0 ("a"), 10-19 of name 1 ("b"); node 15
+# has no upload time. Header (5, 1) has two empty chunks before its only one.
+CHUNK_DOCS = [
+    {"src_id": 0, "dep_name_id": 1, "chunk": 1, "dst_ids": [14, 16, 17, 18, 19, 15]},
+    {"src_id": 0, "dep_name_id": 1, "chunk": 0, "dst_ids": [10, 11, 12, 13]},
+    {"src_id": 10, "dep_name_id": 0, "chunk": 0, "dst_ids": [1, 2]},
+    {"src_id": 5, "dep_name_id": 1, "chunk": 2, "dst_ids": [12]},
+]
+HEADER_DOCS = [
+    {"src_id": 10, "dep_name_id": 0, "mi": [101], "ma": [102], "n": [2]},
+    {"src_id": 0, "dep_name_id": 1, "mi": [110, 114], "ma": [113, 119], "n": [4, 6]},
+    {
+        "src_id": 5,
+        "dep_name_id": 1,
+        "mi": [None, None, 112],
+        "ma": [None, None, 112],
+        "n": [0, 0, 1],
+    },
+]
+
+
+def make_context(cache_cls: type = ClockCache, cap: int = 100) -> ResolutionContext:
+    """A Mongo-backed context over CHUNK_DOCS and HEADER_DOCS."""
+    node_time = np.arange(100, 120, dtype=np.int64)
+    node_time[15] = NO_TIME
+    return ResolutionContext(
+        node_py_mask=np.array([(1 << 26) - 1] * 19 + [0b101], dtype=np.uint32),
+        node_time=node_time,
+        node_name_id=np.array([0] * 10 + [1] * 10, dtype=np.int32),
+        name_blob=b"ab",
+        name_offsets=np.array([0, 1, 2], dtype=np.int64),
+        deps_start=np.array([0, 1, 1, 1, 1, 1, 2] + [2] * 4 + [3] * 10, dtype=np.int64),
+        deps=np.array([1, 1, 0], dtype=np.int32),
+        chunk_lru=cache_cls(cap),
+        header_lru=cache_cls(cap),
+        chunks_coll=FakeCollection(CHUNK_DOCS, "global_graph_adj_chunks"),
+        adj_headers_coll=FakeCollection(HEADER_DOCS, "global_graph_adj_headers"),
+    )
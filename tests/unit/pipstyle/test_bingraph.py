@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+from pipstyle.bingraph import FORMAT, VERSION, load_binary_context, write_binary_graph
+from pipstyle.loader import ResolutionContext
+
+from tests.unit.pipstyle.fakes import HEADER_DOCS, make_context
+
+PAIRS = [(d["src_id"], d["dep_name_id"]) for d in HEADER_DOCS]
+
+
+@pytest.fixture
+def graph_dir(tmp_path: Path) -> str:
+    write_binary_graph(make_context(), str(tmp_path))
+    return str(tmp_path)
+
+
+@pytest.fixture
+def contexts(graph_dir: str) -> tuple[ResolutionContext, ResolutionContext]:
+    return make_context(), load_binary_context(graph_dir)
+
+
+def test_node_arrays_round_trip(
+    contexts: tuple[ResolutionContext, ResolutionContext],
+) -> None:
+    ctx, binary = contexts
+    for name in (
+        "node_time",
+        "node_py_mask",
+        "node_name_id",
+        "name_offsets",
+        "deps_start",
+        "deps",
+    ):
+        np.testing.assert_array_equal(getattr(binary, name), getattr(ctx, name))
+    assert binary.name_blob == ctx.name_blob
+    for src_id in range(len(ctx.node_time)):
+        np.testing.assert_array_equal(
+            binary.get_dep_name_ids(src_id), ctx.get_dep_name_ids(src_id)
+        )
+
+
+@pytest.mark.parametrize("pair", PAIRS)
+def test_headers_and_chunks_round_trip(
+    contexts: tuple[ResolutionContext, ResolutionContext], pair: tuple[int, int]
+) -> None:
+    ctx, binary = contexts
+    h = ctx.get_header(*pair)
+    b = binary.get_header(*pair)
+    assert h is not None
+    assert b is not None
+    for name in ("chunk_n", "chunk_min_t", "chunk_max_t"):
+        np.testing.assert_array_equal(getattr(b, name), getattr(h, name))
+    assert (b.min_t, b.max_t) == (h.min_t, h.max_t)
+    for c in range(-1, h.num_chunks + 1):
+        for got, expected in zip(binary.get_chunk(*pair, c), ctx.get_chunk(*pair, c)):
+            np.testing.assert_array_equal(got, expected)
+    for got, expected in zip(
+        binary.get_header_arrays(b), ctx.get_header_arrays(ctx.get_header(*pair))
+    ):
+        np.testing.assert_array_equal(got, expected)
+    np.testing.assert_array_equal(b.chunk_py_or, h.chunk_py_or)
+    np.testing.assert_array_equal(binary.get_bloom(b), ctx.get_bloom(h))
+    assert binary.get_edge_index(b) == ctx.get_edge_index(h)
+
+
+def test_missing_header(
+    contexts: tuple[ResolutionContext, ResolutionContext],
+) -> None:
+    ctx, binary = contexts
+    assert ctx.get_header(1, 1) is None
+    assert binary.get_header(1, 1) is None
+    assert [len(a) for a in binary.get_chunk(1, 1, 0)] == [0, 0]
+
+
+@pytest.mark.parametrize(
+    "field, value", [("version", VERSION - 1), ("format", FORMAT + "-x")]
+)
+def test_mismatched_meta_is_rejected(graph_dir: str, field: str, value: object) -> None:
+    path = os.path.join(graph_dir, "meta.json")
+    with open(path) as f:
+        meta = json.load(f)
+    meta[field] = value
+    with open(path, "w") as f:
+        json.dump(meta, f)
+    with pytest.raises(ValueError, match="is not a"):
+        load_binary_context(graph_dir)
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import random
+
+import numpy as np
+import pytest
+from pipstyle.loader import BLOOM_MAX_WORDS, bloom_build, bloom_may_contain
+
+BOUNDARY_IDS = [
+    0,
+    1,
+    2**31 - 1,
+    2**31,
+    2**32 - 1,
+    2**32,
+    2**32 + 1,
+    2**52 - 1,
+    2**53 + 1,
+    2**63 - 1,
+    -1,
+    -(2**63),
+]
+
+
+def _ids(n: int, seed: int) -> np.ndarray:
+    rng = random.Random(seed)
+    return np.array(
+        [rng.randrange(-(2**63), 2**63) for _ in range(n)] + BOUNDARY_IDS,
+        dtype=np.int64,
+    )
+
+
+@pytest.mark.parametrize("n", [0, 1, 7, 8, 9, 100, 1000, 10_000])
+def test_no_false_negatives(n: int) -> None:
+    ids = _ids(n, seed=n)
+    bloom = bloom_build(ids)
+    assert bloom.dtype == np.uint64
+    assert all(bloom_may_contain(bloom, x) for x in ids.tolist())
+
+
+def test_sizes_are_powers_of_two_up_to_the_cap() -> None:
+    for n in (0, 1, 9, 100, 10_000, 1_000_000):
+        words = len(bloom_build(np.arange(n, dtype=np.int64)))
+        assert words & (words - 1) == 0
+        assert words <= BLOOM_MAX_WORDS
+
+
+def test_empty_filter_rejects_everything() -> None:
+    bloom = bloom_build(np.empty(0, dtype=np.int64))
+    assert not any(bloom_may_contain(bloom, x) for x in BOUNDARY_IDS)
+
+
+def test_mostly_rejects_absent_ids() -> None:
+    bloom = bloom_build(np.arange(0, 2000, 2, dtype=np.int64))
+    false_positives = sum(bloom_may_contain(bloom, x) for x in range(1, 2000, 2))
+    assert false_positives < 200
+
+
+@pytest.mark.parametrize("dtype", [np.int32, np.int64, np.uint32, np.uint64])
+def test_numpy_scalar_ids(dtype: type) -> None:
+    ids = np.array([0, 5, np.iinfo(dtype).max], dtype=dtype)
+    bloom = bloom_build(ids.astype(np.int64))
+    assert all(bloom_may_contain(bloom, x) for x in ids)
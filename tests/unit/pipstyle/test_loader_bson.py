@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+import pytest
+from pipstyle.loader import (
+    _bson_int_array,
+    _chunk_doc,
+    _iter_chunk_docs,
+    _uniform_array_len,
+)
+
+bson = pytest.importorskip("bson")
+Int64 = bson.int64.Int64
+
+
+def _expected(doc: dict[str, Any]) -> tuple[dict[str, int], list[int]]:
+    """What _chunk_doc should return, from bson.decode_all of the encoded doc."""
+    (decoded,) = bson.decode_all(bson.encode(doc))
+    dst_ids = decoded.pop("dst_ids", None)
+    ints = {
+        k: v
+        for k, v in decoded.items()
+        if isinstance(v, int) and not isinstance(v, bool)
+    }
+    return ints, dst_ids if isinstance(dst_ids, list) else []
+
+
+def _parse(doc: dict[str, Any]) -> tuple[dict[str, int], list[int]]:
+    raw = bson.encode(doc)
+    ints, dst_ids = _chunk_doc(raw, np.frombuffer(raw, dtype=np.uint8), 0, len(raw))
+    assert dst_ids.dtype == np.int64
+    return ints, dst_ids.tolist()
+
+
+DOCS = {
+    "int32": {"src_id": 1, "dep_name_id": 2, "chunk": 0, "dst_ids": [5, 3, 9]},
+    "int64": {"src_id": Int64(1), "dst_ids": [Int64(x) for x in (5, -3, 2**40)]},
+    "mixed_width": {"src_id": 1, "dst_ids": [5, 2**40, 7]},
+    "negative": {"src_id": -1, "dst_ids": [-(2**31), 2**31 - 1, -(2**63)]},
+    "empty": {"src_id": 1, "dst_ids": []},
+    "null": {"src_id": 1, "chunk": None, "dst_ids": None},
+    "missing": {"src_id": 1, "chunk": 3},
+    "one": {"dst_ids": [42]},
+    "ten": {"dst_ids": list(range(10))},
+    "hundred_one": {"dst_ids": list(range(101))},
+    "thousands_int32": {"dst_ids": list(range(2**31 - 3500, 2**31))},
+    "thousands_int64": {"dst_ids": [Int64(x) for x in range(2**32, 2**32 + 3500)]},
+    "int32_int64_boundary": {"dst_ids": list(range(2**31 - 2, 2**31 + 2))},
+    "other_field_types": {"src_id": 1, "note": "x", "ok": True, "dst_ids": [1, 2]},
+    "float_in_array": {"dst_ids": [1, 2.0, 3]},
+    "scalar_dst_ids": {"src_id": 1, "dst_ids": 7},
+    "string_dst_ids": {"src_id": 1, "dst_ids": "abc"},
+    "nested_array": {"other": [1, 2], "dst_ids": [3]},
+}
+
+
+@pytest.mark.parametrize("doc", DOCS.values(), ids=DOCS.keys())
+def test_chunk_doc_matches_decode_all(doc: dict[str, Any]) -> None:
+    assert _parse(doc) == _expected(doc)
+
+
+def test_chunk_doc_rejects_non_int_array_elements() -> None:
+    with pytest.raises((TypeError, ValueError)):
+        _parse({"dst_ids": [1, "x"]})
+
+
+def test_iter_chunk_docs_walks_every_doc_of_a_batch() -> None:
+    docs = list(DOCS.values())
+    batch = b"".join(bson.encode(d) for d in docs)
+    got = [(ints, dst.tolist()) for ints, dst in _iter_chunk_docs([batch, batch])]
+    assert got == [_expected(d) for d in docs] * 2
+
+
+@pytest.mark.parametrize("width", [4, 8])
+@pytest.mark.parametrize("n", [0, 1, 9, 10, 11, 99, 100, 101, 1000, 12345])
+def test_uniform_array_len_inverts_encoded_size(width: int, n: int) -> None:
+    body = sum(2 + len(str(i)) + width for i in range(n))
+    assert _uniform_array_len(body, width) == n
+    if n:
+        assert _uniform_array_len(body + 1, width) == -1
+
+
+def _array_of(values: list[Any]) -> Any:
+    raw = bson.encode({"a": values})
+    lo = 4 + 1 + 2  # doc length, type byte, "a\0"
+    return _bson_int_array(np.frombuffer(raw, dtype=np.uint8), lo, len(raw) - 1)
+
+
+def test_bson_int_array_reads_uniform_arrays() -> None:
+    assert _array_of([1, 2, -3]).tolist() == [1, 2, -3]
+    assert _array_of([Int64(1), Int64(2**40)]).tolist() == [1, 2**40]
+    assert _array_of([]).tolist() == []
+
+
+@pytest.mark.parametrize(
+    "values",
+    [[1, Int64(2)], [Int64(1), 2], [1, None], [1.0, 2.0], ["a"], [[1]]],
+)
+def test_bson_int_array_declines_non_uniform_arrays(values: list[Any]) -> None:
+    assert _array_of(values) is None
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import pytest
+from pipstyle.loader import CACHE_POLICIES, ClockCache, LRUCache
+
+
+@pytest.fixture(params=sorted(CACHE_POLICIES))
+def cache_cls(request: pytest.FixtureRequest) -> type[LRUCache | ClockCache]:
+    return CACHE_POLICIES[request.param]
+
+
+def test_get_and_put(cache_cls: type[LRUCache | ClockCache]) -> None:
+    cache = cache_cls(3)
+    assert cache.get("a") is None
+    cache.put("a", 1)
+    cache.put("b", None)
+    assert cache.get("a") == 1
+    assert cache.has_key("b")
+    assert not cache.has_key("c")
+    cache.put("a", 2)
+    assert cache.get("a") == 2
+    assert len(cache) == 2
+
+
+def test_capacity_is_never_exceeded(cache_cls: type[LRUCache | ClockCache]) -> None:
+    cache = cache_cls(4)
+    for i in range(100):
+        cache.put(i, i)
+        cache.get(i // 2)
+        assert len(cache) <= 4
+    assert len(cache) == 4
+    assert all(cache.get(k) == k for k in range(100) if cache.has_key(k))
+
+
+def test_zero_capacity_caches_nothing(cache_cls: type[LRUCache | ClockCache]) -> None:
+    cache = cache_cls(0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.stats() == {"size": 0, "cap": 0, "hits": 0, "misses": 0}
+
+
+def test_stats(cache_cls: type[LRUCache | ClockCache]) -> None:
+    cache = cache_cls(2)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+    assert cache.stats() == {"size": 1, "cap": 2, "hits": 2, "misses": 1}
+
+
+def test_lru_evicts_least_recently_used() -> None:
+    cache = LRUCache(3)
+    for k in "abc":
+        cache.put(k, k)
+    cache.get("a")
+    cache.put("d", "d")  # b is now the least recently used
+    assert [k for k in "abcd" if cache.has_key(k)] == ["a", "c", "d"]
+    cache.put("c", "C")
+    cache.put("e", "e")  # a, touched before c was updated
+    assert [k for k in "abcde" if cache.has_key(k)] == ["c", "d", "e"]
+
+
+def test_clock_gives_referenced_entries_a_second_chance() -> None:
+    cache = ClockCache(3)
+    for k in "abc":
+        cache.put(k, k)
+    cache.get("a")
+    cache.get("c")
+    cache.put("d", "d")  # the hand clears a, evicts unreferenced b
+    assert [k for k in "abcd" if cache.has_key(k)] == ["a", "c", "d"]
+    cache.put("e", "e")  # c still has its bit, a was cleared: a goes
+    assert [k for k in "acde" if cache.has_key(k)] == ["c", "d", "e"]
+    cache.put("f", "f")  # c's bit is cleared on this sweep, d is evicted
+    assert [k for k in "cdef" if cache.has_key(k)] == ["c", "e", "f"]
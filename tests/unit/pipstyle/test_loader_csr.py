@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import random
+
+import numpy as np
+import pytest
+from pipstyle.loader import ResolutionContext, _deps_csr
+
+
+def _runs(seed: int, n: int) -> dict[int, list[int]]:
+    """Random {src_id: deps} over some of 0..n-1, empty dep lists included."""
+    rng = random.Random(seed)
+    srcs = rng.sample(range(n), k=rng.randint(0, n))
+    return {s: [rng.randrange(2**31) for _ in range(rng.randint(0, 5))] for s in srcs}
+
+
+def _context(n: int, deps_start: np.ndarray, deps: np.ndarray) -> ResolutionContext:
+    return ResolutionContext(
+        node_py_mask=np.zeros(n, dtype=np.uint32),
+        node_time=np.zeros(n, dtype=np.int64),
+        node_name_id=np.zeros(n, dtype=np.int32),
+        deps_start=deps_start,
+        deps=deps,
+    )
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_deps_csr_matches_runs_in_any_order(seed: int) -> None:
+    n = 1 + seed * 3
+    runs = _runs(seed, n)
+    srcs = np.array(list(runs), dtype=np.int64)
+    lens = np.array([len(v) for v in runs.values()], dtype=np.int64)
+    vals = np.array([x for v in runs.values() for x in v], dtype=np.int32)
+    deps_start, deps = _deps_csr(n, srcs, lens, vals)
+    assert deps_start.dtype == np.int64
+    assert deps.dtype == np.int32
+    assert len(deps_start) == n + 1
+    ctx = _context(n, deps_start, deps)
+    for src_id in range(n):
+        assert ctx.get_dep_name_ids(src_id).tolist() == runs.get(src_id, [])
+
+
+def test_deps_csr_without_runs() -> None:
+    deps_start, deps = _deps_csr(
+        3,
+        np.empty(0, dtype=np.int64),
+        np.empty(0, dtype=np.int64),
+        np.empty(0, dtype=np.int32),
+    )
+    assert deps_start.tolist() == [0, 0, 0, 0]
+    assert len(deps) == 0
+
+
+def test_get_dep_name_ids_is_a_view() -> None:
+    deps = np.array([4, 5, 6], dtype=np.int32)
+    ctx = _context(2, np.array([0, 2, 3], dtype=np.int64), deps)
+    assert ctx.get_dep_name_ids(0).base is deps
+
+
+def test_default_deps_span_every_node() -> None:
+    ctx = ResolutionContext(
+        node_py_mask=np.zeros(4, dtype=np.uint32),
+        node_time=np.zeros(4, dtype=np.int64),
+        node_name_id=np.zeros(4, dtype=np.int32),
+    )
+    assert [len(ctx.get_dep_name_ids(s)) for s in range(4)] == [0, 0, 0, 0]
+
+
+def test_mismatched_deps_start_is_rejected() -> None:
+    with pytest.raises(ValueError, match="deps_start"):
+        _context(3, np.array([0, 1, 1], dtype=np.int64), np.array([7], dtype=np.int32))
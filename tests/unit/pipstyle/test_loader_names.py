@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from pipstyle.loader import ResolutionContext
+
+NAMES = ["requests", "", "urllib3", "a", "zope-interface", "ab", "b", "", "aa", "é-pkg"]
+
+
+def _context(names: list[str]) -> ResolutionContext:
+    encoded = [n.encode() for n in names]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return ResolutionContext(
+        node_py_mask=np.zeros(0, dtype=np.uint32),
+        node_time=np.zeros(0, dtype=np.int64),
+        node_name_id=np.zeros(0, dtype=np.int32),
+        name_blob=b"".join(encoded),
+        name_offsets=offsets,
+    )
+
+
+def test_name_id_of_finds_every_name() -> None:
+    ctx = _context(NAMES)
+    for name_id, name in enumerate(NAMES):
+        if name:
+            assert ctx.name_id_of(name) == name_id
+            assert ctx.name_of(name_id) == name
+
+
+@pytest.mark.parametrize(
+    "name", ["", "request", "requestss", "a-", "0", "zzz", "quest", "b" * 50]
+)
+def test_name_id_of_unknown(name: str) -> None:
+    assert _context(NAMES).name_id_of(name) is None
+
+
+def test_name_id_of_substrings_are_not_names() -> None:
+    # "ab" is packed right after "a"; neither lookup may match across the boundary
+    ctx = _context(["a", "b", "ab"])
+    assert ctx.name_id_of("ab") == 2
+    assert ctx.name_id_of("ba") is None
+
+
+def test_name_id_of_without_names() -> None:
+    assert _context([]).name_id_of("requests") is None
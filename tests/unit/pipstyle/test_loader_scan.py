@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from pipstyle.loader import iter_raw_batches
+
+from tests.unit.pipstyle.fakes import CHUNK_DOCS, FakeCursor
+
+
+class ClosingCursor(FakeCursor):
+    closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_iter_raw_batches_decodes_every_batch() -> None:
+    cur = ClosingCursor(CHUNK_DOCS, raw=True)
+    assert list(iter_raw_batches(cur)) == CHUNK_DOCS
+    assert cur.closed
+
+
+def test_iter_raw_batches_closes_the_cursor_when_abandoned() -> None:
+    cur = ClosingCursor(CHUNK_DOCS, raw=True)
+    docs = iter_raw_batches(cur)
+    assert next(docs) == CHUNK_DOCS[0]
+    docs.close()
+    assert cur.closed
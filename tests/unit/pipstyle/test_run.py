@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import json
+import multiprocessing as mp
+import sys
+from pathlib import Path
+
+import pytest
+from pipstyle import run as run_module
+from pipstyle.bingraph import load_binary_context, write_binary_graph
+from pipstyle.run import resolve_rows, write_tree
+
+from tests.unit.pipstyle.fakes import make_context
+
+# root: node 1 (name 0, time 101)
+ROW_ARGS = (1, 0, 101, False)
+
+
+@pytest.fixture
+def graph_dir(tmp_path: Path) -> str:
+    write_binary_graph(make_context(), str(tmp_path))
+    return str(tmp_path)
+
+
+def test_resolve_rows_in_process(graph_dir: str) -> None:
+    nodes = [10, 0, 15, 3]
+    rows = list(resolve_rows(load_binary_context(graph_dir), nodes, ROW_ARGS))
+    assert [r[0] for r in rows] == nodes
+    assert rows[2][1:3] == (False, -1)  # node 15 has no upload time
+    assert rows[0][1:3] == (True, 1)  # 10 depends on name 0, which is the root
+
+
+@pytest.mark.skipif(
+    sys.platform == "win32" or "fork" not in mp.get_all_start_methods(),
+    reason="needs the fork start method",
+)
+def test_workers_match_in_process_order(graph_dir: str) -> None:
+    nodes = list(range(20))[::-1] * 3
+    ctx = load_binary_context(graph_dir)
+    serial = list(resolve_rows(ctx, nodes, ROW_ARGS))
+    pooled = list(resolve_rows(ctx, nodes, ROW_ARGS, workers=3, chunksize=2))
+    assert pooled == serial
+
+
+def test_write_tree_is_the_same_with_and_without_orjson(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    pytest.importorskip("orjson")
+    tree = {"nodes": [10, 1], "edges": [[10, 1]], "mapping": {0: 1, 1: 10}, "n": "é"}
+    fast = tmp_path / "fast.json"
+    write_tree(str(fast), tree)
+    monkeypatch.setattr(run_module, "_HAS_ORJSON", False)
+    slow = tmp_path / "slow.json"
+    write_tree(str(slow), tree)
+    assert fast.read_bytes() == slow.read_bytes()
+    assert json.loads(fast.read_bytes()) == {
+        **tree,
+        "mapping": {"0": 1, "1": 10},
+    }